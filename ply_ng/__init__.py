@@ -1,3 +1,4 @@
+from .config import *
 from .pandas_pipe import *
 from .pandas_stream import *
 from .select import *
@@ -6,12 +7,12 @@ from .bindings import *
 from .group import *
 from .summarize import *
 from .mutate import *
+from .subset import *
+from .plan import *
+from .profiling import Profiler, profile_ply
+from .streaming import ChunkStream, stream
+from .incremental import IncrementalSummary
+from .window import *
+from .sketches import approx_nunique, approx_quantile
+from .parallel import parallel
 
-
-@gr_pipe #should work on groups as well as ungrouped data
-def mutate(df, **kwargs):
-    """
-    Emulating Dplyr mutate. Assigning new values to a dataframe 
-    """
-
-    return df.assign(**kwargs)
\ No newline at end of file
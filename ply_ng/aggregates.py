@@ -0,0 +1,312 @@
+"""
+Recognition of the reductions used in `summarize` (`X.col.mean()`, `len(X)`, ...)
+and their mergeable partial states.
+
+Every recognized reduction is an `Aggregate` over an operand - a row local
+expression like `X.col` or `X.a * X.b`. Partial states computed on parts of the
+data (chunks, partitions) can be merged and finalized into the same result the
+reduction gives on the whole data.
+"""
+import numpy as np
+import pandas as pd
+
+from . import sketches
+from .optimizer import column_reference, is_row_local
+from .symbolic_eval import Call, Expression, GetAttr, Symbol, to_callable
+
+
+def evaluate_operand(operand, df):
+    """Values of a row local operand on a dataframe as a series"""
+    name = column_reference(operand)
+    if name is not None:
+        return df[name]
+    values = to_callable(operand)(df)
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values, index=df.index)
+    return values
+
+
+def _group_values(operand, df, keys):
+    """Operand values grouped by `keys` (list of columns or an array of codes)"""
+    values = evaluate_operand(operand, df)
+    grouper = [df[k] for k in keys] if isinstance(keys, list) else keys
+    return values.groupby(grouper, sort=True)
+
+
+class Aggregate(object):
+    """
+    Reduction of an operand. `states` are the names of the partial state columns,
+    `merge_functions` tells how a state column of two partial results is combined
+    (used by the default `merge`), `function` is the pandas aggregation doing the
+    whole reduction at once (e.g. in `groupby.agg`), None when there is none and
+    the reduction is done by finalizing the partial state of all the data.
+    """
+    states = ()
+    merge_functions = {}
+    mergeable = True
+
+    def __init__(self, operand, **kwargs):
+        self.operand = operand
+        self.kwargs = kwargs
+
+    @property
+    def function(self):
+        raise NotImplementedError
+
+    def partial(self, df, keys):
+        """Partial state of the reduction for every group of `df`, indexed by the group keys"""
+        raise NotImplementedError
+
+    def merge(self, a, b):
+        """Combine two partial states (indexed by the group keys)"""
+        combined = pd.concat([a, b])
+        return combined.groupby(level=list(range(combined.index.nlevels)), sort=True).agg(self.merge_functions)
+
+    def finalize(self, state):
+        """Result of the reduction out of the partial state"""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.operand)
+
+
+class _Simple(Aggregate):
+    """Reduction which is its own partial state, merged with `merge_function`"""
+    merge_function = None
+
+    @property
+    def function(self):
+        return type(self).__name__.lower()
+
+    @property
+    def states(self):
+        return (self.function,)
+
+    @property
+    def merge_functions(self):
+        return {self.function: self.merge_function}
+
+    def partial(self, df, keys):
+        return _group_values(self.operand, df, keys).agg([self.function])
+
+    def finalize(self, state):
+        return state[self.function]
+
+
+class Sum(_Simple):
+    merge_function = 'sum'
+
+
+class Count(_Simple):
+    merge_function = 'sum'
+
+
+class Min(_Simple):
+    merge_function = 'min'
+
+
+class Max(_Simple):
+    merge_function = 'max'
+
+
+class Size(Aggregate):
+    """Number of rows (`len(X)`, `X.shape[0]`), the operand is not used"""
+    states = ('size',)
+    merge_functions = {'size': 'sum'}
+    function = 'size'
+
+    def partial(self, df, keys):
+        grouper = [df[k] for k in keys] if isinstance(keys, list) else keys
+        return pd.Series(np.ones(len(df), dtype=np.int64), index=df.index).groupby(grouper, sort=True).agg(['size'])
+
+    def finalize(self, state):
+        return state['size']
+
+
+class Mean(Aggregate):
+    states = ('sum', 'count')
+    merge_functions = {'sum': 'sum', 'count': 'sum'}
+    function = 'mean'
+
+    def partial(self, df, keys):
+        return _group_values(self.operand, df, keys).agg(['sum', 'count'])
+
+    def finalize(self, state):
+        return state['sum'] / state['count']
+
+
+class Var(Aggregate):
+    """Variance, merged with the parallel algorithm of Chan et al. on (count, mean, M2) states"""
+    states = ('count', 'mean', 'm2')
+    function = 'var'
+
+    @property
+    def ddof(self):
+        return self.kwargs.get('ddof', 1)
+
+    def partial(self, df, keys):
+        grouped = _group_values(self.operand, df, keys)
+        state = grouped.agg(['count', 'mean'])
+        state['m2'] = grouped.var(ddof=0) * state['count']
+        return state.fillna({'mean': 0.0, 'm2': 0.0})
+
+    def merge(self, a, b):
+        a, b = a.align(b, join='outer', fill_value=0)
+        count = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        weight = (b['count'] / count).fillna(0)
+        merged = pd.DataFrame({
+            'count': count,
+            'mean': a['mean'] + delta * weight,
+            'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * weight,
+        })
+        return merged.sort_index()
+
+    def finalize(self, state):
+        dof = state['count'] - self.ddof
+        return (state['m2'] / dof).where(dof > 0)
+
+
+class Std(Var):
+    function = 'std'
+
+    def finalize(self, state):
+        return np.sqrt(super().finalize(state))
+
+
+class _NotMergeable(_Simple):
+    """Reduction which is done exactly only on the whole data (no partial states)"""
+    mergeable = False
+
+
+class Nunique(_NotMergeable):
+    pass
+
+
+class Median(_NotMergeable):
+    pass
+
+
+def _group_codes(df, keys):
+    """Group number of every row of `df` (-1 for rows in no group) and the index of the group keys"""
+    if isinstance(keys, list):
+        grouped = df.groupby([df[k] for k in keys], sort=True)
+        codes = grouped.ngroup().fillna(-1).values.astype(np.int64)
+        return codes, grouped.size().index
+    codes, uniques = pd.factorize(keys, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def _state_codes(state):
+    codes, uniques = state.index.factorize(sort=True)
+    return codes, uniques.set_names(state.index.names)
+
+
+class _Sketch(Aggregate):
+    """
+    Approximate reduction of a mergeable sketch (see `sketches`). The state has a
+    row per sketch entry (a register, a centroid) indexed by the group keys.
+    """
+    function = None
+
+    def partial(self, df, keys):
+        codes, key_index = _group_codes(df, keys)
+        values = evaluate_operand(self.operand, df).values
+        grouped = codes >= 0
+        return self._state(self.sketch(codes[grouped], values[grouped]), key_index)
+
+    def merge(self, a, b):
+        combined = pd.concat([a, b])
+        codes, key_index = _state_codes(combined)
+        return self._state(self.combine(codes, *(combined[c].values for c in self.states)), key_index)
+
+    def finalize(self, state):
+        codes, key_index = _state_codes(state)
+        values = self.estimate(codes, *(state[c].values for c in self.states), n_groups=len(key_index))
+        return pd.Series(values, index=key_index)
+
+    def _state(self, entries, key_index):
+        codes, columns = entries[0], entries[1:]
+        return pd.DataFrame(dict(zip(self.states, columns)), index=key_index.take(codes))
+
+
+class ApproxNunique(_Sketch):
+    """`approx_nunique` - HyperLogLog registers"""
+    states = ('register', 'rank')
+
+    @property
+    def precision(self):
+        return self.kwargs.get('precision', 12)
+
+    def sketch(self, codes, values):
+        return sketches.hll_sketch(codes, values, self.precision)
+
+    def combine(self, codes, registers, ranks):
+        return sketches.hll_merge(codes, registers, ranks, self.precision)
+
+    def estimate(self, codes, registers, ranks, n_groups):
+        return sketches.hll_estimate(codes, ranks, n_groups, self.precision)
+
+
+class ApproxQuantile(_Sketch):
+    """`approx_quantile` - t-digest centroids"""
+    states = ('mean', 'weight')
+
+    @property
+    def compression(self):
+        return self.kwargs.get('compression', 100)
+
+    def sketch(self, codes, values):
+        return sketches.tdigest_sketch(codes, values, self.compression)
+
+    def combine(self, codes, means, weights):
+        return sketches.tdigest_merge(codes, means, weights, self.compression)
+
+    def estimate(self, codes, means, weights, n_groups):
+        return sketches.tdigest_quantile(codes, means, weights, self.kwargs.get('q', 0.5), n_groups)
+
+
+_sketches = {sketches.approx_nunique: ApproxNunique, sketches.approx_quantile: ApproxQuantile}
+
+_methods = {
+    'sum': Sum, 'count': Count, 'min': Min, 'max': Max, 'mean': Mean,
+    'var': Var, 'std': Std, 'nunique': Nunique, 'median': Median,
+}
+
+_method_kwargs = {'var': {'ddof'}, 'std': {'ddof'}}
+
+
+def _is_frame(obj):
+    return isinstance(obj, Symbol) and obj._name == 0
+
+
+def recognize(expr):
+    """
+    The `Aggregate` a summarize expression is, or None if it is not a recognized reduction.
+    Recognized are `<operand>.<method>()` for the methods sum, count, min, max, mean,
+    var, std, nunique, median (var/std with `ddof`), where the operand is a row local
+    expression of `X`, the number of rows as `len(X)` or `X.shape[0]` and the
+    approximate `approx_nunique(<operand>)`, `approx_quantile(<operand>, q)`.
+    """
+    if not isinstance(expr, Call):
+        return None
+    func = expr._func
+    if not isinstance(func, Expression) and func in _sketches:
+        if len(expr._args) != 1 or _is_frame(expr._args[0]) or not is_row_local(expr._args[0]):
+            return None
+        return _sketches[func](expr._args[0], **expr._kwargs)
+    if func is len and len(expr._args) == 1 and _is_frame(expr._args[0]) and not expr._kwargs:
+        return Size(None)
+    if isinstance(func, GetAttr) and func._name == '__getitem__' and len(expr._args) == 1 \
+            and isinstance(expr._args[0], int) and expr._args[0] == 0:
+        shape = func._obj
+        if isinstance(shape, GetAttr) and shape._name == 'shape' and _is_frame(shape._obj):
+            return Size(None)
+    if isinstance(func, GetAttr) and func._name in _methods and not expr._args:
+        if not set(expr._kwargs) <= _method_kwargs.get(func._name, set()):
+            return None
+        operand = func._obj
+        if _is_frame(operand) or not is_row_local(operand):
+            return None
+        return _methods[func._name](operand, **expr._kwargs)
+    return None
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Global execution options of ply-ng, the names and defaults are listed here
+_options = {
+    # share column buffers between the pipe stages instead of copying the whole
+    # dataframe on every `>>`, only columns written by a stage get new buffers (the
+    # result shares the untouched buffers with the input, writing into it in place
+    # with `.loc`/`.iloc` changes the input too)
+    'share_buffers': False,
+    # number of optimized plans (one per input schema) a compiled pipeline keeps
+    'plan_cache_size': 64,
+    # number of worker processes running the row local parts of pipe chains
+    'workers': 1,
+    # frames with fewer rows are not worth splitting between the workers
+    'parallel_min_rows': 100000,
+    # right frames of joins run on the workers with fewer rows are sent whole to
+    # every worker, larger ones are hash partitioned by the keys like the left frame
+    'broadcast_join_rows': 1000000,
+    # run the per group evaluation of grouped verbs on the worker processes too
+    # (the evaluated callables have to be safe to run in forked processes)
+    'parallel_group_apply': False,
+    # evaluator of arithmetic/comparison expressions over columns: 'python'
+    # (pandas operations) or 'numexpr' (one pass without temporaries, needs numexpr)
+    'expression_backend': 'python',
+    # frames with fewer rows are evaluated by pandas even with the numexpr backend
+    'numexpr_min_rows': 10000,
+    # bytes of memory grouped summaries may use, larger inputs are hash partitioned
+    # by the group keys into spill files and summarized partition by partition
+    'memory_budget': None,
+    # directory of the spill files (the system temporary directory by default)
+    'spill_directory': None,
+    # number of hash partitions of the spilled rows
+    'spill_partitions': 64,
+}
+
+
+def _check_option(name):
+    if name not in _options:
+        raise KeyError('Unknown ply-ng option (%s)' % name)
+
+
+# options set by `option_context`, they apply to the thread (or asyncio task) which
+# set them only, so pipelines running in other threads keep their options
+_context_options = ContextVar('ply_ng_options', default={})
+
+
+def get_option(name):
+    """Return current value of the ply-ng option `name`"""
+    _check_option(name)
+    overridden = _context_options.get()
+    return overridden[name] if name in overridden else _options[name]
+
+
+def set_option(name, value):
+    """
+    Set ply-ng option globally, for all the threads (options of an `option_context`
+    block stay in force in it).
+    Example:
+        set_option('share_buffers', True)
+    """
+    _check_option(name)
+    _options[name] = value
+
+
+@contextmanager
+def option_context(**kwargs):
+    """
+    Temporary set ply-ng options inside of the `with` block, only for the current
+    thread (other threads see the options as they were).
+    Example:
+        with option_context(share_buffers=True):
+            result = df >> select('x') >> mutate(y=X.x * 2)
+    """
+    for name in kwargs:
+        _check_option(name)
+    token = _context_options.set({**_context_options.get(), **kwargs})
+    try:
+        yield
+    finally:
+        _context_options.reset(token)
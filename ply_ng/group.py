@@ -1,32 +1,215 @@
+from ply_ng.config import get_option
 from ply_ng.pandas_pipe import pipe
 from ply_ng.symbolic_eval import *
 
+
+def _same_buffer(a, b):
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        return (a.__array_interface__['data'] == b.__array_interface__['data'] and
+                a.shape == b.shape and a.strides == b.strides and a.dtype == b.dtype)
+    return False
+
+
+_sorted_probe_rows = 4096
+
+
+def _run_codes(columns):
+    """
+    Group number of every row of key columns sorted lexicographically, counting the
+    runs of equal keys. None when the rows are not sorted or the keys can not be
+    compared (missing values, mixed types, extension arrays).
+    """
+    if not all(isinstance(c, np.ndarray) for c in columns):
+        return None
+    n = len(columns[0])
+    try:
+        # unsorted rows are usually told by the first rows already, before comparing all of them
+        head = columns[0][:_sorted_probe_rows]
+        if (head[1:] < head[:-1]).any():
+            return None
+    except TypeError:
+        return None
+    if any(pd.isna(c).any() for c in columns):
+        return None
+    # rows equal to the previous one in all the keys compared so far
+    same = np.ones(max(n - 1, 0), dtype=bool)
+    try:
+        for values in columns:
+            previous, current = values[:-1], values[1:]
+            if (current[same] < previous[same]).any():
+                return None
+            same &= np.asarray(current == previous, dtype=bool)
+    except TypeError:
+        return None
+    return np.concatenate([np.zeros(min(n, 1), dtype=np.int64), np.cumsum(~same, dtype=np.int64)])
+
+
+class GroupIndex(object):
+    """
+    Keys of `group_by` factorized once: the group number of every row (`codes`, the
+    groups are numbered in the order of the sorted keys), the rows ordered by group
+    (`order`) and the group boundaries in it (`offsets`). For rows sorted by the keys
+    the groups are the runs of rows (`sorted`) and the order is the rows themselves.
+    The index travels with the frame through the grouped verbs and is reused as long
+    as the frame has the same number of rows and the very same key column buffers
+    (verbs replace the columns they change, they do not write into them).
+    """
+
+    def __init__(self, keys, codes, n_groups, key_buffers, sorted=False):
+        self.keys = list(keys)
+        self.codes = codes
+        self.n_groups = n_groups
+        # the rows are sorted by the keys, every group is one run of rows
+        self.sorted = sorted
+        # kept referenced, so the buffers can not be freed and their memory reused
+        self._key_buffers = key_buffers
+        self._order = None
+        self._grouper = None
+
+    @classmethod
+    def build(cls, df, keys, sorted=False):
+        """
+        Factorize the `keys` columns of `df`, None when the rows can not be grouped
+        exactly like `groupby` does. Rows already sorted by the keys are numbered by
+        their runs in one linear pass without hashing, with `sorted` set the rows
+        have to be sorted (ValueError otherwise).
+        """
+        keys = list(keys)
+        if not keys or not all(isinstance(k, str) and k in df.columns for k in keys) or \
+                not df.columns.is_unique or \
+                any(isinstance(df[k].dtype, pd.CategoricalDtype) for k in keys):
+            return None
+        key_buffers = [df[k].values for k in keys]
+        codes = _run_codes(key_buffers)
+        if codes is not None:
+            return cls(keys, codes, int(codes[-1]) + 1 if len(codes) else 0, key_buffers, sorted=True)
+        if sorted and not any(pd.isna(b).any() for b in key_buffers):
+            raise ValueError('group_by(sorted=True): the rows are not sorted by %s' % ', '.join(keys))
+        codes = df.groupby(keys, sort=True).ngroup()
+        if codes.isna().any() or (codes < 0).any():  # rows with missing keys are in no group
+            return None
+        codes = codes.values.astype(np.int64)
+        n_groups = int(codes.max()) + 1 if len(codes) else 0
+        return cls(keys, codes, n_groups, key_buffers)
+
+    def rebind(self, df):
+        """The same index for a copy of the frame it is valid for"""
+        rebound = GroupIndex(self.keys, self.codes, self.n_groups, [df[k].values for k in self.keys], self.sorted)
+        rebound._order = self._order
+        rebound._grouper = self._grouper
+        return rebound
+
+    def valid_for(self, df):
+        grouped_by = getattr(df, '_grouped_by', None)
+        if grouped_by is None or len(grouped_by) != len(self.keys) or \
+                any(a != b for a, b in zip(grouped_by, self.keys)) or len(df) != len(self.codes):
+            return False
+        if not all(k in df.columns for k in self.keys) or not df.columns.is_unique:
+            return False
+        return all(_same_buffer(df[k].values, b) for k, b in zip(self.keys, self._key_buffers))
+
+    @property
+    def grouper(self):
+        """
+        The codes as a categorical, `groupby(index.grouper, observed=False)` groups by
+        them without hashing the keys again (every category is observed)
+        """
+        if self._grouper is None:
+            self._grouper = pd.Categorical.from_codes(self.codes, categories=pd.RangeIndex(self.n_groups))
+        return self._grouper
+
+    @property
+    def order(self):
+        """Positions of the rows ordered by group (stable within the group)"""
+        if self._order is None:
+            self._order = np.arange(len(self.codes)) if self.sorted else np.argsort(self.codes, kind='stable')
+        return self._order
+
+    @property
+    def offsets(self):
+        """Start of every group in `order`, plus the end of the last one"""
+        return np.concatenate([[0], np.cumsum(np.bincount(self.codes, minlength=self.n_groups))])
+
+    def key_values(self, df):
+        """Frame of the key values of every group, in the group order"""
+        first_rows = self.order[self.offsets[:-1]]
+        return df[self.keys].take(first_rows).reset_index(drop=True)
+
+
+def group_index(df):
+    """
+    `GroupIndex` of a grouped frame, the one attached to the frame while it is
+    still valid, otherwise a new one is built and attached. None when the frame is
+    not grouped or can not be grouped exactly.
+    """
+    grouped_by = getattr(df, '_grouped_by', None)
+    if not grouped_by:
+        return None
+    index = getattr(df, '_group_index', None)
+    if index is not None and index.valid_for(df):
+        return index
+    index = GroupIndex.build(df, grouped_by)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df._group_index = index
+    return index
+
+
 @pipe
-@symbolic_pipe_evaluation(eval_as_label=True)
-def group_by(df, *args):
-    df._grouped_by = list(args)
+@symbolic_pipe_evaluation(eval_as_label=['*'])
+def group_by(df, *args, sorted=False):
+    """
+    Group the rows by the key columns for the verbs which follow. Rows sorted by the
+    keys are detected and grouped by their runs, `sorted=True` tells they are sorted
+    (ValueError when they are not), which also lets a stream of chunks be summarized
+    group by group as the groups end.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df._grouped_by = list(args)
+        df._group_index = GroupIndex.build(df, args, sorted=sorted)
     return df
 
 
 @pipe
 def ungroup(df):
-    df._grouped_by = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df._grouped_by = None
+        df._group_index = None
     return df
 
 
 class GroupedEvaluationService(object):
 
-    def __init__(self, function):
+    def __init__(self, function, vectorized=None):
         """
-        usually we pass function here that evaluates symbolic expressions
+        usually we pass function here that evaluates symbolic expressions,
+        `vectorized(df, apply, args, kwargs)` computes the result for all the groups
+        at once (falling back to `apply` for the rest), it returns None when it can not
         """
         self.function = function
+        self.vectorized = vectorized
         self.__doc__ = function.__doc__
+        self.__name__ = getattr(function, '__name__', 'pipe')
 
     def _apply(self, df: pd.DataFrame, *args, **kwargs):
-        grouped = df.groupby(df._grouped_by) # grouped_by property is set in the group_by method
+        df_grouped = None
+        if get_option('parallel_group_apply') and get_option('workers') > 1 and \
+                len(df) >= get_option('parallel_min_rows'):
+            index = group_index(df)
+            if index is not None and index.n_groups > 1:
+                from ply_ng.parallel import apply_groups
+                df_grouped = apply_groups(df, index, self.function, args, kwargs)
 
-        df_grouped = grouped.apply(self.function, *args, **kwargs)
+        if df_grouped is None:
+            index = getattr(df, '_group_index', None)
+            # groups of sorted rows come in the order of the keys without sorting them
+            in_order = index is not None and index.sorted and index.valid_for(df)
+            grouped = df.groupby(df._grouped_by, sort=not in_order) # grouped_by property is set in the group_by method
+            df_grouped = grouped.apply(self.function, *args, **kwargs)
         # Save all the metadata attributes back into the new data frame
         for field in df._metadata:
             setattr(df_grouped, field, getattr(df, field))
@@ -47,21 +230,35 @@ class GroupedEvaluationService(object):
         if (grouped_by is None) or not all([g in args[0].columns for g in grouped_by]):
             return self.function(*args, **kwargs) #if not just apply the fynction to it's argument (it would be symbolic evaluation)
         else:
-            applied = self._apply(args[0], *args[1:], **kwargs)
+            applied = None
+            if self.vectorized is not None:
+                applied = self.vectorized(args[0], self._apply, args[1:], kwargs)
+            if applied is None:
+                applied = self._apply(args[0], *args[1:], **kwargs)
 
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
                 applied._grouped_by = grouped_by
+                # still valid when the verb kept the rows and the key columns
+                applied._group_index = getattr(args[0], '_group_index', None)
             
             return applied    
 
 
-def gr_pipe(func):
+def gr_pipe(func=None, vectorized=None):
     """
     Function to pipe apply symbolic avaluation to grouped dataframe.
+    `vectorized` is the optional implementation for all the groups at once, see
+    `GroupedEvaluationService`. Example:
+        @gr_pipe(vectorized=_summarize_groups)
+        def summarize(df, **kwargs):
+            ...
     """
+    if func is None:
+        return lambda f: gr_pipe(f, vectorized=vectorized)
     return pipe(
         GroupedEvaluationService(
-            symbolic_pipe_evaluation(func)
+            symbolic_pipe_evaluation(func),
+            vectorized=vectorized
         )
     )
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Grouped summaries kept up to date over append only data.
+
+Instead of summarizing the whole history again whenever new rows arrive, an
+`IncrementalSummary` keeps the merged partial states of mergeable reductions
+(see `aggregates`) per group, merges in the states of the new rows only and
+stores them in a file between runs. Refreshing costs the new rows plus the
+number of groups, not the rows of the history.
+"""
+import os
+
+import pandas as pd
+
+from .aggregates import recognize
+from .plan import describe
+from .streaming import StreamingSummary
+
+
+class IncrementalSummary(object):
+    """
+    `group_by(*keys) >> summarize(**aggregates)` updated with batches of new rows.
+    Every aggregate has to be a mergeable reduction (`sum`, `count`, `min`, `max`,
+    `mean`, `var`, `std`, `len(X)`, `approx_nunique`, `approx_quantile`). With
+    `path` the state is loaded from the file when it exists and saved to it after
+    every update.
+    Example:
+        sales = IncrementalSummary(['city'], path='sales.state', total=X.price.sum(), avg=X.price.mean())
+        sales.update(new_rows)
+        result = sales.result()
+    """
+
+    def __init__(self, keys=(), path=None, **aggregates):
+        not_mergeable = [name for name, value in aggregates.items()
+                         if recognize(value) is None or not recognize(value).mergeable]
+        if not aggregates or not_mergeable:
+            raise ValueError('incremental summary needs mergeable reductions, not: %s' % ', '.join(not_mergeable))
+        self.keys = list(keys)
+        self.path = path
+        self.definition = (tuple(self.keys), tuple((name, describe(value)) for name, value in aggregates.items()))
+        self.summary = StreamingSummary(aggregates)
+        self.summary.grouped_by = self.keys or None
+        self.rows = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def update(self, df):
+        """Merge the new rows into the state (and save it), returns self"""
+        missing = [k for k in self.keys if k not in df.columns]
+        if missing:
+            raise KeyError('missing group columns: %s' % ', '.join(missing))
+        self.summary.add(df, self.keys)
+        self.rows += len(df)
+        if self.path is not None:
+            self.save(self.path)
+        return self
+
+    def result(self):
+        """The summary of all the rows added so far"""
+        return self.summary.result()
+
+    def save(self, path):
+        """Write the state to `path`, replacing the file at once so a failed write keeps the old state"""
+        state = {'definition': self.definition, 'states': self.summary.states, 'rows': self.rows}
+        written = path + '.tmp'
+        pd.to_pickle(state, written)
+        os.replace(written, path)
+
+    def load(self, path):
+        """Read the state saved by `save`, it has to be of the same keys and aggregates"""
+        state = pd.read_pickle(path)
+        if state['definition'] != self.definition:
+            raise ValueError('%s holds the state of a different summary: %r' % (path, state['definition']))
+        self.summary.states = state['states']
+        self.rows = state['rows']
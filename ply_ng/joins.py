@@ -1,4 +1,6 @@
-from ply_ng.pandas_pipe import pipe
+from ply_ng.config import get_option
+from ply_ng.group import _same_buffer, _sorted_probe_rows
+from ply_ng.pandas_pipe import carry_attributes, pipe
 from ply_ng.symbolic_eval import *
 
 def _get_join_parameters(join_kw_args):
@@ -13,6 +15,415 @@ def _get_join_parameters(join_kw_args):
         left_on, right_on = by, by
     return left_on, right_on, suffixes
 
+
+def join_schema(left_columns, right_columns, left_on, right_on, suffixes):
+    """
+    Output columns of `DataFrame.merge` as a list of (name, side, source column),
+    where side is 'left' or 'right'
+    """
+    common_keys = {l for l, r in zip(left_on, right_on) if l == r}
+    overlap = (set(left_columns) & set(right_columns)) - common_keys
+    schema = [(c + suffixes[0] if c in overlap else c, 'left', c) for c in left_columns]
+    schema += [(c + suffixes[1] if c in overlap else c, 'right', c)
+               for c in right_columns if c not in common_keys]
+    return schema
+
+
+_join_strategies = (None, 'hash', 'merge', 'broadcast', 'partitioned')
+
+
+def _expand_matches(rows, starts, counts):
+    """
+    `rows` repeated once for every match along with the positions of the matches,
+    `starts`, `starts + 1`, ... A row without matches (`counts` 0) is kept once with
+    the position -1.
+    """
+    kept = np.maximum(counts, 1)
+    expanded = np.repeat(rows, kept)
+    within = np.arange(len(expanded)) - np.repeat(np.cumsum(kept) - kept, kept)
+    positions = np.repeat(starts, kept) + within
+    positions[np.repeat(counts == 0, kept)] = -1
+    return expanded, positions
+
+
+def _missing_as_nan(values):
+    """Object keys with all the missing values (None, NaN) as NaN, factorize makes them NaN too"""
+    if getattr(values, 'dtype', None) == object:
+        missing = pd.isna(values)
+        if missing.any():
+            return np.where(missing, np.nan, values)
+    return values
+
+
+def _hashed(index):
+    """`index` with its hash table built, pandas builds it lazily by the first lookup"""
+    index.get_indexer(index[:1])
+    return index
+
+
+class JoinIndex(object):
+    """
+    Hash index of the key columns of a frame, built once and probed by every join
+    against the frame. The keys are factorized key by key: `levels` holds for every
+    key the index of its distinct values and the index of the distinct (rows so far,
+    value) pairs, both hashed by pandas once. The rows with equal keys (`group`) are
+    listed in `order` (sorted when first needed) with the boundaries in `offsets`. Like `GroupIndex` it stays
+    valid as long as the frame has the same number of rows and the very same key
+    column buffers, values written into the key columns in place are not noticed.
+    """
+
+    def __init__(self, keys, levels, group, n_groups, key_buffers):
+        self.keys = list(keys)
+        self.levels = levels
+        self.group = group
+        self.n_groups = n_groups
+        # every row has its own keys, the group of a row is the row itself
+        self.unique = n_groups == len(group)
+        self._key_buffers = key_buffers
+        self.sizes = np.bincount(group, minlength=n_groups)
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)])
+        self._order = None
+
+    @property
+    def order(self):
+        """Positions of the rows ordered by their keys (stable), None when every row has its own keys"""
+        if self._order is None and not self.unique:
+            self._order = np.argsort(self.group, kind='stable')
+        return self._order
+
+    @classmethod
+    def build(cls, df, keys):
+        keys = list(keys)
+        missing = [k for k in keys if k not in df.columns]
+        if missing:
+            raise KeyError('join keys %s are not columns of the frame' % missing)
+        key_buffers = [df[k].values for k in keys]
+        group = np.zeros(len(df), dtype=np.int64)
+        levels = []
+        for i, k in enumerate(keys):
+            # missing values are keys as well, merge matches them with each other
+            codes, uniques = pd.factorize(df[k], use_na_sentinel=False)
+            codes = codes.astype(np.int64)
+            values = pd.Index(uniques)
+            if i == 0:
+                group, pairs = codes, None
+            else:
+                group, pairs = pd.factorize(group * len(values) + codes)
+                pairs = pd.Index(pairs)
+            levels.append((_hashed(values), pairs if pairs is None else _hashed(pairs)))
+        n_groups = int(group.max()) + 1 if len(group) else 0
+        return cls(keys, levels, group, n_groups, key_buffers)
+
+    def valid_for(self, df):
+        if len(df) != len(self.group) or not all(k in df.columns for k in self.keys):
+            return False
+        return all(_same_buffer(df[k].values, b) for k, b in zip(self.keys, self._key_buffers))
+
+    def lookup(self, key_columns):
+        """Group of the indexed rows with the keys of every probe row, -1 when there is none"""
+        group = None
+        for (values, pairs), column in zip(self.levels, key_columns):
+            codes = values.get_indexer(_missing_as_nan(column)).astype(np.int64)
+            if group is None:
+                group = codes
+                continue
+            combined = np.where((group < 0) | (codes < 0), -1, group * len(values) + codes)
+            group = pairs.get_indexer(combined).astype(np.int64)
+        return group
+
+    def probe(self, key_columns, how='inner'):
+        """
+        Positions of the joined rows `(probe rows, indexed rows)` in the order of
+        `DataFrame.merge`. A `'left'` join keeps the probe rows without a match,
+        their indexed position is -1.
+        """
+        group = self.lookup(key_columns)
+        matched = group >= 0
+        counts = np.zeros(len(group), dtype=np.int64)
+        counts[matched] = self.sizes[group[matched]]
+        if how == 'inner':
+            rows = np.arange(len(group))[matched]
+            # merge puts the rows with equal keys together, in the order the keys first appear
+            first_seen = pd.factorize(group[matched])[0]
+            if len(first_seen) and (np.diff(first_seen) < 0).any():
+                rows = rows[np.argsort(first_seen, kind='stable')]
+        else:
+            rows = np.arange(len(group))
+        group, counts = group[rows], counts[rows]
+        if self.unique:
+            # one indexed row per key, it is the group itself
+            return rows, group
+        probe_rows, positions = _expand_matches(rows, self.offsets[np.maximum(group, 0)], counts)
+        found = positions >= 0
+        positions[found] = self.order[positions[found]]
+        return probe_rows, positions
+
+
+def _sortable_keys(values):
+    """True for numbers or datetimes (numpy arrays) sorted ascending without missing values"""
+    if not isinstance(values, np.ndarray) or values.dtype.kind not in 'iufmM':
+        return False
+    # unsorted keys are usually told by the first rows already
+    head = values[:_sorted_probe_rows]
+    if (head[1:] < head[:-1]).any():
+        return False
+    if values.dtype.kind in 'fmM' and pd.isna(values).any():
+        return False
+    return not (values[1:] < values[:-1]).any()
+
+
+def _sort_merge_rows(left_keys, right_keys, how):
+    """
+    Positions of the joined rows `(left rows, right rows)` for keys sorted ascending,
+    in the order of `DataFrame.merge` (which is the order of the keys). The matches
+    of all the left keys are found by one vectorized binary search through the right
+    keys, no hash table is built. Rows of the outer side without a match have the
+    position -1 on the other side.
+    """
+    if how == 'right':
+        right_rows, left_rows = _sort_merge_rows(right_keys, left_keys, 'left')
+        return left_rows, right_rows
+    starts = np.searchsorted(right_keys, left_keys, side='left')
+    counts = np.searchsorted(right_keys, left_keys, side='right') - starts
+    rows = np.arange(len(left_keys))
+    if how == 'inner':
+        rows = rows[counts > 0]
+    return _expand_matches(rows, starts[rows], counts[rows])
+
+
+class IndexedFrame(object):
+    """
+    Frame with a `JoinIndex` on its `keys`, made with `indexed`. Inner and left joins
+    against it probe the index instead of hashing the whole frame again. The index is
+    rebuilt when the frame no longer matches it (rows or key columns replaced).
+    """
+
+    def __init__(self, frame, keys):
+        self.frame = frame
+        self.keys = list(keys)
+        self._index = JoinIndex.build(frame, self.keys)
+
+    @property
+    def index(self):
+        """The join index, rebuilt first when it is no longer valid for the frame"""
+        if not self._index.valid_for(self.frame):
+            self._index = JoinIndex.build(self.frame, self.keys)
+        return self._index
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __repr__(self):
+        return 'indexed(<DataFrame %d rows x %d columns>, by=%r)' % (self.frame.shape + (self.keys,))
+
+
+def indexed(df, by):
+    """
+    Index a lookup frame on its `by` key columns once, for many joins against it.
+    Example:
+    dim = indexed(customers, by='customer_id')
+    batch >> left_join(dim, by='customer_id')
+    batch >> inner_join(dim, by=('id', 'customer_id'))
+    batch >> left_join(dim) # joined on the index keys
+    """
+    keys = [by] if not isinstance(by, (list, tuple)) else list(by)
+    keys = [k.name if isinstance(k, pd.Series) else k
+            for k in (eval_if_symbolic(k, {0: df}) for k in keys)]
+    return IndexedFrame(df, keys)
+
+
+def _column_values(column):
+    return column.values if isinstance(column.dtype, np.dtype) else column.array
+
+
+def _take_columns(frame, columns, positions):
+    """
+    Values of the `columns` (positions) of `frame` at the row `positions`, missing
+    values at the positions -1 (the dtypes are upcast to hold them, like merge does)
+    """
+    fill = bool((positions < 0).any())
+    return [pd.api.extensions.take(_column_values(frame.iloc[:, i]), positions, allow_fill=fill)
+            for i in columns]
+
+
+def _same_categories(a, b):
+    return a == b or (not a.ordered and not b.ordered and a.categories.dtype == b.categories.dtype and
+                      set(a.categories) == set(b.categories))
+
+
+def _merge_key_dtypes(df1, df2, left_on, right_on):
+    """
+    The frames with the key columns cast the way merge does before joining:
+    categorical keys joined with other categories or with keys of another dtype
+    become the dtype of their categories, the other keys object. Merge names the
+    key after the left column, a right key of the same name is cast too.
+    """
+    casts = ({}, {})
+    for left_key, right_key in zip(left_on, right_on):
+        left_dtype, right_dtype = df1[left_key].dtype, df2[right_key].dtype
+        left_cat = isinstance(left_dtype, pd.CategoricalDtype)
+        right_cat = isinstance(right_dtype, pd.CategoricalDtype)
+        if not (left_cat or right_cat) or (left_cat and right_cat and _same_categories(left_dtype, right_dtype)):
+            continue
+        casts[0][left_key] = left_dtype.categories.dtype if left_cat else object
+        if right_key == left_key:
+            casts[1][right_key] = right_dtype.categories.dtype if right_cat else object
+    frames = []
+    for frame, cast in zip((df1, df2), casts):
+        if cast:
+            # only the cast columns are new, the rest is shared
+            frame = frame.copy(deep=False)
+            for name, dtype in cast.items():
+                frame[name] = frame[name].astype(dtype)
+        frames.append(frame)
+    return frames
+
+
+def _joined_frame(df1, df2, left_rows, right_rows, left_on, right_on, suffixes):
+    """Frame of the rows at the positions (-1 for no row) joined with the columns of `DataFrame.merge`"""
+    df1, df2 = _merge_key_dtypes(df1, df2, left_on, right_on)
+    schema = join_schema(list(df1.columns), list(df2.columns), left_on, right_on, suffixes)
+    right_sources = {source for _, side, source in schema if side == 'right'}
+    right_columns = [i for i, c in enumerate(df2.columns) if c in right_sources]
+    columns = _take_columns(df1, range(df1.shape[1]), left_rows)
+    no_left = left_rows < 0
+    if no_left.any():
+        # the shared key columns of the right rows without a left row get the right keys
+        for left_key, right_key in zip(left_on, right_on):
+            if left_key != right_key:
+                continue
+            i = df1.columns.get_loc(left_key)
+            keys = pd.Series(_take_columns(df2, [df2.columns.get_loc(right_key)], right_rows)[0])
+            if no_left.all():
+                columns[i] = keys.array
+            else:
+                left_keys = pd.Series(_take_columns(df1, [i], np.maximum(left_rows, 0))[0])
+                columns[i] = left_keys.mask(no_left, keys).array
+    columns += _take_columns(df2, right_columns, right_rows)
+    joined = pd.DataFrame(dict(enumerate(columns)), index=pd.RangeIndex(len(left_rows)))
+    joined.columns = [name for name, _, _ in schema]
+    return joined
+
+
+def key_lists(df1, df2, left_on, right_on):
+    """
+    The key columns `(left, right)` as lists, None unless all of them are columns of
+    the frames with unique string column names (the joins by row positions need them)
+    """
+    if left_on is None:
+        left_on = right_on = [c for c in df1.columns if c in df2.columns]
+    left_on = left_on if isinstance(left_on, list) else [left_on]
+    right_on = right_on if isinstance(right_on, list) else [right_on]
+    if not left_on or len(left_on) != len(right_on) or not df1.columns.is_unique or not df2.columns.is_unique:
+        return None
+    if not all(isinstance(c, str) for c in list(df1.columns) + list(df2.columns)) or \
+            not all(k in df1.columns for k in left_on) or not all(k in df2.columns for k in right_on):
+        return None
+    return left_on, right_on
+
+
+def _single_key(df1, df2, left_on, right_on):
+    """The key columns `(left, right)` of a join by one column, None for other joins"""
+    keys = key_lists(df1, df2, left_on, right_on)
+    return keys if keys is not None and len(keys[0]) == 1 else None
+
+
+def _sort_merge_join(df1, df2, how, left_on, right_on, suffixes, strategy):
+    """
+    Join of frames sorted by a single numeric or datetime key without hashing, None
+    when the frames are not sorted. `strategy='merge'` requires them to be (ValueError).
+    """
+    keys = _single_key(df1, df2, left_on, right_on)
+    if keys is not None:
+        left, right = df1[keys[0][0]], df2[keys[1][0]]
+        # keys of different dtypes (int and float, tz-aware and naive) are left to merge
+        left_keys, right_keys = left.values, right.values
+        if left.dtype == right.dtype and _sortable_keys(left_keys) and _sortable_keys(right_keys):
+            left_rows, right_rows = _sort_merge_rows(left_keys, right_keys, how)
+            return _joined_frame(df1, df2, left_rows, right_rows, keys[0], keys[1], suffixes)
+    if strategy == 'merge':
+        raise ValueError("strategy='merge' joins frames sorted by a single numeric or datetime key "
+                         "of the same dtype without missing values, the frames are not")
+    return None
+
+
+def _indexed_keys(right: IndexedFrame, kwargs):
+    """`(left_on, right_on, suffixes)` of a join against an indexed frame, the right keys are the index keys"""
+    keys = right.keys
+    if kwargs.get('by', None) is None:
+        left_on, right_on, suffixes = keys, keys, kwargs.get('suffixes', ('_x', '_y'))
+    else:
+        left_on, right_on, suffixes = _get_join_parameters(kwargs)
+        left_on = left_on if isinstance(left_on, list) else [left_on]
+        right_on = right_on if isinstance(right_on, list) else [right_on]
+        if len(right_on) != len(keys) or set(right_on) != set(keys):
+            raise ValueError('the right frame is indexed by %s, it can not be joined by %s' % (keys, right_on))
+        left_on = [left_on[right_on.index(k)] for k in keys]
+        right_on = keys
+    return left_on, right_on, suffixes
+
+
+def _indexed_join(df, right: IndexedFrame, how, left_on, right_on, suffixes):
+    left_rows, right_rows = right.index.probe([df[k].values for k in left_on], how)
+    return _joined_frame(df, right.frame, left_rows, right_rows, left_on, right_on, suffixes)
+
+
+def _reported(joined, strategy, partitions=1):
+    """The join result with the strategy it was made with in its `attrs`"""
+    joined.attrs['join_strategy'] = strategy
+    joined.attrs['join_partitions'] = partitions
+    return joined
+
+
+def _join_in_parallel(df1, df2, how, strategy):
+    if strategy in ('broadcast', 'partitioned'):
+        return True
+    return strategy is None and how != 'right' and get_option('workers') > 1 and \
+        len(df1) >= get_option('parallel_min_rows')
+
+
+def _join(df1, df2, how, kwargs):
+    """
+    Join with the strategy of `kwargs['strategy']`: 'hash' (`DataFrame.merge`),
+    'merge' (sort-merge of frames sorted by the key), 'broadcast' or 'partitioned'
+    (on the worker processes, see `parallel.parallel_join`) or None - an indexed
+    right frame is probed, frames sorted by a single numeric or datetime key are
+    sort-merged, large frames are joined on the workers when there are more of them,
+    the rest is hashed. The strategy used and the number of partitions are reported
+    in `attrs` of the result (`join_strategy`, `join_partitions`).
+    """
+    strategy = kwargs.get('strategy', None)
+    if strategy not in _join_strategies:
+        raise ValueError('join strategy has to be one of %s, got %r' % (_join_strategies, strategy))
+    in_parallel = _join_in_parallel(df1, df2, how, strategy)
+    if isinstance(df2, IndexedFrame) and how != 'right' and strategy in (None, 'broadcast'):
+        left_on, right_on, suffixes = _indexed_keys(df2, kwargs)
+        if not in_parallel:
+            return _reported(_indexed_join(df1, df2, how, left_on, right_on, suffixes), 'indexed')
+    else:
+        df2 = df2.frame if isinstance(df2, IndexedFrame) else df2
+        left_on, right_on, suffixes = _get_join_parameters(kwargs)
+        if strategy in (None, 'merge'):
+            joined = _sort_merge_join(df1, df2, how, left_on, right_on, suffixes, strategy)
+            if joined is not None:
+                return _reported(joined, 'merge')
+    if in_parallel:
+        from .parallel import parallel_join
+        joined = parallel_join(df1, df2, how, left_on, right_on, suffixes, strategy)
+        if joined is not None:
+            return joined
+        if strategy is not None:
+            raise ValueError("strategy=%r joins (inner and left) by key columns of the same dtypes "
+                             "in frames with unique string column names" % strategy)
+    if isinstance(df2, IndexedFrame):
+        return _reported(_indexed_join(df1, df2, how, left_on, right_on, suffixes), 'indexed')
+    return _reported(df1.merge(df2, how=how, left_on=left_on,
+                               right_on=right_on, suffixes=suffixes), 'hash')
+
 @pipe
 @symbolic_pipe_evaluation(eval_as_label=True)
 def inner_join(df1, df2, **kwargs):
@@ -21,10 +432,9 @@ def inner_join(df1, df2, **kwargs):
     a >> inner_join(b, by='x')
     a >> inner_join(b, by=['x', 'y', 'z'])
     a >> inner_join(b, by=[('x', 'x_from_b'), ('y', 'y_from_b')])
+    a >> inner_join(b, by='time', strategy='merge') # both sorted by time
     """
-    left_on, right_on, suffixes = _get_join_parameters(kwargs)
-    joined = df1.merge(df2, how='inner', left_on=left_on,
-                      right_on=right_on, suffixes=suffixes)
+    joined = _join(df1, df2, 'inner', kwargs)
     return joined    
 
 @pipe
@@ -36,9 +446,7 @@ def left_join(df1, df2, **kwargs):
     a >> left_join(b, by=['x', 'y', 'z'])
     a >> left_join(b, by=[('x', 'x_from_b'), ('y', 'y_from_b')])
     """
-    left_on, right_on, suffixes = _get_join_parameters(kwargs)
-    joined = df1.merge(df2, how='left', left_on=left_on,
-                      right_on=right_on, suffixes=suffixes)
+    joined = _join(df1, df2, 'left', kwargs)
     return joined        
 
 @pipe
@@ -50,7 +458,84 @@ def right_join(df1, df2, **kwargs):
     a >> right_join(b, by=['x', 'y', 'z'])
     a >> right_join(b, by=[('x', 'x_from_b'), ('y', 'y_from_b')])
     """
-    left_on, right_on, suffixes = _get_join_parameters(kwargs)
-    joined = df1.merge(df2, how='right', left_on=left_on,
-                      right_on=right_on, suffixes=suffixes)
-    return joined            
\ No newline at end of file
+    joined = _join(df1, df2, 'right', kwargs)
+    return joined
+
+
+@pipe
+@symbolic_pipe_evaluation(eval_as_label=['on', 'by'])
+def asof_join(df1, df2, on, by=None, tolerance=None, allow_exact_matches=True, direction='backward',
+              suffixes=('_x', '_y')):
+    """
+    Join every row with the right row of the nearest preceding `on` key (`direction`
+    'forward' the nearest following, 'nearest' either), among the right rows of
+    the same `by` keys and at most `tolerance` apart. Every left row is kept once
+    (like `left_join`), the rows do not have to be sorted by `on`.
+    Example:
+    trades >> asof_join(quotes, on='time', by='ticker')
+    trades >> asof_join(quotes, on=('time', 'quote_time'), by=[('ticker', 'symbol')],
+                        tolerance=pd.Timedelta('1s'))
+    """
+    left_on, right_on, _ = _get_join_parameters({'by': on})
+    if isinstance(left_on, list):
+        if len(left_on) != 1:
+            raise ValueError('asof_join is on a single column, got %s' % (left_on,))
+        left_on, right_on = left_on[0], right_on[0]
+    left_by, right_by = _get_join_parameters({'by': by})[:2] if by is not None else (None, None)
+    # merge_asof needs both frames sorted by the key, the left rows get their order back after
+    order = None
+    if not df1[left_on].is_monotonic_increasing:
+        order = np.argsort(df1[left_on].values, kind='stable')
+        df1 = df1.take(order)
+    if not df2[right_on].is_monotonic_increasing:
+        df2 = df2.take(np.argsort(df2[right_on].values, kind='stable'))
+    joined = pd.merge_asof(df1, df2, left_on=left_on, right_on=right_on, left_by=left_by, right_by=right_by,
+                           tolerance=tolerance, allow_exact_matches=allow_exact_matches,
+                           direction=direction, suffixes=suffixes)
+    if order is not None:
+        joined = joined.take(np.argsort(order)).reset_index(drop=True)
+    return joined
+
+
+def _key_mask(df1, df2, kwargs):
+    """True for the rows of `df1` with keys which are among the keys of the rows of `df2`"""
+    if isinstance(df2, IndexedFrame):
+        left_on, _, _ = _indexed_keys(df2, kwargs)
+        index = df2.index
+    else:
+        left_on, right_on, _ = _get_join_parameters(kwargs)
+        if left_on is None:
+            left_on = right_on = [c for c in df1.columns if c in df2.columns]
+        left_on = left_on if isinstance(left_on, list) else [left_on]
+        right_on = right_on if isinstance(right_on, list) else [right_on]
+        if len(left_on) == 1 and len(right_on) == 1:
+            # a set of the keys is all there is to hash
+            keys = pd.Series(_missing_as_nan(df2[right_on[0]].values))
+            return pd.Series(_missing_as_nan(df1[left_on[0]].values)).isin(keys).values
+        index = JoinIndex.build(df2, right_on)
+    return index.lookup([df1[k].values for k in left_on]) >= 0
+
+
+@pipe
+@symbolic_pipe_evaluation(eval_as_label=True)
+def semi_join(df1, df2, **kwargs):
+    """
+    Keep the rows with keys present in `df2`, every row once however many rows of
+    `df2` match it. No columns are added, grouping is kept.
+    Example:
+    a >> semi_join(b, by='x')
+    a >> semi_join(b, by=[('x', 'x_from_b'), (X.y, Y.y_from_b)])
+    """
+    return carry_attributes(df1, df1[_key_mask(df1, df2, kwargs)])
+
+
+@pipe
+@symbolic_pipe_evaluation(eval_as_label=True)
+def anti_join(df1, df2, **kwargs):
+    """
+    Keep the rows with keys absent from `df2`. No columns are added, grouping is kept.
+    Example:
+    a >> anti_join(b, by='x')
+    a >> anti_join(b, by=[('x', 'x_from_b'), (X.y, Y.y_from_b)])
+    """
+    return carry_attributes(df1, df1[~_key_mask(df1, df2, kwargs)])
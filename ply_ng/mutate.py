@@ -0,0 +1,58 @@
+import pandas as pd
+from ply_ng.group import gr_pipe, group_index
+from ply_ng.symbolic_eval import Expression
+
+
+def _mutate_groups(df, apply, args, kwargs):
+    """
+    Grouped mutate with the group relative expressions (`X.v - X.v.mean()`,
+    `X.v.cumsum()`, `X.v.shift()`, ...) evaluated for all the groups at once, the
+    other values are computed by `apply` per group. The rows keep their order.
+    None when no expression can be vectorized.
+    """
+    from ply_ng.transform import NotVectorized, evaluate_grouped
+
+    index = group_index(df)
+    if index is None or len(df) == 0:
+        return None
+    evaluated = {}
+    for name, value in kwargs.items():
+        if isinstance(value, Expression):
+            try:
+                evaluated[name] = evaluate_grouped(value, df, index)
+            except NotVectorized:
+                pass
+    if not evaluated:
+        return None
+
+    rest = {name: value for name, value in kwargs.items() if name not in evaluated}
+    names = list(kwargs)
+    after_evaluated = names[min(names.index(name) for name in evaluated):]
+    if any(callable(rest[name]) and not isinstance(rest[name], Expression) for name in after_evaluated
+           if name in rest):
+        # callables see the columns assigned before them, the evaluated ones would be missing
+        return None
+    if rest and not df.index.is_unique:
+        # the rows applied per group could not be matched with the evaluated values
+        return None
+    mutated = apply(df, **rest) if rest else df.copy(deep=False)
+    aligned = mutated.index.equals(df.index)
+    for name, values in evaluated.items():
+        # rows applied per group may come in another order, they are matched by the labels
+        mutated[name] = values if aligned or not isinstance(values, pd.Series) else values.reindex(mutated.index)
+    # columns in the order the assignments in mutate create them
+    columns = list(df.columns) + [name for name in kwargs if name not in df.columns]
+    return mutated if list(mutated.columns) == columns else mutated[columns]
+
+
+@gr_pipe(vectorized=_mutate_groups) #should work on groups as well as ungrouped data
+def mutate(df, **kwargs):
+    """
+    Emulating Dplyr mutate. Assigning new values to a dataframe 
+    """
+    # shallow copy, assigned columns replace the old ones so other column buffers are shared
+    mutated = df.copy(deep=False)
+    for column_name, column_value in kwargs.items():
+        mutated[column_name] = column_value(mutated) if callable(column_value) else column_value
+
+    return mutated
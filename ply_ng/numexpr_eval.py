@@ -0,0 +1,180 @@
+"""
+Optional numexpr backend of symbolic expressions.
+
+Arithmetic, comparison and boolean operations over columns of a frame and numeric
+constants, e.g. `X.a * X.b + X.c > 3`, are translated into a numexpr expression
+string when they are compiled. With the `expression_backend` option set to
+'numexpr' such expressions are evaluated by numexpr in one multithreaded pass
+over the column buffers without the intermediate arrays pandas allocates for
+every operation. Whenever the data does not fit numexpr (columns missing, other
+dtypes than bool/int64/float64, bitwise operations over numbers, small frames)
+the expression is evaluated by the usual interpreter.
+"""
+import pandas as pd
+import numpy as np
+
+from .config import get_option
+from .symbolic_eval import Call, GetAttr, Symbol
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+_arithmetic = {'__add__': '+', '__sub__': '-', '__mul__': '*', '__truediv__': '/'}
+_reflected = {'__radd__': '+', '__rsub__': '-', '__rmul__': '*', '__rtruediv__': '/'}
+_comparison = {'__eq__': '==', '__ne__': '!=', '__lt__': '<', '__le__': '<=', '__gt__': '>', '__ge__': '>='}
+_logical = {'__and__': '&', '__or__': '|'}
+
+# numpy dtypes numexpr computes with exactly the way pandas does
+_dtypes = {np.dtype(np.bool_): 'bool', np.dtype(np.int64): 'number', np.dtype(np.float64): 'number'}
+
+# returned by `NumexprExpression.evaluate` when the interpreter has to be used
+_fallback = object()
+
+
+class _Translation(object):
+    """State of the translation: columns met so far and number of operations"""
+
+    def __init__(self):
+        self.columns = []
+        self.operations = 0
+
+    def variable(self, symbol, name):
+        column = (symbol, name)
+        if column not in self.columns:
+            self.columns.append(column)
+        return 'v%d' % self.columns.index(column)
+
+
+def _column(expr):
+    """(symbol, column name) of `X.col` or `X['col']`, None for anything else"""
+    if isinstance(expr, GetAttr) and isinstance(expr._obj, Symbol) and isinstance(expr._name, str) \
+            and not hasattr(pd.DataFrame, expr._name):
+        return expr._obj._name, expr._name
+    if isinstance(expr, Call) and isinstance(expr._func, GetAttr) and expr._func._name == '__getitem__' \
+            and isinstance(expr._func._obj, Symbol) and len(expr._args) == 1 and not expr._kwargs \
+            and isinstance(expr._args[0], str):
+        return expr._func._obj._name, expr._args[0]
+    return None
+
+
+def _translate(expr, translation):
+    """
+    Node of the expression tree as ('column', variable) / ('constant', source) /
+    (operator, node, node) / (unary operator, node), None when it can not be translated
+    """
+    column = _column(expr)
+    if column is not None:
+        return 'column', translation.variable(*column)
+    if isinstance(expr, (int, float)) and not isinstance(expr, bool):
+        # inf and nan have no literal in the numexpr source
+        if isinstance(expr, float) and not np.isfinite(expr):
+            return None
+        return 'constant', repr(expr)
+    if not isinstance(expr, Call) or not isinstance(expr._func, GetAttr) or expr._kwargs:
+        return None
+    name = expr._func._name
+    if not isinstance(name, str):
+        return None
+    if len(expr._args) == 0 and name in ('__neg__', '__invert__'):
+        operand = _translate(expr._func._obj, translation)
+        translation.operations += 1
+        return operand and ({'__neg__': '-', '__invert__': '~'}[name], operand)
+    if len(expr._args) != 1:
+        return None
+    left, right = expr._func._obj, expr._args[0]
+    if name in _reflected:
+        left, right = right, left
+    operator = {**_arithmetic, **_reflected, **_comparison, **_logical}.get(name)
+    if operator is None:
+        return None
+    left, right = _translate(left, translation), _translate(right, translation)
+    translation.operations += 1
+    return left and right and (operator, left, right)
+
+
+def _source(node):
+    if node[0] in ('column', 'constant'):
+        return node[1]
+    if len(node) == 2:
+        return '(%s%s)' % (node[0], _source(node[1]))
+    return '(%s %s %s)' % (_source(node[1]), node[0], _source(node[2]))
+
+
+def _kind(node, kinds):
+    """'bool' or 'number' of a node given kinds of the columns, None if numexpr does not fit"""
+    if node[0] == 'column':
+        return kinds[node[1]]
+    if node[0] == 'constant':
+        return 'number'
+    operands = [_kind(n, kinds) for n in node[1:]]
+    if None in operands:
+        return None
+    if node[0] in ('&', '|', '~'):
+        return 'bool' if all(k == 'bool' for k in operands) else None
+    if any(k != 'number' for k in operands):
+        return None
+    return 'bool' if node[0] in _comparison.values() else 'number'
+
+
+class NumexprExpression(object):
+    """Symbolic expression translated into numexpr source over column variables"""
+
+    def __init__(self, tree, columns):
+        self.tree = tree
+        self.columns = columns
+        self.source = _source(tree)
+
+    def evaluate(self, context):
+        """Result of the expression as a series, `_fallback` when numexpr can not evaluate it"""
+        symbols = {symbol for symbol, _ in self.columns}
+        if len(symbols) != 1:
+            return _fallback
+        df = context.get(symbols.pop())
+        if not isinstance(df, pd.DataFrame) or len(df) < get_option('numexpr_min_rows'):
+            return _fallback
+        arrays, kinds = {}, {}
+        for i, (_, name) in enumerate(self.columns):
+            if name not in df.columns or not df.columns.is_unique:
+                return _fallback
+            values = df[name].values
+            kind = _dtypes.get(getattr(values, 'dtype', None))
+            if kind is None or not isinstance(values, np.ndarray):
+                return _fallback
+            arrays['v%d' % i], kinds['v%d' % i] = values, kind
+        if _kind(self.tree, kinds) is None:
+            return _fallback
+        result = numexpr.evaluate(self.source, local_dict=arrays)
+        # named like the pandas result: by the column when there is only one
+        name = self.columns[0][1] if len(self.columns) == 1 else None
+        return pd.Series(result, index=df.index, name=name)
+
+
+def translate(expr):
+    """`NumexprExpression` of a symbolic expression, None if it is not worth or possible to translate"""
+    translation = _Translation()
+    tree = _translate(expr, translation)
+    if tree is None or translation.operations < 2 or not translation.columns:
+        return None
+    return NumexprExpression(tree, translation.columns)
+
+
+def compile_numexpr(expr, interpreted):
+    """
+    Compiled function of a `Call` expression trying the numexpr backend first
+    (when it is enabled), `interpreted` is the function of the usual interpreter
+    """
+    translated = translate(expr)
+    if translated is None:
+        return interpreted
+
+    def evaluate(context):
+        if get_option('expression_backend') == 'numexpr':
+            if numexpr is None:
+                raise ImportError('numexpr expression backend requires the numexpr package')
+            result = translated.evaluate(context)
+            if result is not _fallback:
+                return result
+        return interpreted(context)
+    return evaluate
@@ -0,0 +1,488 @@
+"""
+Rule based optimizer of logical plans.
+
+Two rewrites are applied:
+    * predicate pushdown - `filter_by` nodes are moved in front of the verbs that do
+      not change the rows they look at (mutate, select, group_by) and in front of the
+      joins, or into the right dataframe of a join, so fewer rows are processed.
+    * projection pushdown - columns which are not read by any later verb are dropped
+      right at the source and from the right dataframes of the joins.
+Rewrites are only done when the columns a verb reads and writes can be told from
+its arguments, anything opaque (lambdas, `X.shape`, unknown verbs) stops them.
+The optimized plan returns the same rows, only the row labels may differ when a
+filter is moved in front of a join (merge renumbers the rows). The rows also come
+in the same order, except for inner joins with a filter of the left rows moved in
+front of them: merge puts the rows of equal keys together in the order the keys
+first appear, and the filter may remove the first appearance of a key.
+"""
+import numpy as np
+import pandas as pd
+
+from .group import group_by, ungroup
+from .joins import (IndexedFrame, anti_join, asof_join, inner_join, join_schema, left_join, right_join,
+                    semi_join, _get_join_parameters)
+from .mutate import mutate
+from .plan import LogicalPlan, PlanNode
+from .select import drop, select
+from .subset import filter_by, head, tail
+from .summarize import summarize
+from .symbolic_eval import Call, Expression, GetAttr, Symbol
+
+_known_verbs = {
+    'select': select, 'drop': drop, 'filter_by': filter_by, 'mutate': mutate,
+    'group_by': group_by, 'ungroup': ungroup, 'summarize': summarize,
+    'inner_join': inner_join, 'left_join': left_join, 'right_join': right_join, 'asof_join': asof_join,
+    'semi_join': semi_join, 'anti_join': anti_join,
+    'head': head, 'tail': tail,
+}
+
+# operators and methods which compute every output row from the same input row only
+_elementwise_operators = {
+    '__abs__', '__add__', '__and__', '__eq__', '__floordiv__', '__ge__', '__gt__',
+    '__invert__', '__le__', '__lt__', '__mod__', '__mul__', '__ne__', '__neg__',
+    '__or__', '__pos__', '__pow__', '__radd__', '__rand__', '__rfloordiv__',
+    '__rmod__', '__rmul__', '__ror__', '__rpow__', '__rsub__', '__rtruediv__',
+    '__rxor__', '__sub__', '__truediv__', '__xor__',
+}
+
+_elementwise_methods = {
+    'abs', 'astype', 'between', 'clip', 'isin', 'isna', 'isnull', 'notna',
+    'notnull', 'round',
+}
+
+
+def verb_kind(node):
+    """Name of the ply-ng verb of a plan node, None for the user defined pipes"""
+    for kind, verb in _known_verbs.items():
+        if node.source is verb:
+            return kind
+    return None
+
+
+def column_reference(obj):
+    """Name of the column if `obj` is a plain column reference (`X.col`, `X['col']`)"""
+    if isinstance(obj, GetAttr) and isinstance(obj._obj, Symbol) and obj._obj._name == 0:
+        if not hasattr(pd.DataFrame, obj._name):
+            return obj._name
+    if isinstance(obj, Call) and isinstance(obj._func, GetAttr) and obj._func._name == '__getitem__':
+        frame = obj._func._obj
+        if isinstance(frame, Symbol) and frame._name == 0 and len(obj._args) == 1 and not obj._kwargs:
+            if isinstance(obj._args[0], str):
+                return obj._args[0]
+    return None
+
+
+def _union(sets):
+    result = set()
+    for s in sets:
+        if s is None:
+            return None
+        result |= s
+    return result
+
+
+def columns_read(obj):
+    """Set of the columns of `X` an argument reads when evaluated, None if it can not be told"""
+    name = column_reference(obj)
+    if name is not None:
+        return {name}
+    if isinstance(obj, GetAttr):
+        return columns_read(obj._obj)
+    if isinstance(obj, Call):
+        return _union(columns_read(o) for o in [obj._func, *obj._args, *obj._kwargs.values()])
+    if isinstance(obj, (list, tuple)):
+        return _union(columns_read(o) for o in obj)
+    if isinstance(obj, (Expression, pd.Series, pd.DataFrame, np.ndarray)) or callable(obj):
+        return None
+    return set()
+
+
+def is_row_local(obj):
+    """True if every row of the evaluated `obj` depends only on the same row of `X`"""
+    if column_reference(obj) is not None:
+        return True
+    if isinstance(obj, Call):
+        func = obj._func
+        if not (isinstance(func, GetAttr) and
+                (func._name in _elementwise_operators or func._name in _elementwise_methods)):
+            return False
+        return (is_row_local(func._obj) and
+                all(_is_row_local_argument(a) for a in obj._args) and
+                all(_is_row_local_argument(v) for v in obj._kwargs.values()))
+    if isinstance(obj, Expression):
+        return False
+    # constants are broadcast to every row, lists and arrays have their own length
+    return pd.api.types.is_scalar(obj)
+
+
+def _is_row_local_argument(obj):
+    """Arguments of elementwise calls may also be lists of constants, e.g. `X.x.isin([1, 2])`"""
+    if isinstance(obj, (list, tuple)):
+        return all(_is_row_local_argument(o) for o in obj)
+    return is_row_local(obj)
+
+
+def _all_row_local(objs):
+    return all(is_row_local(o) for o in objs)
+
+
+def is_row_local_verb(node, grouped=False):
+    """
+    True if every output row of the verb is computed from a single input row, so the
+    verb can run on parts of the rows separately (chunks, partitions)
+    """
+    kind = verb_kind(node)
+    if kind in ('select', 'drop'):
+        return not grouped
+    if kind == 'filter_by':
+        return _all_row_local(node.args)
+    if kind in ('semi_join', 'anti_join'):
+        return True
+    if kind == 'mutate':
+        return (not grouped and not node.args and 'index' not in node.kwargs and
+                _all_row_local(node.kwargs.values()))
+    return kind in ('group_by', 'ungroup', 'inner_join', 'left_join', 'asof_join')
+
+
+def grouped_after(node, grouped):
+    """Whether the data is grouped after a row local verb"""
+    kind = verb_kind(node)
+    if kind == 'group_by':
+        return True
+    if kind in ('ungroup', 'inner_join', 'left_join', 'asof_join'):
+        return False
+    return grouped
+
+
+def static_label(arg, columns=None):
+    """Column label of a label argument (`'col'`, `X.col`, `Y.col`, position), None if unknown"""
+    if isinstance(arg, str):
+        return arg
+    if isinstance(arg, (int, np.integer)) and not isinstance(arg, bool) and columns is not None:
+        return columns[arg] if -len(columns) <= arg < len(columns) else None
+    if isinstance(arg, GetAttr) and isinstance(arg._obj, Symbol) and not arg._inverted:
+        if not hasattr(pd.DataFrame, arg._name):
+            return arg._name
+    if isinstance(arg, Call) and isinstance(arg._func, GetAttr) and arg._func._name == '__getitem__':
+        if isinstance(arg._func._obj, Symbol) and len(arg._args) == 1 and isinstance(arg._args[0], str):
+            return arg._args[0]
+    return None
+
+
+def _static_by(by):
+    if isinstance(by, (list, tuple)):
+        labels = [_static_by(b) for b in by]
+        if any(l is None for l in labels):
+            return None
+        return type(by)(labels)
+    return static_label(by)
+
+
+def join_keys(node, left_columns):
+    """Resolved (left_on, right_on, suffixes) of a join node, None if they are symbolic in unknown way"""
+    right = node.args[0] if node.args else None
+    if not isinstance(right, (pd.DataFrame, IndexedFrame)):
+        return None
+    by = node.kwargs.get('by', None)
+    if by is None and isinstance(right, IndexedFrame) and verb_kind(node) != 'right_join':
+        # joined on the keys the frame is indexed by
+        left_on = right_on = list(right.keys)
+        suffixes = node.kwargs.get('suffixes', ('_x', '_y'))
+    elif by is None:
+        left_on = right_on = [c for c in left_columns if c in right.columns]
+        suffixes = node.kwargs.get('suffixes', ('_x', '_y'))
+    else:
+        by = _static_by(by)
+        if by is None:
+            return None
+        left_on, right_on, suffixes = _get_join_parameters(dict(node.kwargs, by=by))
+        left_on = left_on if isinstance(left_on, list) else [left_on]
+        right_on = right_on if isinstance(right_on, list) else [right_on]
+    if not all(isinstance(s, str) for s in suffixes):
+        return None
+    return left_on, right_on, suffixes
+
+
+def _static_selection(node, columns):
+    """Columns selected (in order) by a select/drop node with only plain column selectors"""
+    labels = []
+    for arg in node.args:
+        if isinstance(arg, str) and (arg == '*' or arg.startswith('-')):
+            return None
+        label = static_label(arg, columns)
+        if label is None or label not in columns:
+            return None
+        if label not in labels:
+            labels.append(label)
+    if node.kwargs:
+        return None
+    if verb_kind(node) == 'drop':
+        return [c for c in columns if c not in labels]
+    return labels if labels else list(columns)
+
+
+def _output_state(node, state):
+    """
+    Columns and grouping after a node, given columns and grouping before it.
+    Returns None when the verb or its arguments are opaque for the optimizer.
+    """
+    columns, grouped_by = state
+    kind = verb_kind(node)
+    if kind in ('select', 'drop'):
+        if grouped_by:
+            return None
+        selected = _static_selection(node, columns)
+        return None if selected is None else (selected, None)
+    if kind in ('filter_by', 'semi_join', 'anti_join'):
+        return columns, grouped_by
+    if kind == 'mutate':
+        if node.args:
+            return None
+        new_columns = [k for k in node.kwargs if k not in columns and k != 'index']
+        return columns + new_columns, grouped_by
+    if kind == 'group_by':
+        keys = [static_label(a, columns) for a in node.args]
+        if any(k is None or k not in columns for k in keys) or set(node.kwargs) - {'sorted'}:
+            return None
+        return columns, keys
+    if kind == 'ungroup':
+        return columns, None
+    if kind == 'summarize':
+        names = list(node.kwargs)
+        if node.args or 'index' in names or (grouped_by and set(grouped_by) & set(names)):
+            return None
+        return (list(grouped_by or []) + names), grouped_by
+    if kind in ('head', 'tail'):
+        return columns, None
+    if kind in ('inner_join', 'left_join', 'right_join'):
+        keys = join_keys(node, columns)
+        if keys is None:
+            return None
+        right_columns = list(node.args[0].columns)
+        if not all(isinstance(c, str) for c in columns + right_columns):
+            return None
+        return [name for name, _, _ in join_schema(columns, right_columns, *keys)], None
+    return None
+
+
+def infer_states(nodes, columns, grouped_by=None):
+    """(columns, grouping) before every node and after the last one, None once they are unknown"""
+    states = [(list(columns), grouped_by)]
+    for node in nodes:
+        state = states[-1]
+        states.append(None if state is None else _output_state(node, state))
+    return states
+
+
+def _filter_reads(node):
+    return _union(columns_read(c) for c in node.args)
+
+
+def _push_filter(filter_node, node, state):
+    """
+    Try to evaluate `filter_node` before `node`.
+    Returns the list of nodes replacing the (node, filter_node) pair or None.
+    """
+    reads = _filter_reads(filter_node)
+    kind = verb_kind(node)
+    if reads is None or filter_node.kwargs:
+        return None
+    if kind in ('select', 'drop'):
+        # the filter has to read only the columns the projection keeps
+        output = _output_state(node, state) if state is not None else None
+        if output is None or not reads <= set(output[0]):
+            return None
+        return [filter_node, node]
+    if kind in ('group_by', 'ungroup', 'filter_by', 'semi_join', 'anti_join'):
+        # a condition like `X.b >= X.b.mean()` depends on the rows (and groups) it sees,
+        # both when it is moved and when the rows it sees are filtered first
+        if not _all_row_local(filter_node.args) or (kind == 'filter_by' and not _all_row_local(node.args)):
+            return None
+        return [filter_node, node]
+    if kind == 'mutate':
+        written = set(node.kwargs)
+        if 'index' in written or node.args or reads & written:
+            return None
+        if not _all_row_local(node.kwargs.values()):
+            return None
+        return [filter_node, node]
+    if kind in ('inner_join', 'left_join', 'right_join') and state is not None:
+        if not _all_row_local(filter_node.args):
+            return None
+        columns = state[0]
+        keys = join_keys(node, columns)
+        if keys is None:
+            return None
+        right = node.args[0]
+        sides = {name: (side, source)
+                 for name, side, source in join_schema(columns, list(right.columns), *keys)}
+        if not reads or not all(r in sides and sides[r][1] == r for r in reads):
+            return None
+        read_sides = {sides[r][0] for r in reads}
+        if read_sides == {'left'} and kind in ('inner_join', 'left_join'):
+            return [filter_node, node]
+        # an indexed frame keeps its rows, filtering them would drop the index
+        if read_sides == {'right'} and kind in ('inner_join', 'right_join') and isinstance(right, pd.DataFrame):
+            filtered_right = filter_node.run(right)
+            return [node.rebind(filtered_right, *node.args[1:], **node.kwargs)]
+    return None
+
+
+def _split_filters(nodes):
+    """filter_by(a, b) is filter_by(a) >> filter_by(b) when the conditions are row local"""
+    split = []
+    for node in nodes:
+        if verb_kind(node) == 'filter_by' and len(node.args) > 1 and _all_row_local(node.args):
+            split.extend(node.rebind(condition) for condition in node.args)
+        else:
+            split.append(node)
+    return split
+
+
+def _merge_filters(nodes):
+    """Merge consecutive row local filters back into a single filter_by"""
+    merged = []
+    for node in nodes:
+        previous = merged[-1] if merged else None
+        if (previous is not None and verb_kind(node) == 'filter_by' and verb_kind(previous) == 'filter_by'
+                and _all_row_local(node.args) and _all_row_local(previous.args)):
+            merged[-1] = node.rebind(*previous.args, *node.args)
+        else:
+            merged.append(node)
+    return merged
+
+
+def push_down_predicates(nodes, columns, grouped_by=None):
+    nodes = _split_filters(nodes)
+    i = 0
+    while i < len(nodes):
+        absorbed = False
+        if verb_kind(nodes[i]) == 'filter_by':
+            j = i
+            while j > 0 and not absorbed:
+                state = infer_states(nodes[:j - 1], columns, grouped_by)[-1]
+                pushed = _push_filter(nodes[j], nodes[j - 1], state)
+                if pushed is None:
+                    break
+                nodes[j - 1:j + 1] = pushed
+                absorbed = len(pushed) == 1 # filter went into the right dataframe of a join
+                j -= 1
+        if not absorbed:
+            i += 1
+    return _merge_filters(nodes)
+
+
+def _required_before(node, required, state_in, state_out):
+    """
+    Columns needed before `node` given the columns needed after it (None means all).
+    Returns (node possibly rewritten, required columns, keep node)
+    """
+    kind = verb_kind(node)
+    if state_in is None or state_out is None:
+        return node, None, True
+    columns, grouped_by = state_in
+    required_out = set(required) if required is not None else set(state_out[0])
+
+    if kind in ('select', 'drop'):
+        selected = [c for c in state_out[0] if c in required_out] or state_out[0]
+        if selected == columns and not grouped_by:
+            return node, set(selected), False
+        # (`==` on symbolic arguments builds expressions, so compare only plain names)
+        if kind == 'drop' or not all(isinstance(a, str) for a in node.args) or list(node.args) != selected:
+            # positions and dropped columns may disappear when columns are pruned
+            # before this node, select only the needed columns by names instead
+            node = PlanNode(select(*selected))
+        return node, set(selected), True
+    if kind == 'filter_by':
+        reads = _filter_reads(node)
+        return node, None if reads is None else required_out | reads, True
+    if kind in ('semi_join', 'anti_join'):
+        keys = join_keys(node, columns)
+        return node, None if keys is None else required_out | set(keys[0]), True
+    if kind == 'mutate':
+        kwargs = node.kwargs
+        if required is not None:
+            kwargs = {k: v for k, v in kwargs.items() if k in required or k == 'index'}
+        reads = _union(columns_read(v) for v in kwargs.values())
+        if reads is None:
+            return node, None, True
+        if not kwargs and not grouped_by:
+            return node, required_out, False
+        if len(kwargs) != len(node.kwargs):
+            node = node.rebind(**kwargs)
+        # overwritten columns keep their position, so the earlier values are needed as well
+        return node, (required_out - (set(node.kwargs) - set(columns))) | reads, True
+    if kind == 'group_by':
+        return node, required_out | set(state_out[1]), True
+    if kind in ('ungroup', 'head', 'tail'):
+        return node, required_out, True
+    if kind == 'summarize':
+        reads = _union(columns_read(v) for v in node.kwargs.values())
+        if reads is None:
+            return node, None, True
+        return node, reads | set(grouped_by or []), True
+    if kind in ('inner_join', 'left_join', 'right_join'):
+        left_on, right_on, suffixes = join_keys(node, columns)
+        right = node.args[0]
+        common_keys = {l for l, r in zip(left_on, right_on) if l == r}
+        overlap = (set(columns) & set(right.columns)) - common_keys
+        needed = {'left': set(left_on) | overlap, 'right': set(right_on) | overlap}
+        for name, side, source in join_schema(columns, list(right.columns), left_on, right_on, suffixes):
+            if name in required_out:
+                needed[side].add(source)
+        right_columns = [c for c in right.columns if c in needed['right']]
+        if len(right_columns) < len(right.columns) and isinstance(right, pd.DataFrame):
+            node = node.rebind(right[right_columns], *node.args[1:], **node.kwargs)
+        return node, needed['left'], True
+    return node, None, True
+
+
+def push_down_projections(nodes, columns, grouped_by=None):
+    states = infer_states(nodes, columns, grouped_by)
+    required = None
+    optimized = []
+    for i in reversed(range(len(nodes))):
+        node, required, keep = _required_before(nodes[i], required, states[i], states[i + 1])
+        if keep:
+            optimized.insert(0, node)
+
+    starts_with_select = optimized and verb_kind(optimized[0]) == 'select'
+    if (required is not None and not grouped_by and not starts_with_select
+            and all(isinstance(c, str) for c in columns)):
+        kept = [c for c in columns if c in required]
+        if kept and len(kept) < len(columns):
+            optimized.insert(0, PlanNode(select(*kept)))
+    return optimized
+
+
+def resolve_labels(nodes, columns, grouped_by=None):
+    """
+    Replace symbolic and positional labels of select, drop, group_by and join verbs
+    by the column names they resolve to for the given input columns
+    """
+    states = infer_states(nodes, columns, grouped_by)
+    resolved = []
+    for node, state, state_out in zip(nodes, states, states[1:]):
+        kind = verb_kind(node)
+        if state is None or state_out is None or all(isinstance(a, str) for a in node.args):
+            pass
+        elif kind in ('select', 'drop') and state_out[0]:
+            node = PlanNode(select(*state_out[0]))
+        elif kind == 'group_by':
+            node = node.rebind(*state_out[1], **node.kwargs)
+        if state is not None and kind in ('inner_join', 'left_join', 'right_join') and 'by' in node.kwargs:
+            by = _static_by(node.kwargs['by'])
+            if by is not None:
+                node = node.rebind(*node.args, **dict(node.kwargs, by=by))
+        resolved.append(node)
+    return resolved
+
+
+def optimize(plan: LogicalPlan, columns, grouped_by=None):
+    """
+    Optimize a logical plan which will be executed on a dataframe with `columns`
+    (grouped by `grouped_by`). Returns the new plan, the original one is not changed.
+    """
+    nodes = push_down_predicates(plan.nodes, list(columns), grouped_by)
+    nodes = push_down_projections(nodes, list(columns), grouped_by)
+    return LogicalPlan(nodes)
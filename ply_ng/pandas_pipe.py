@@ -1,35 +1,122 @@
+import copy
 import warnings
 import pandas as pd
 import numpy as np
 
+from .config import get_option
+
+# ply-ng attributes attached to the dataframes travelling through a pipe chain
+_ply_attributes = ['_grouped_by', '_group_index']
+
+
+def carry_attributes(source, target):
+    """Copy ply-ng attributes (grouping etc.) from `source` frame to the `target` frame"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name in _ply_attributes:
+            setattr(target, name, getattr(source, name, None))
+    return target
+
+
+def take_ownership(df):
+    """
+    Create a frame owned by the pipe chain out of the caller's frame,
+    verbs are free to attach attributes and assign columns to it.
+    With the `share_buffers` option only a new frame object is created and column
+    buffers are shared with the caller's frame. Verbs never write into existing buffers,
+    they replace the columns they change, so the caller's frame stays untouched by the
+    chain (but not by in place writes into the result).
+    """
+    owned = carry_attributes(df, df.copy(deep=not get_option('share_buffers')))
+    group_index = getattr(df, '_group_index', None)
+    if group_index is not None and group_index.valid_for(df):
+        # the copy has the same keys in the same rows, the factorized keys stay valid
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            owned._group_index = group_index.rebind(owned)
+    return owned
+
+
+def run_owned(p, df):
+    """
+    Apply the first pipe of a chain to the caller's frame `df`. Verbs which only read
+    their input (`reads_only`, e.g. `select`) run on it directly and just their
+    result is taken over, the other verbs get the input taken over first.
+    """
+    if p.reads_only and not getattr(df, '_grouped_by', None):
+        return take_ownership(carry_attributes(df, p.function(df)))
+    return p.function(take_ownership(df))
+
+
 class pipe(object):
     __name__ = "pipe"
 
-    def __init__(self, function):
+    def __init__(self, function, verb=None, args=(), kwargs=None, source=None, reads_only=False):
         self.function = function
         self.__doc__ = function.__doc__
+        # the verb never modifies the frame it gets, it returns a new one
+        self.reads_only = reads_only
 
-        self.chained_pipes = []
+        # description of the verb this pipe applies, used to build logical plans
+        self.verb = verb or getattr(function, '__name__', 'pipe')
+        self.args = args
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.source = source # the verb pipe this one was bound from by calling it
+
+        self.chained_pipes = ()
 
     def __rshift__(self, other):
+        # pipes are immutable values, chaining creates a new pipe so the parts can be reused
         assert isinstance(other, pipe)
-        self.chained_pipes.append(other)
-        return self
+        chained = copy.copy(self)
+        chained.chained_pipes = self.chained_pipes + (other,)
+        return chained
 
     def __rrshift__(self, other):
-        other_copy = other.copy()
-
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            other_copy._grouped_by = getattr(other, '_grouped_by', None)
+        if get_option('workers') > 1:
+            # parallel execution works on the whole plan of the chain
+            return self.plan.execute(other)
+        result = run_owned(self, other)
+        for p in self.chained_pipes:
+            result = p._run(result)
+        return result
 
-        result = self.function(other_copy)
+    def _run(self, df):
+        result = self.function(df)
 
+        # intermediate results are owned by the chain, no need to copy them again
         for p in self.chained_pipes:
-            result = p.__rrshift__(result)
+            result = p._run(result)
         return result
 
     def __call__(self, *args, **kwargs):
-        return pipe(lambda x: self.function(x, *args, **kwargs))
+        return pipe(lambda x: self.function(x, *args, **kwargs),
+                    verb=self.verb, args=args, kwargs=kwargs, source=self, reads_only=self.reads_only)
+
+    @property
+    def plan(self):
+        """Logical plan of this pipe and all the pipes chained to it"""
+        from .plan import LogicalPlan
+        return LogicalPlan.from_pipe(self)
+
+    def explain(self):
+        """Print the logical plan of the pipe chain"""
+        self.plan.explain()
+
+    def explain_analyze(self, df, as_frame=False):
+        """
+        Run the pipe chain on `df` printing its plan annotated with wall and cpu time,
+        rows and columns in/out, allocated memory and copies of every stage.
+        Returns the measurements as a dataframe instead when `as_frame` is set.
+        """
+        return self.plan.explain_analyze(df, as_frame=as_frame)
+
+    def compile(self):
+        """
+        Compile the pipe chain to be run many times on frames of the same schema,
+        see `CompiledPipeline`
+        """
+        from .plan import CompiledPipeline
+        return CompiledPipeline(self.plan)
+
 
-        
\ No newline at end of file
@@ -89,17 +89,22 @@ def _ply_mutate(self, *args, **kwargs):
     Args:
         
     """
-    input_columns = set(self.columns)
-
-    # Creating copy of a dataframe, wasteful????
-    mutated_df = self[input_columns] #copy previous dataframe
+    # shallow copy, new columns replace the old ones so the original frame stays untouched
+    mutated_df = self.copy(deep=False)
 
     # Temporarily disable SettingWithCopyWarning, as setting columns on a
     # copy (`to_return`) is intended here.
     with pandas.option_context('mode.chained_assignment', None):
 
+        # symbolic values are evaluated together, common subexpressions only once
+        symbolic = [k for k, v in kwargs.items() if isinstance(v, se.Expression)]
+        shared = dict(zip(symbolic, se.evaluate_shared([kwargs[k] for k in symbolic], {0: self})))
+
         for column_name, column_value in kwargs.items():
-            evaluated_value = se.to_callable(column_value)(self) #creates callable out of expression and takes DF as a context?
+            if column_name in shared:
+                evaluated_value = shared[column_name]
+            else:
+                evaluated_value = se.to_callable(column_value)(self) #creates callable out of expression and takes DF as a context?
             # TODO: verify that evaluated_value is a series!
             if column_name == 'index':
                 mutated_df.index = evaluated_value
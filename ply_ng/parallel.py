@@ -0,0 +1,337 @@
+"""
+Multi-core execution of the row local segments of logical plans.
+
+A run of row local verbs (select, drop, filter_by and mutate with row local
+expressions, group_by/ungroup) is executed on row partitions of the frame by a
+pool of worker processes and the results are concatenated back in order. Workers
+are forked, so they see the input frame (and the plan with its lambdas) without
+pickling - memory pages of the column buffers are shared by the operating system
+until written. Only the results are sent back. Where forking is not available
+threads are used instead.
+
+Joins of large frames run on the workers as well (`parallel_join`): a small right
+frame is broadcast to the workers joining slices of the left frame, otherwise both
+frames are hash partitioned by the keys and the workers join pairs of partitions.
+The workers send back only row positions, the result is put together once.
+"""
+import contextvars
+import itertools
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.pool import MaybeEncodingError
+
+import numpy as np
+import pandas as pd
+
+from .config import get_option, option_context
+from .joins import IndexedFrame, JoinIndex, _column_values, _joined_frame, _reported, key_lists
+from .optimizer import grouped_after, is_row_local_verb, verb_kind
+from .pandas_pipe import _ply_attributes, carry_attributes, take_ownership
+
+# jobs visible to the forked workers, keyed by job id
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_ids = itertools.count()
+
+
+def _run_nodes(nodes, df):
+    for node in nodes:
+        df = node.run(df)
+    return df
+
+
+def _run_task(task):
+    job_id, worker, arguments = task
+    return worker(_jobs[job_id], arguments)
+
+
+def _run_partition(job, bounds):
+    nodes, df = job
+    start, stop = bounds
+    part = carry_attributes(df, df.iloc[start:stop])
+    result = _run_nodes(nodes, part)
+    # ply attributes are not pickled with the frame, they are sent along
+    return result, {name: getattr(result, name, None) for name in _ply_attributes}
+
+
+def partition_bounds(n_rows, n_partitions):
+    """(start, stop) row bounds of `n_partitions` nearly equal partitions"""
+    edges = np.linspace(0, n_rows, n_partitions + 1).astype(int)
+    return [(start, stop) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def map_partitions(function, tasks, n_workers):
+    """
+    Run `function` over `tasks` on forked worker processes (threads where fork is
+    not available), results are returned in the order of the tasks
+    """
+    if multiprocessing.current_process().daemon:
+        # inside of a pool worker already, which can not start processes
+        return [function(task) for task in tasks]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+            return pool.map(function, tasks)
+    # the threads run with the options of the caller
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(n_workers) as executor:
+        return list(executor.map(lambda task: context.copy().run(function, task), tasks))
+
+
+def run_job(job, worker, tasks, n_workers):
+    """
+    Run `worker(job, task)` for every task on the pool of `n_workers`, the `job` data
+    is shared with the forked workers without pickling, `worker` has to be a module
+    level function
+    """
+    job_id = next(_job_ids)
+    with _jobs_lock:
+        _jobs[job_id] = job
+    try:
+        return map_partitions(_run_task, [(job_id, worker, task) for task in tasks], n_workers)
+    finally:
+        with _jobs_lock:
+            del _jobs[job_id]
+
+
+def run_partitioned(nodes, df, n_workers):
+    """Run row local `nodes` on row partitions of `df` in parallel and concatenate the results"""
+    results = run_job((nodes, df), _run_partition, partition_bounds(len(df), n_workers), n_workers)
+    combined = pd.concat([part for part, _ in results])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name, value in results[-1][1].items():
+            setattr(combined, name, value)
+    return combined
+
+
+def balanced_batches(sizes, n_batches):
+    """
+    Split groups of the given sizes into at most `n_batches` batches of about the
+    same total size (the largest groups are placed first, each into the smallest
+    batch so far), lists of group numbers in increasing order
+    """
+    loads = np.zeros(min(n_batches, len(sizes)), dtype=np.int64)
+    batches = [[] for _ in loads]
+    for group in np.argsort(-np.asarray(sizes), kind='stable'):
+        smallest = int(np.argmin(loads))
+        batches[smallest].append(int(group))
+        loads[smallest] += sizes[group]
+    return [sorted(batch) for batch in batches if batch]
+
+
+def _apply_batch(job, positions):
+    df, keys, function, args, kwargs = job
+    batch = df.take(positions)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return batch.groupby(keys).apply(function, *args, **kwargs)
+
+
+def apply_groups(df, index, function, args=(), kwargs=None, n_workers=None):
+    """
+    `df.groupby(keys).apply(function, ...)` with the groups split into balanced
+    batches applied on `n_workers` processes. The results are put back into the
+    order of the serial apply. None when the result of the batches can not be put
+    together the way pandas would (then the groups have to be applied serially).
+    """
+    n_workers = n_workers or get_option('workers')
+    offsets = index.offsets
+    sizes = np.diff(offsets)
+    batches = balanced_batches(sizes, n_workers)
+    if len(batches) < 2:
+        return None
+    positions = [np.sort(np.concatenate([index.order[offsets[g]:offsets[g + 1]] for g in batch]))
+                 for batch in batches]
+    job = (df, index.keys, function, args, kwargs or {})
+    try:
+        results = run_job(job, _apply_batch, positions, n_workers)
+    except MaybeEncodingError:  # results which can not be sent back from the workers
+        return None
+
+    if not all(isinstance(r, (pd.DataFrame, pd.Series)) for r in results):
+        return None
+    if all(r.index.equals(df.index[p]) for r, p in zip(results, positions)):
+        # transform like results (same rows as the groups) come in the order of the rows
+        combined = pd.concat(results)
+        return combined.take(np.argsort(np.concatenate(positions), kind='stable'))
+    n_keys = len(index.keys)
+    if not all(r.index.nlevels >= n_keys and list(r.index.names[:n_keys]) == index.keys for r in results):
+        return None
+    # results prefixed with the group keys come in the order of the groups
+    combined = pd.concat(results)
+    key_index = pd.MultiIndex.from_frame(index.key_values(df))
+    result_keys = pd.MultiIndex.from_arrays([combined.index.get_level_values(i) for i in range(n_keys)])
+    codes = key_index.get_indexer(result_keys)
+    if (codes < 0).any():
+        return None
+    return combined.take(np.argsort(codes, kind='stable'))
+
+
+def _hash_partitions(job, task):
+    frames, n_partitions = job
+    side, start, stop = task
+    frame, keys = frames[side]
+    hashes = pd.util.hash_pandas_object(frame.iloc[start:stop][keys], index=False).values
+    return (hashes % np.uint64(n_partitions)).astype(np.int16)
+
+
+def _partition_rows(partitions, n_partitions):
+    """Rows ordered by partition (in the row order within it) and the partition boundaries"""
+    order = np.argsort(partitions, kind='stable')
+    return order, np.concatenate([[0], np.cumsum(np.bincount(partitions, minlength=n_partitions))])
+
+
+def _first_rows(groups, left_rows):
+    """
+    For inner join positions in the order of `JoinIndex.probe` (rows of equal keys
+    together) the first left row of the key of every row
+    """
+    starts = np.ones(len(groups), dtype=bool)
+    starts[1:] = groups[1:] != groups[:-1]
+    return left_rows[np.maximum.accumulate(np.where(starts, np.arange(len(groups)), 0))]
+
+
+def _join_partition(job, partition):
+    df1, left_on, df2, right_on, how, left_partitions, right_partitions = job
+    (left_order, left_offsets), (right_order, right_offsets) = left_partitions, right_partitions
+    left_rows = left_order[left_offsets[partition]:left_offsets[partition + 1]]
+    right_rows = right_order[right_offsets[partition]:right_offsets[partition + 1]]
+    right_keys = pd.DataFrame({i: _column_values(df2[k])[right_rows] for i, k in enumerate(right_on)})
+    index = JoinIndex.build(right_keys, range(len(right_on)))
+    probe_rows, matches = index.probe([_column_values(df1[k])[left_rows] for k in left_on], how)
+    found = matches >= 0
+    matched_rows = np.full(len(matches), -1, dtype=np.int64)
+    matched_rows[found] = right_rows[matches[found]]
+    first_rows = _first_rows(index.group[matches], left_rows[probe_rows]) if how == 'inner' else None
+    return left_rows[probe_rows], matched_rows, first_rows
+
+
+def _join_slice(job, bounds):
+    df1, left_on, index, how = job
+    start, stop = bounds
+    probe_rows, matches = index.probe([_column_values(df1[k])[start:stop] for k in left_on], how)
+    if how != 'inner':
+        return probe_rows + start, matches, None
+    # the first left row of every key in the slice, the first in the frame is the least of them
+    groups = index.group[matches]
+    first_rows = _first_rows(groups, probe_rows + start)
+    return probe_rows + start, matches, (groups, first_rows)
+
+
+def parallel_join(df1, df2, how, left_on, right_on, suffixes, strategy=None, n_workers=None):
+    """
+    Inner or left join on `n_workers` processes, the result is the one of `DataFrame.merge`.
+    'broadcast' - every worker joins a slice of the left rows with the whole right
+    frame, whose `JoinIndex` is built once (or is the one of an `IndexedFrame`, which
+    is always broadcast).
+    'partitioned' - the rows of both frames are hash partitioned by the keys and
+    every worker joins the rows of a partition. Without a `strategy` frames with
+    fewer right rows than the `broadcast_join_rows` option are broadcast, frames
+    joined by object keys are always broadcast. None when
+    the join can not be done this way (right join, keys of different dtypes, column
+    names which are not unique strings).
+    """
+    n_workers = n_workers or get_option('workers')
+    right = df2.frame if isinstance(df2, IndexedFrame) else df2
+    keys = key_lists(df1, right, left_on, right_on)
+    if how not in ('inner', 'left') or keys is None:
+        return None
+    left_on, right_on = keys
+    if strategy is None:
+        # an indexed frame is broadcast with its index whatever its size
+        small = isinstance(df2, IndexedFrame) or len(right) < get_option('broadcast_join_rows')
+        strategy = 'broadcast' if small else 'partitioned'
+    if strategy == 'partitioned' and any(df1[k].dtype == object for k in left_on):
+        # equal objects (1 and 1.0) have different hashes, the join index matches them
+        strategy = 'broadcast'
+
+    if strategy == 'broadcast':
+        index = df2.index if isinstance(df2, IndexedFrame) else JoinIndex.build(right, right_on)
+        bounds = partition_bounds(len(df1), n_workers)
+        results = run_job((df1, left_on, index, how), _join_slice, bounds, n_workers)
+        n_partitions = len(bounds)
+    else:
+        if any(df1[l].dtype != right[r].dtype for l, r in zip(left_on, right_on)):
+            # equal keys of different dtypes may not have equal hashes
+            return None
+        n_partitions = n_workers
+        frames = {'left': (df1, left_on), 'right': (right, right_on)}
+        tasks = [(side, start, stop) for side, (frame, _) in frames.items()
+                 for start, stop in partition_bounds(len(frame), n_workers)]
+        hashed = run_job((frames, n_partitions), _hash_partitions, tasks, n_workers)
+        sides = [np.concatenate([h for h, t in zip(hashed, tasks) if t[0] == side] or [np.zeros(0, np.int16)])
+                 for side in frames]
+        job = (df1, left_on, right, right_on, how) + tuple(_partition_rows(p, n_partitions) for p in sides)
+        results = run_job(job, _join_partition, range(n_partitions), n_workers)
+
+    left_rows = np.concatenate([r[0] for r in results])
+    right_rows = np.concatenate([r[1] for r in results])
+    if how == 'inner':
+        # merge puts the rows of equal keys together in the order the keys first appear,
+        # then the left rows in their order
+        if strategy == 'broadcast':
+            first = np.full(index.n_groups, len(df1), dtype=np.int64)
+            for _, _, (groups, slice_first_rows) in results:
+                np.minimum.at(first, groups, slice_first_rows)
+            first_rows = np.concatenate([first[groups] for _, _, (groups, _) in results])
+        else:
+            first_rows = np.concatenate([r[2] for r in results])
+        order = np.argsort(first_rows * max(len(df1), 1) + left_rows, kind='stable')
+    elif strategy == 'partitioned':
+        # every partition comes in the order of the left rows, the right rows of a left row in their order
+        order = np.argsort(left_rows, kind='stable')
+    else:
+        order = None
+    if order is not None:
+        left_rows, right_rows = left_rows[order], right_rows[order]
+    joined = _joined_frame(df1, right, left_rows, right_rows, left_on, right_on, suffixes)
+    return _reported(joined, strategy, n_partitions)
+
+
+def _segments(nodes, grouped):
+    """Split nodes into (parallel, nodes) runs, joins are not split by rows (they run on the workers themselves)"""
+    segments = []
+    for node in nodes:
+        parallel = is_row_local_verb(node, grouped) and verb_kind(node) not in (
+            'inner_join', 'left_join', 'asof_join', 'semi_join', 'anti_join')
+        grouped = grouped_after(node, grouped)
+        if segments and segments[-1][0] == parallel:
+            segments[-1][1].append(node)
+        else:
+            segments.append((parallel, [node]))
+    return segments
+
+
+def execute_parallel(plan, df, n_workers=None):
+    """
+    Execute a logical plan running its row local segments on `n_workers` processes.
+    The result is the same as of the serial execution.
+    """
+    n_workers = n_workers or get_option('workers')
+    result = take_ownership(df)
+    for parallel, nodes in _segments(plan.nodes, bool(getattr(df, '_grouped_by', None))):
+        worth_it = any(verb_kind(n) not in ('group_by', 'ungroup') for n in nodes)
+        if parallel and worth_it and len(result) >= get_option('parallel_min_rows') and n_workers > 1:
+            result = run_partitioned(nodes, result, n_workers)
+        else:
+            result = _run_nodes(nodes, result)
+    return result
+
+
+def parallel(n_workers=None, group_apply=False):
+    """
+    Context manager running the row local parts of pipe chains on `n_workers`
+    processes (all the cores by default). With `group_apply` the per group
+    evaluation of grouped verbs (callables, expressions which are not vectorized)
+    runs on the processes as well, the groups are split into batches of about the
+    same number of rows.
+    Example:
+        with parallel(16):
+            result = df >> (filter_by(X.x > 0) >> mutate(y=X.x * 2) >> select('y'))
+        with parallel(8, group_apply=True):
+            result = df >> group_by('customer') >> summarize(model=fit_model)
+    """
+    return option_context(workers=n_workers or os.cpu_count(), parallel_group_apply=group_apply)
@@ -0,0 +1,279 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .config import get_option
+from .pandas_pipe import pipe, run_owned, take_ownership
+from .symbolic_eval import Call, Expression, GetAttr, Symbol
+
+# operators printed in the infix form by `describe`
+_binary_operators = {
+    '__add__': '+', '__sub__': '-', '__mul__': '*', '__truediv__': '/',
+    '__floordiv__': '//', '__mod__': '%', '__pow__': '**', '__and__': '&',
+    '__or__': '|', '__xor__': '^', '__eq__': '==', '__ne__': '!=',
+    '__lt__': '<', '__le__': '<=', '__gt__': '>', '__ge__': '>=',
+    '__lshift__': '<<', '__rshift__': '>>',
+}
+
+_reflected_operators = {
+    '__radd__': '+', '__rsub__': '-', '__rmul__': '*', '__rtruediv__': '/',
+    '__rfloordiv__': '//', '__rmod__': '%', '__rpow__': '**', '__rand__': '&',
+    '__ror__': '|', '__rxor__': '^', '__rlshift__': '<<', '__rrshift__': '>>',
+}
+
+_unary_operators = {'__neg__': '-', '__pos__': '+', '__invert__': '~'}
+
+_symbol_names = {0: 'X', 1: 'Y'}
+
+
+def describe(obj):
+    """
+    Human readable representation of a verb argument, symbolic expressions are
+    printed the way they are written, e.g. `X.x + 1` instead of the nested `Call`s
+    """
+    if isinstance(obj, Symbol):
+        name = _symbol_names.get(obj._name, repr(obj))
+        return '~' + name if obj.inverted else name
+    if isinstance(obj, GetAttr):
+        described = '%s.%s' % (describe(obj._obj), obj._name)
+        return '~' + described if obj._inverted else described
+    if isinstance(obj, Call):
+        func = obj._func
+        if isinstance(func, GetAttr) and func._name in _binary_operators and len(obj._args) == 1:
+            return '(%s %s %s)' % (describe(func._obj), _binary_operators[func._name], describe(obj._args[0]))
+        if isinstance(func, GetAttr) and func._name in _reflected_operators and len(obj._args) == 1:
+            return '(%s %s %s)' % (describe(obj._args[0]), _reflected_operators[func._name], describe(func._obj))
+        if isinstance(func, GetAttr) and func._name in _unary_operators and len(obj._args) == 0:
+            return '%s%s' % (_unary_operators[func._name], describe(func._obj))
+        if isinstance(func, GetAttr) and func._name == '__getitem__' and len(obj._args) == 1:
+            return '%s[%s]' % (describe(func._obj), describe(obj._args[0]))
+        return '%s(%s)' % (describe(func), _describe_arguments(obj._args, obj._kwargs))
+    if isinstance(obj, Expression):
+        return repr(obj)
+    if isinstance(obj, pd.DataFrame):
+        return '<DataFrame %d rows x %d columns>' % obj.shape
+    if isinstance(obj, pd.Series):
+        return '<Series %s, %d rows>' % (repr(obj.name), len(obj))
+    if isinstance(obj, list):
+        return '[%s]' % ', '.join(describe(o) for o in obj)
+    if isinstance(obj, tuple):
+        return '(%s%s)' % (', '.join(describe(o) for o in obj), ',' if len(obj) == 1 else '')
+    if callable(obj):
+        return getattr(obj, '__name__', repr(obj))
+    return repr(obj)
+
+
+def _describe_arguments(args, kwargs):
+    described = [describe(a) for a in args]
+    described += ['%s=%s' % (k, describe(v)) for k, v in kwargs.items()]
+    return ', '.join(described)
+
+
+def describe_call(name, args, kwargs):
+    """Human readable call of a verb, e.g. `select('x', X.y)`"""
+    return '%s(%s)' % (name, _describe_arguments(args, kwargs))
+
+
+class PlanNode(object):
+    """
+    One verb of the logical plan, e.g. `select('x', 'y')`.
+    `stage` is the bound pipe which is applied to the data when the plan is executed.
+    """
+
+    def __init__(self, stage: pipe):
+        self.stage = stage
+
+    @property
+    def verb(self):
+        return self.stage.verb
+
+    @property
+    def args(self):
+        return self.stage.args
+
+    @property
+    def kwargs(self):
+        return self.stage.kwargs
+
+    @property
+    def source(self):
+        """The verb pipe which produced this node (e.g. `select`), the stage itself when it was not called"""
+        return self.stage.source if self.stage.source is not None else self.stage
+
+    def rebind(self, *args, **kwargs):
+        """New node for the same verb with different arguments"""
+        return PlanNode(self.source(*args, **kwargs))
+
+    def run(self, df):
+        return self.stage.function(df)
+
+    def __repr__(self):
+        return describe_call(self.verb, self.args, self.kwargs)
+
+
+class LogicalPlan(object):
+    """
+    Ordered sequence of verbs built with the `>>` operator. Nothing is evaluated
+    until the plan is executed on a dataframe.
+    """
+
+    def __init__(self, nodes=()):
+        self.nodes = tuple(nodes)
+
+    @classmethod
+    def from_pipe(cls, p: pipe):
+        nodes = [PlanNode(p)]
+        for chained in p.chained_pipes:
+            nodes.extend(cls.from_pipe(chained).nodes)
+        return cls(nodes)
+
+    def __add__(self, other):
+        return LogicalPlan(self.nodes + other.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def execute(self, df, profiler=None):
+        """Run the plan on `df`, every stage is measured when a `Profiler` is given"""
+        if profiler is None and get_option('workers') > 1:
+            from .parallel import execute_parallel
+            return execute_parallel(self, df)
+        if profiler is None:
+            if not self.nodes:
+                return take_ownership(df)
+            result = run_owned(self.nodes[0].stage, df)
+            for node in self.nodes[1:]:
+                result = node.run(result)
+            return result
+
+        result = profiler.run('source', take_ownership, df)
+        for node in self.nodes:
+            result = profiler.run(repr(node), node.run, result)
+        return result
+
+    def explain_analyze(self, df, as_frame=False):
+        """Run the plan on `df` and print it annotated with time, rows and memory of every stage"""
+        from .profiling import analyze
+        return analyze(self, df, as_frame=as_frame)
+
+    def __str__(self):
+        lines = ['LogicalPlan']
+        lines += ['  %d: %r' % (i, node) for i, node in enumerate(self.nodes)]
+        return '\n'.join(lines)
+
+    def explain(self):
+        print(str(self))
+
+
+class LazyFrame(object):
+    """
+    Dataframe with a pending logical plan. Verbs piped into it with `>>` are only
+    recorded, the plan runs when `collect()` is called.
+    Example:
+        lf = lazy(df) >> group_by('x') >> summarize(y_mean=X.y.mean())
+        lf.explain()
+        result = lf.collect()
+    """
+
+    def __init__(self, df, plan=None):
+        self.df = df
+        self.plan = plan if plan is not None else LogicalPlan()
+
+    def __rshift__(self, other):
+        assert isinstance(other, pipe)
+        return LazyFrame(self.df, self.plan + other.plan)
+
+    def optimized_plan(self):
+        """The plan after predicate and projection pushdown for the source dataframe"""
+        from .optimizer import optimize
+        return optimize(self.plan, self.df.columns, getattr(self.df, '_grouped_by', None))
+
+    def collect(self, optimize=True):
+        """Execute the (optimized) plan on the source dataframe"""
+        plan = self.optimized_plan() if optimize else self.plan
+        return plan.execute(self.df)
+
+    def __str__(self):
+        return 'source: %s\n%s' % (describe(self.df), self.plan)
+
+    def explain(self, optimized=False):
+        """Print the plan, or the plan which will actually run when `optimized` is set"""
+        plan = self.optimized_plan() if optimized else self.plan
+        print('source: %s\n%s' % (describe(self.df), plan))
+
+    def explain_analyze(self, optimize=True, as_frame=False):
+        """Collect the frame printing the plan annotated with the profile of every stage"""
+        plan = self.optimized_plan() if optimize else self.plan
+        return plan.explain_analyze(self.df, as_frame=as_frame)
+
+
+def lazy(df):
+    """Start a lazily evaluated pipe chain on a dataframe"""
+    return LazyFrame(df)
+
+
+def schema_fingerprint(df):
+    """Columns, dtypes and grouping of a dataframe, frames with equal fingerprints share compiled plans"""
+    grouped_by = getattr(df, '_grouped_by', None)
+    return (tuple(df.columns),
+            tuple(str(t) for t in df.dtypes),
+            tuple(grouped_by) if grouped_by is not None else None)
+
+
+class CompiledPipeline(object):
+    """
+    Pipe chain prepared to run many times on frames of the same schema.
+    For every new input schema the plan gets its symbolic labels resolved and is
+    optimized once, the result is cached by the schema fingerprint. Instances are
+    immutable apart from the cache (which is guarded by a lock) and can be shared
+    between threads.
+    Note that dataframes passed to the verbs (e.g. right side of joins) are
+    captured by the compiled plans.
+    Example:
+        compiled = (select('x', 'y') >> filter_by(X.x > 1)).compile()
+        result = df >> compiled
+        result = compiled(df)
+    """
+
+    def __init__(self, plan: LogicalPlan):
+        self.plan = plan
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def plan_for(self, df):
+        """Resolved and optimized plan used for the dataframe"""
+        key = schema_fingerprint(df)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        from .optimizer import optimize, resolve_labels
+        grouped_by = key[2] and list(key[2])
+        optimized = optimize(self.plan, df.columns, grouped_by)
+        compiled = LogicalPlan(resolve_labels(optimized.nodes, list(df.columns), grouped_by))
+
+        with self._lock:
+            self._cache[key] = compiled
+            while len(self._cache) > get_option('plan_cache_size'):
+                self._cache.popitem(last=False)
+        return compiled
+
+    def __call__(self, df):
+        return self.plan_for(df).execute(df)
+
+    def __rrshift__(self, other):
+        return self(other)
+
+    def explain(self, df=None):
+        """Print the plan, or the compiled plan for the dataframe `df`"""
+        print(self.plan if df is None else self.plan_for(df))
+
+    def explain_analyze(self, df, as_frame=False):
+        """Run on `df` printing the compiled plan annotated with the profile of every stage"""
+        return self.plan_for(df).explain_analyze(df, as_frame=as_frame)
@@ -0,0 +1,176 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .plan import describe_call
+
+_profile_columns = ['stage', 'wall_time', 'cpu_time', 'rows_in', 'rows_out',
+                    'columns_in', 'columns_out', 'bytes_allocated', 'copied']
+
+
+def _frame_of(obj):
+    """Dataframe or series behind `obj` (grouped objects are measured by their data)"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj
+    return getattr(obj, 'obj', None)
+
+
+def _shape(obj):
+    frame = _frame_of(obj)
+    if isinstance(frame, pd.DataFrame):
+        return frame.shape
+    if isinstance(frame, pd.Series):
+        return len(frame), 1
+    return None, None
+
+
+def _column_buffers(obj):
+    frame = _frame_of(obj)
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    if not isinstance(frame, pd.DataFrame) or not frame.columns.is_unique:
+        return {}
+    buffers = {}
+    for name in frame.columns:
+        values = frame[name].values
+        if isinstance(values, np.ndarray):
+            buffers[name] = values
+    return buffers
+
+
+def copied_columns(before, after):
+    """
+    True if a column present in both frames does not share its buffer anymore,
+    None when it can not be told (no common numpy backed columns)
+    """
+    before_buffers = _column_buffers(before)
+    after_buffers = _column_buffers(after)
+    common = [c for c in after_buffers if c in before_buffers and len(after_buffers[c]) > 0]
+    if not common:
+        return None
+    return not all(np.may_share_memory(before_buffers[c], after_buffers[c]) for c in common)
+
+
+class Profiler(object):
+    """
+    Collects a record per executed stage: wall and cpu time, input/output rows and
+    columns, peak memory allocated by the stage (traced with `tracemalloc` when
+    `trace_memory` is set) and whether the data of the common columns was copied.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def run(self, stage, function, df, *args, **kwargs):
+        """Run `function(df, *args, **kwargs)` recording a profile of it under `stage` name"""
+        tracing = self.trace_memory
+        started_tracing = tracing and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if tracing:
+            tracemalloc.reset_peak()
+            memory_before, _ = tracemalloc.get_traced_memory()
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            result = function(df, *args, **kwargs)
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            if tracing:
+                _, memory_peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+        rows_in, columns_in = _shape(df)
+        rows_out, columns_out = _shape(result)
+        self.records.append({
+            'stage': stage,
+            'wall_time': wall_time,
+            'cpu_time': cpu_time,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'columns_in': columns_in,
+            'columns_out': columns_out,
+            'bytes_allocated': max(memory_peak - memory_before, 0) if tracing else None,
+            'copied': copied_columns(df, result),
+        })
+        return result
+
+    def to_frame(self):
+        """Profile records as a dataframe, one row per stage"""
+        return pd.DataFrame(self.records, columns=_profile_columns)
+
+    def __str__(self):
+        lines = []
+        for i, r in enumerate(self.records):
+            allocated = '-' if r['bytes_allocated'] is None else _format_bytes(r['bytes_allocated'])
+            copied = {True: 'yes', False: 'no', None: '-'}[r['copied']]
+            lines.append('  %d: %s\n       time=%.3fms cpu=%.3fms rows=%s->%s columns=%s->%s allocated=%s copied=%s' % (
+                i, r['stage'], r['wall_time'] * 1000, r['cpu_time'] * 1000,
+                r['rows_in'], r['rows_out'], r['columns_in'], r['columns_out'], allocated, copied))
+        return '\n'.join(lines)
+
+
+def _format_bytes(n):
+    for unit in ['B', 'KB', 'MB']:
+        if n < 1024:
+            return '%.1f%s' % (n, unit) if unit != 'B' else '%d%s' % (n, unit)
+        n /= 1024.0
+    return '%.1fGB' % n
+
+
+def analyze(plan, df, as_frame=False, trace_memory=True):
+    """
+    Execute a logical plan on `df` profiling every stage.
+    Prints the plan annotated with the measurements, or returns them as a
+    dataframe when `as_frame` is set.
+    """
+    profiler = Profiler(trace_memory=trace_memory)
+    plan.execute(df, profiler=profiler)
+    if as_frame:
+        return profiler.to_frame()
+    print('LogicalPlan (analyzed)\n%s' % profiler)
+
+
+_ply_methods = [
+    (pd.DataFrame, 'ply_select'), (pd.DataFrame, 'ply_mutate'), (pd.DataFrame, 'ply_filter'),
+    (pd.Series, 'ply_filter'),
+    (pd.core.groupby.DataFrameGroupBy, 'ply_summarize'),
+    (pd.core.groupby.DataFrameGroupBy, 'ply_mutate'),
+    (pd.core.groupby.SeriesGroupBy, 'ply_mutate'),
+]
+
+
+def _profiled(profiler, name, method):
+    def profiled_method(self, *args, **kwargs):
+        return profiler.run(describe_call(name, args, kwargs), method, self, *args, **kwargs)
+    return profiled_method
+
+
+@contextmanager
+def profile_ply(trace_memory=True):
+    """
+    Profile the `ply_*` methods added by `inject_ply` called inside of the `with` block.
+    Example:
+        with profile_ply() as profiler:
+            df.ply_filter(X.x > 1).ply_mutate(y=X.x * 2)
+        print(profiler)
+        profiler.to_frame()
+    """
+    profiler = Profiler(trace_memory=trace_memory)
+    replaced = []
+    for cls, name in _ply_methods:
+        method = cls.__dict__.get(name)
+        if method is not None:
+            replaced.append((cls, name, method))
+            setattr(cls, name, _profiled(profiler, '%s.%s' % (cls.__name__, name), method))
+    try:
+        yield profiler
+    finally:
+        for cls, name, method in replaced:
+            setattr(cls, name, method)
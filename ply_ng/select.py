@@ -4,49 +4,83 @@ from . pandas_pipe import *
 
 
 def resolve_selection(df, *args, drop=False):
+    """
+    Combine the evaluated selectors (`ColumnSelection`s) into the ordering of the
+    selected columns (names in the order they were selected first) and the column
+    indices: 1 for selected, -1 for excluded and 0 for not mentioned columns, the
+    later selectors override the earlier ones.
+    """
     if len(args) > 0:
-        args = [a for a in flatten(args)] # each arg is an array with dim # of df columns
-        ordering = []
+        args = [a for a in flatten(args)]
         column_indices = np.zeros(df.shape[1])
-        for selector in args: #args is array args[#of args, # of cols in df]
-            visible = np.where(selector != 0)[0] 
-            if not drop:
-                column_indices[visible] = selector[visible]
-            else:
-                column_indices[visible] = selector[visible] * -1
-            for selection in np.where(selector == 1)[0]:
-                if not df.columns[selection] in ordering:
-                    ordering.append(df.columns[selection])
+        for selector in args:
+            column_indices[selector.positions] = selector.signs if not drop else -selector.signs
+        chosen = [np.sort(selector.positions[selector.signs == 1]) for selector in args]
+        chosen = np.concatenate(chosen) if chosen else np.zeros(0, dtype=np.int64)
+        ordering = list(pd.unique(df.columns.take(chosen)))
     else:
         ordering = list(df.columns)
         column_indices = np.ones(df.shape[1])
     return ordering, column_indices
 
-@pipe
-@GroupedEvaluationService
-@symbolic_pipe_evaluation(eval_as_selector=True)
-def select(df, *args):
-    ordering, column_indices = resolve_selection(df, *args)
+# more columns than this are copied into consolidated blocks instead of making a
+# frame of that many single column views (pandas is slow on fragmented frames)
+_max_view_columns = 64
+
+
+def take_columns(df, positions):
+    """
+    Frame of the columns of `df` at `positions`, in that order, sharing the column
+    data with `df` where pandas allows it: a contiguous range of columns is a slice
+    of the blocks, a few columns are views of their blocks, otherwise the columns
+    are copied once.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    if len(positions) == 0:
+        return df.iloc[:, []]
+    if (np.diff(positions) == 1).all():
+        return df.iloc[:, positions[0]:positions[-1] + 1]
+    if len(positions) > _max_view_columns:
+        return df.take(positions, axis=1)
+    taken = pd.DataFrame({i: df.iloc[:, p].array for i, p in enumerate(positions)}, index=df.index, copy=False)
+    taken.columns = df.columns.take(positions)
+    return taken
+
+
+def selected_positions(df, selectors, drop=False):
+    """Positions of the columns `select` (or `drop`) keeps, in the order of the result"""
+    ordering, column_indices = resolve_selection(df, *selectors, drop=drop)
     if (column_indices == 0).all():
-        return df[[]]
+        return np.zeros(0, dtype=np.int64)
     selection = np.where((column_indices == np.max(column_indices)) &
                          (column_indices >= 0))[0]
-    df = df.iloc[:, selection]
-    if all([col in ordering for col in df.columns]):
-        ordering = [c for c in ordering if c in df.columns]
-        return df[ordering]
-    else:
-        return df    
+    if drop:
+        return selection
+    ordered = set(ordering)
+    if not all(col in ordered for col in df.columns[selection]):
+        return selection
+    # selected columns in the order they were asked for, duplicated names by name
+    rank = {name: i for i, name in enumerate(ordering)}
+    if not df.columns.is_unique:
+        names = df.columns[selection]
+        return np.concatenate([selection[names == name] for name in sorted(set(names), key=rank.get)])
+    return selection[np.argsort([rank[name] for name in df.columns[selection]], kind='stable')]
 
 
+@pipe
+@GroupedEvaluationService
+@symbolic_pipe_evaluation(eval_as_selector=True)
+def select(df, *args):
+    # the final ordered positions are computed first, the columns are taken once
+    return take_columns(df, selected_positions(df, args))
+
 
 @pipe
 @GroupedEvaluationService
 @symbolic_pipe_evaluation(eval_as_selector=True)
 def drop(df, *args):
-    _, column_indices = resolve_selection(df, *args, drop=True)
-    if (column_indices == 0).all():
-        return df[[]]
-    selection = np.where((column_indices == np.max(column_indices)) &
-                         (column_indices >= 0))[0]
-    return df.iloc[:, selection]
\ No newline at end of file
+    return take_columns(df, selected_positions(df, args, drop=True))
+
+
+select.reads_only = True
+drop.reads_only = True
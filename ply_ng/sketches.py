@@ -0,0 +1,191 @@
+"""
+Approximate, mergeable summaries: HyperLogLog distinct counts and t-digest quantiles.
+
+    df >> group_by('country') >> summarize(users=approx_nunique(X.user_id),
+                                           p99=approx_quantile(X.latency, 0.99))
+
+A sketch of many values takes bounded memory and sketches of parts of the data
+(chunks, partitions) merge into the sketch of the whole data, so the summaries
+stream (see `aggregates`). All the functions here work on many groups at once:
+sketch entries are arrays with the group number (`codes`) of every entry, sorted
+by the group.
+
+HyperLogLog keeps the highest rank (position of the first set bit of the value
+hash) seen in each of `2 ** precision` registers, only the registers which were
+hit are stored. The relative error of the count is about `1.04 / sqrt(2 ** precision)`
+(1.6% for the default precision 12).
+
+t-digest keeps clusters of the sorted values (centroids: mean and weight), small
+clusters near the extremes and large ones in the middle, so the tail quantiles
+(p95, p99) are the most precise. `compression` bounds the number of centroids
+per group, quantiles of groups with fewer values than that are exact.
+"""
+import numpy as np
+import pandas as pd
+
+from .symbolic_eval import Expression, sym_call
+
+_rank_bits = 6
+
+
+def _hash(values):
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).values
+
+
+def _hashes(values):
+    """
+    Hashes of the values, equal numbers hash the same whatever their dtype (chunks
+    of a column often come as int64 and float64), integral values as int64
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'u' and (not len(values) or values.max() <= np.iinfo(np.int64).max):
+        values = values.astype(np.int64)
+    if values.dtype.kind == 'i':
+        values = values.astype(np.int64, copy=False)
+    if values.dtype.kind != 'f':
+        return _hash(values)
+    values = values.astype(np.float64, copy=False)
+    integral = (np.floor(values) == values) & (np.abs(values) < 2.0 ** 63)
+    hashes = _hash(values)
+    hashes[integral] = _hash(values[integral].astype(np.int64))
+    return hashes
+
+
+def hll_sketch(codes, values, precision=12):
+    """HyperLogLog registers `(codes, registers, ranks)` of the values of every group, missing values are skipped"""
+    valid = pd.notna(values)
+    codes, values = np.asarray(codes)[valid], np.asarray(values)[valid]
+    hashes = _hashes(values)
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # rank is the position of the first set bit of the rest of the hash
+    bit_length = np.zeros(len(rest), dtype=np.int64)
+    set_bits = rest > 0
+    bit_length[set_bits] = np.floor(np.log2(rest[set_bits].astype(np.float64))).astype(np.int64) + 1
+    ranks = (64 - precision) - bit_length + 1
+    return hll_merge(codes, registers, ranks, precision)
+
+
+def hll_merge(codes, registers, ranks, precision=12):
+    """Registers of the groups combined into one entry per group and register with the highest rank"""
+    cells = (np.asarray(codes, dtype=np.int64) << precision) + np.asarray(registers, dtype=np.int64)
+    keys = np.unique((cells << _rank_bits) + np.asarray(ranks, dtype=np.int64))
+    cells = keys >> _rank_bits
+    keys = keys[np.append(cells[1:] != cells[:-1], True)[:len(keys)]]
+    cells = keys >> _rank_bits
+    return cells >> precision, cells & ((1 << precision) - 1), keys & ((1 << _rank_bits) - 1)
+
+
+def hll_estimate(codes, ranks, n_groups, precision=12):
+    """Estimated number of distinct values of every group"""
+    m = 1 << precision
+    hit = np.bincount(codes, minlength=n_groups)
+    zeros = m - hit
+    z = np.bincount(codes, weights=np.exp2(-ranks.astype(np.float64)), minlength=n_groups) + zeros
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / z
+    # small cardinalities are estimated by linear counting of the empty registers
+    small = (estimate <= 2.5 * m) & (zeros > 0)
+    estimate[small] = m * np.log(m / zeros[small])
+    return np.rint(estimate).astype(np.int64)
+
+
+def tdigest_sketch(codes, values, compression=100):
+    """t-digest centroids `(codes, means, weights)` of the values of every group, missing values are skipped"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    codes, values = np.asarray(codes)[valid], values[valid]
+    return tdigest_merge(codes, values, np.ones(len(values)), compression)
+
+
+def tdigest_merge(codes, means, weights, compression=100):
+    """
+    Centroids of the groups merged, sorted by the group and the mean. Neighbouring
+    centroids are merged when their middle quantiles fall into the same unit of
+    the scale `compression / pi * asin(2 q - 1)`, which is finer at the tails.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    order = np.lexsort((means, codes))
+    codes, means, weights = codes[order], np.asarray(means)[order], np.asarray(weights)[order]
+    if not len(codes):
+        return codes, means, weights
+    totals = np.bincount(codes, weights=weights)
+    cumulative = np.cumsum(weights)
+    starts = np.concatenate([[0.0], np.cumsum(totals)[:-1]])
+    quantiles = (cumulative - weights / 2 - starts[codes]) / totals[codes]
+    scale = np.floor(compression / np.pi * np.arcsin(np.clip(2 * quantiles - 1, -1, 1)))
+    group_starts = np.ones(len(codes), dtype=bool)
+    group_starts[1:] = codes[1:] != codes[:-1]
+    new = group_starts | np.append(True, scale[1:] != scale[:-1])
+    # the first and the last centroid of a group (its minimum and maximum) stay on their own
+    new[1:] |= group_starts[:-1]
+    new[np.append(group_starts[1:], True)] = True
+    centroid = np.cumsum(new) - 1
+    merged_weights = np.bincount(centroid, weights=weights)
+    merged_means = np.bincount(centroid, weights=weights * means) / merged_weights
+    # single values keep their exact value
+    single = np.bincount(centroid) == 1
+    merged_means[single] = means[new][single]
+    return codes[new], merged_means, merged_weights
+
+
+def tdigest_quantile(codes, means, weights, q, n_groups):
+    """
+    Quantile `q` of every group out of its centroids (sorted by the group and the
+    mean), interpolated linearly between the centroid middles like `Series.quantile`
+    """
+    totals = np.bincount(codes, weights=weights, minlength=n_groups)
+    result = np.full(n_groups, np.nan)
+    if not len(codes):
+        return result
+    starts = np.concatenate([[0.0], np.cumsum(totals)[:-1]])
+    # positions of the middles of the centroids among all the values, group after group
+    middles = np.cumsum(weights) - weights + (weights - 1) / 2
+    targets = starts + q * np.maximum(totals - 1, 0)
+    present = np.flatnonzero(totals > 0)
+    first = np.searchsorted(codes, present, side='left')
+    last = np.searchsorted(codes, present, side='right') - 1
+    targets = np.clip(targets[present], middles[first], middles[last])
+    left = np.clip(np.searchsorted(middles, targets, side='right') - 1, first, last)
+    right = np.minimum(left + 1, last)
+    span = middles[right] - middles[left]
+    fraction = np.divide(targets - middles[left], span, out=np.zeros(len(span)), where=span > 0)
+    result[present] = means[left] + (means[right] - means[left]) * fraction
+    return result
+
+
+def _check_precision(precision):
+    if not isinstance(precision, (int, np.integer)) or not 4 <= precision <= 18:
+        raise ValueError('precision has to be an integer from 4 to 18, got %r' % (precision,))
+
+
+def _check_quantile(q, compression):
+    if not 0 <= q <= 1:
+        raise ValueError('quantile has to be from 0 to 1, got %r' % (q,))
+    if not compression > 0:
+        raise ValueError('compression has to be positive, got %r' % (compression,))
+
+
+def approx_nunique(x, precision=12):
+    """
+    Approximate number of distinct values (HyperLogLog), the relative error is
+    about `1.04 / sqrt(2 ** precision)`. Usable in `summarize`:
+        summarize(users=approx_nunique(X.user_id))
+    """
+    _check_precision(precision)
+    if isinstance(x, Expression):
+        return sym_call(approx_nunique, x, precision=precision)
+    codes, _, ranks = hll_sketch(np.zeros(len(x), dtype=np.int64), x, precision)
+    return hll_estimate(codes, ranks, 1, precision)[0]
+
+
+def approx_quantile(x, q=0.5, compression=100):
+    """
+    Approximate quantile `q` (t-digest), more precise with higher `compression` and
+    towards the extreme quantiles. Usable in `summarize`:
+        summarize(p99=approx_quantile(X.latency, 0.99))
+    """
+    _check_quantile(q, compression)
+    if isinstance(x, Expression):
+        return sym_call(approx_quantile, x, q=q, compression=compression)
+    codes, means, weights = tdigest_sketch(np.zeros(len(x), dtype=np.int64), x, compression)
+    return tdigest_quantile(codes, means, weights, q, 1)[0]
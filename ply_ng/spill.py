@@ -0,0 +1,157 @@
+"""
+Out of core grouped summarize.
+
+With the `memory_budget` option set, `group_by(...) >> summarize(...)` over data
+larger than the budget does not group all the rows at once. The rows are hash
+partitioned by the group keys into spill files of a temporary directory (rows of
+one group always land in the same partition), then every partition is summarized
+on its own - any summary works, not only the mergeable reductions. A partition
+which is still larger than the budget is partitioned again with another hash.
+Files are written with pickle, so no extra dependency is needed.
+"""
+import os
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .config import get_option, option_context
+from .pandas_pipe import carry_attributes
+
+# hash keys (16 characters) of the levels of repeated partitioning
+_hash_keys = ['ply-ng-spill-000', 'ply-ng-spill-001', 'ply-ng-spill-002', 'ply-ng-spill-003']
+
+
+def frame_bytes(df):
+    """Memory taken by the frame (including the python objects of object columns)"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def frame_chunks(df, memory_budget):
+    """Split an in memory frame into chunks of rows taking about a quarter of the budget each"""
+    row_bytes = max(frame_bytes(df) / max(len(df), 1), 1)
+    rows = max(int(memory_budget / 4 / row_bytes), 1)
+    for start in range(0, len(df), rows):
+        yield carry_attributes(df, df.iloc[start:start + rows])
+
+
+class SpillPartitions(object):
+    """
+    Rows hash partitioned by the `keys` columns into pickled spill files. Added rows
+    are buffered per partition until the buffers take half of the memory budget,
+    then the largest buffers are written out. Iterating yields the frame of every
+    non empty partition (its files are removed as they are read).
+    """
+
+    def __init__(self, keys, memory_budget, n_partitions=None, directory=None, level=0):
+        self.keys = list(keys)
+        self.memory_budget = memory_budget
+        self.n_partitions = n_partitions or get_option('spill_partitions')
+        self.level = level
+        self.directory = tempfile.mkdtemp(prefix='ply-ng-spill-', dir=directory or get_option('spill_directory'))
+        self.buffers = [[] for _ in range(self.n_partitions)]
+        self.buffered = np.zeros(self.n_partitions, dtype=np.int64)
+        self.sizes = np.zeros(self.n_partitions, dtype=np.int64)
+        self.files = [[] for _ in range(self.n_partitions)]
+        self.template = None
+
+    def partition_of(self, df):
+        """Partition number of every row"""
+        hashes = pd.util.hash_pandas_object(df[self.keys], index=False, hash_key=_hash_keys[self.level])
+        return (hashes.values % np.uint64(self.n_partitions)).astype(np.int64)
+
+    def add(self, df):
+        if self.template is None:
+            self.template = df.iloc[:0]
+        if len(df) == 0:
+            return
+        partitions = self.partition_of(df)
+        order = np.argsort(partitions, kind='stable')
+        bounds = np.searchsorted(partitions[order], np.arange(self.n_partitions + 1))
+        row_bytes = frame_bytes(df) / len(df)
+        for p in range(self.n_partitions):
+            rows = order[bounds[p]:bounds[p + 1]]
+            if len(rows):
+                self.buffers[p].append(df.take(rows))
+                size = int(len(rows) * row_bytes)
+                self.buffered[p] += size
+                self.sizes[p] += size
+        while self.buffered.sum() > self.memory_budget / 2:
+            self._flush(int(np.argmax(self.buffered)))
+
+    def _flush(self, p):
+        path = os.path.join(self.directory, 'part-%d-%d.pkl' % (p, len(self.files[p])))
+        pd.concat(self.buffers[p]).to_pickle(path)
+        self.files[p].append(path)
+        self.buffers[p] = []
+        self.buffered[p] = 0
+
+    def _read(self, p):
+        frames = [pd.read_pickle(path) for path in self.files[p]] + self.buffers[p]
+        for path in self.files[p]:
+            os.remove(path)
+        self.files[p], self.buffers[p], self.buffered[p] = [], [], 0
+        return pd.concat(frames)
+
+    def __iter__(self):
+        for p in range(self.n_partitions):
+            if self.files[p] or self.buffers[p]:
+                yield p, self._read(p)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _summarize_partitions(partitions, run):
+    for p, part in partitions:
+        too_large = partitions.sizes[p] > partitions.memory_budget and len(part) > 1
+        if too_large and partitions.level + 1 < len(_hash_keys):
+            repartitioned = SpillPartitions(partitions.keys, partitions.memory_budget, partitions.n_partitions,
+                                            os.path.dirname(partitions.directory), partitions.level + 1)
+            try:
+                for chunk in frame_chunks(part, partitions.memory_budget):
+                    repartitioned.add(chunk)
+                del part
+                yield from _summarize_partitions(repartitioned, run)
+            finally:
+                repartitioned.close()
+        else:
+            yield run(part)
+
+
+def summarize_partitioned(chunks, run, keys=None, memory_budget=None):
+    """
+    Grouped summary of the rows of the `chunks` (dataframes) computed partition by
+    partition with `run(frame)`, `keys` are the group keys (`_grouped_by` of the
+    first chunk by default). The result has the groups in the order of the keys,
+    the same as `run` on all the rows at once.
+    """
+    memory_budget = memory_budget or get_option('memory_budget')
+    partitions = None
+    first = None
+    try:
+        for chunk in chunks:
+            if partitions is None:
+                first = chunk
+                keys = list(keys or chunk._grouped_by)
+                partitions = SpillPartitions(keys, memory_budget)
+            partitions.add(chunk)
+        if partitions is None:
+            return None
+        # grouping attributes are not stored in the spill files
+        run_grouped = lambda part: run(carry_attributes(first, part))
+        with option_context(memory_budget=None):
+            results = list(_summarize_partitions(partitions, run_grouped))
+    finally:
+        if partitions is not None:
+            partitions.close()
+
+    if not results:
+        return run(carry_attributes(first, partitions.template))
+    summary = pd.concat(results)
+    if all(k in summary.columns for k in keys):
+        summary = summary.sort_values(keys, kind='mergesort')
+    summary = summary.reset_index(drop=True)
+    return carry_attributes(results[-1], summary)
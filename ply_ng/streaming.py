@@ -0,0 +1,254 @@
+"""
+Execution of pipe chains over iterators of dataframe chunks.
+
+Row local verbs (select, drop, filter_by and mutate with row local expressions,
+group_by/ungroup, inner/left/asof/semi/anti joins against an in memory frame) run chunk by chunk,
+`head` stops reading the chunks as soon as it has enough rows. `summarize` after
+`group_by(..., sorted=True)` emits the summary of every group as soon as its last
+row is read. Grouped `summarize` with the `memory_budget` option set spills the rows hash partitioned by the keys
+(see `spill`), otherwise `summarize` with recognized reductions (see
+`aggregates.recognize`) keeps only merged partial states per group and `tail`
+keeps only its last rows. Any other verb makes the
+rest of the chunks to be concatenated and the rest of the plan to run in memory.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import recognize
+from .config import get_option
+from .group import GroupIndex
+from .optimizer import _union, columns_read, grouped_after, is_row_local_verb, verb_kind
+from .pandas_pipe import carry_attributes, pipe, take_ownership
+from .plan import LogicalPlan, describe
+from .spill import summarize_partitioned
+from .summarize import summarize
+
+
+class StreamingSummary(object):
+    """
+    Grouped or ungrouped summarize over chunks keeping merged partial states of the
+    recognized reductions only.
+    """
+
+    def __init__(self, kwargs):
+        self.kwargs = kwargs
+        self.aggregates = {name: recognize(value) for name, value in kwargs.items()}
+        self.grouped_by = None
+        self.states = None
+        self.empty = None
+
+    @classmethod
+    def supports(cls, node):
+        if node.args or not node.kwargs or 'index' in node.kwargs:
+            return False
+        aggregates = [recognize(v) for v in node.kwargs.values()]
+        return all(a is not None and a.mergeable for a in aggregates)
+
+    def update(self, chunk):
+        self.add(chunk, getattr(chunk, '_grouped_by', None))
+
+    def add(self, chunk, grouped_by):
+        """Merge the partial states of the rows of `chunk` grouped by the `grouped_by` columns"""
+        self.grouped_by = list(grouped_by) if grouped_by else None
+        self.empty = chunk.iloc[:0]
+        keys = self.grouped_by if self.grouped_by else np.zeros(len(chunk), dtype=np.int64)
+        partial = {name: a.partial(chunk, keys) for name, a in self.aggregates.items()}
+        if self.states is None:
+            self.states = partial
+        else:
+            self.states = {name: a.merge(self.states[name], partial[name])
+                           for name, a in self.aggregates.items()}
+
+    def _summarize_empty(self):
+        """Ungrouped summary of no rows, a single row like `summarize` of an empty frame gives"""
+        empty = self.empty
+        if empty is None:
+            # no chunk came and no schema was given to `stream`, the columns read are
+            # assumed to be float (sums of no rows are 0.0 even for integer columns)
+            read = _union(columns_read(a.operand) for a in self.aggregates.values()) or set()
+            empty = pd.DataFrame({c: pd.Series([], dtype=np.float64) for c in sorted(read)})
+        return empty >> summarize(**self.kwargs)
+
+    def result(self):
+        if self.states is None and not self.grouped_by:
+            return self._summarize_empty()
+        if self.states is None:
+            return pd.DataFrame(columns=list(self.aggregates))
+        summary = pd.DataFrame({name: a.finalize(self.states[name])
+                                for name, a in self.aggregates.items()})
+        if not self.grouped_by and not len(summary):
+            return self._summarize_empty()
+        if self.grouped_by:
+            summary = summary.reset_index()
+            summary.columns = self.grouped_by + list(self.aggregates)
+        else:
+            summary = summary.reset_index(drop=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            summary._grouped_by = self.grouped_by
+        return summary
+
+
+def _summarize_sorted(chunks, run):
+    """
+    Summaries of chunks sorted by the group keys, every summary covers the groups
+    which ended in the chunk, the rows of its last group wait for the next chunk.
+    """
+    pending = None
+    start = 0
+    for chunk in chunks:
+        if pending is not None:
+            chunk = carry_attributes(chunk, pd.concat([pending, chunk]))
+        index = GroupIndex.build(chunk, chunk._grouped_by, sorted=True)
+        if index is None:
+            # keys which can not be compared (e.g. missing values), the rest is summarized at once
+            chunk = _concat([chunk] + list(chunks))
+            pending = chunk.iloc[:0]
+            summary = run(chunk)
+        else:
+            last = index.offsets[-2] if index.n_groups else 0
+            pending = carry_attributes(chunk, chunk.iloc[last:])
+            if last == 0:
+                continue
+            summary = run(carry_attributes(chunk, chunk.iloc[:last]))
+        summary.index = pd.RangeIndex(start, start + len(summary))
+        start += len(summary)
+        yield summary
+    if pending is not None and (len(pending) or not start):
+        summary = run(pending)
+        summary.index = pd.RangeIndex(start, start + len(summary))
+        yield summary
+
+
+def _run_nodes(nodes, df):
+    for node in nodes:
+        df = node.run(df)
+    return df
+
+
+def execute_stream(chunks, plan: LogicalPlan):
+    """Run a logical plan over an iterator of dataframes, yields the result chunks"""
+    nodes = list(plan.nodes)
+    streamed = []
+    grouped = False
+    grouped_sorted = False
+    while nodes and is_row_local_verb(nodes[0], grouped):
+        grouped = grouped_after(nodes[0], grouped)
+        if verb_kind(nodes[0]) == 'group_by':
+            grouped_sorted = bool(nodes[0].kwargs.get('sorted'))
+        grouped_sorted = grouped_sorted and grouped
+        streamed.append(nodes.pop(0))
+
+    chunks = (_run_nodes(streamed, take_ownership(chunk)) for chunk in chunks)
+
+    if not nodes:
+        yield from chunks
+        return
+
+    node, rest = nodes[0], nodes[1:]
+    kind = verb_kind(node)
+    if kind == 'head':
+        n = node.args[0] if node.args else node.kwargs.get('n', 5)
+        result = _head(chunks, n)
+    elif kind == 'tail':
+        n = node.args[0] if node.args else node.kwargs.get('n', 5)
+        result = _tail(chunks, n)
+    elif kind == 'summarize' and grouped_sorted:
+        result = _summarize_sorted(chunks, node.run)
+    elif kind == 'summarize' and grouped and get_option('memory_budget'):
+        summary = summarize_partitioned(chunks, node.run)
+        result = [summary] if summary is not None else []
+    elif kind == 'summarize' and StreamingSummary.supports(node):
+        summary = StreamingSummary(node.kwargs)
+        for chunk in chunks:
+            summary.update(chunk)
+        result = [summary.result()]
+    else:
+        result = [node.run(_concat(list(chunks)))]
+
+    if not rest:
+        yield from result
+    elif kind == 'head' or (kind == 'summarize' and grouped_sorted):
+        # the rest of the plan is streamed as well
+        yield from execute_stream(result, LogicalPlan(rest))
+    else:
+        yield _run_nodes(rest, _concat(list(result)))
+
+
+def _concat(chunks):
+    if not chunks:
+        return pd.DataFrame()
+    concatenated = pd.concat(chunks)
+    return carry_attributes(chunks[-1], concatenated)
+
+
+def _head(chunks, n):
+    remaining = n
+    if remaining <= 0:
+        return
+    for chunk in chunks:
+        taken = chunk.head(remaining)
+        remaining -= len(taken)
+        yield carry_attributes(chunk, taken)
+        if remaining <= 0:
+            return
+
+
+def _tail(chunks, n):
+    last = None
+    for chunk in chunks:
+        last = chunk if last is None else carry_attributes(chunk, pd.concat([last, chunk]))
+        last = carry_attributes(chunk, last.tail(n))
+    return [last] if last is not None else []
+
+
+class ChunkStream(object):
+    """
+    Pipe chain over an iterator of dataframe chunks. Verbs piped into it with `>>`
+    are recorded, iterating over the stream yields the result chunks.
+    Example:
+        chunks = pd.read_csv('big.csv', chunksize=100000)
+        for part in stream(chunks) >> filter_by(X.price > 0) >> mutate(total=X.price * X.qty):
+            ...
+        summary = (stream(chunks) >> group_by('city') >> summarize(total=X.price.sum())).collect()
+    """
+
+    def __init__(self, chunks, plan=None, schema=None):
+        self.chunks = chunks
+        self.plan = plan if plan is not None else LogicalPlan()
+        self.schema = schema
+
+    def __rshift__(self, other):
+        assert isinstance(other, pipe)
+        return ChunkStream(self.chunks, self.plan + other.plan, self.schema)
+
+    def __iter__(self):
+        return execute_stream(_or_empty(self.chunks, self.schema), self.plan)
+
+    def collect(self):
+        """Concatenate all result chunks into one dataframe"""
+        return _concat(list(self))
+
+    def explain(self):
+        print('source: %s\n%s' % (describe(self.chunks), self.plan))
+
+
+def _or_empty(chunks, schema):
+    """The chunks, or an empty frame of the schema when there is none"""
+    empty = True
+    for chunk in chunks:
+        empty = False
+        yield chunk
+    if empty and schema is not None:
+        yield schema.iloc[:0]
+
+
+def stream(chunks, schema=None):
+    """
+    Start a pipe chain over an iterator of dataframe chunks. `schema` is a frame
+    (e.g. an empty one) with the columns and dtypes of the chunks, used when the
+    iterator gives no chunk at all so the result is the one of the empty frame.
+    """
+    return ChunkStream(chunks, schema=schema)
@@ -1,5 +1,6 @@
 from ply_ng.symbolic_eval import to_callable
 from .pandas_pipe import *
+from .pandas_stream import _ply_filter
 
 @pipe
 @to_callable
@@ -12,3 +13,14 @@ def head(df, n=5):
 def tail(df, n=5):
     return df.tail(n)
 
+
+@pipe
+def filter_by(df, *conditions):
+    """
+    Emulating dplyr filter. Keep only the rows satisfying all the conditions.
+    Conditions are evaluated on the whole dataframe (grouping is kept but not used).
+    Example:
+        df >> filter_by(X.x > 1, X.y < 5)
+    """
+    filtered = _ply_filter(df, *conditions)
+    return carry_attributes(df, filtered)
@@ -1,11 +1,71 @@
-
-
-from ply_ng.group import gr_pipe
+from ply_ng.config import get_option
+from ply_ng.group import gr_pipe, group_index
 import pandas as pd
 from ply_ng.pandas_pipe import pipe
+from ply_ng.spill import frame_bytes, frame_chunks, summarize_partitioned
 from ply_ng.symbolic_eval import *
 
 
-@gr_pipe
+def _summarize_groups(df, apply, args, kwargs):
+    """
+    Grouped summarize with the recognized reductions (`X.col.mean()`, `len(X)`, ...)
+    computed for all the groups by one vectorized groupby, the other values are
+    computed by `apply` per group. None when no reduction is recognized.
+    """
+    from ply_ng.aggregates import Size, evaluate_operand, recognize
+
+    memory_budget = get_option('memory_budget')
+    if memory_budget and frame_bytes(df) > memory_budget:
+        # larger than the budget, summarized partition by partition (out of core)
+        return summarize_partitioned(frame_chunks(df, memory_budget),
+                                     lambda part: summarize.function(part, *args, **kwargs))
+
+    grouped_by = list(df._grouped_by)
+    recognized = {name: recognize(value) for name, value in kwargs.items()}
+    recognized = {name: a for name, a in recognized.items() if a is not None}
+    index = group_index(df)
+    if not recognized or len(df) == 0 or index is None:
+        return None
+
+    operands = {}
+    for name, aggregate in recognized.items():
+        if not isinstance(aggregate, Size):
+            key = structural_key(aggregate.operand)
+            if key not in operands:
+                operands[key] = ('_%d' % len(operands), evaluate_operand(aggregate.operand, df))
+    values = pd.DataFrame({column: series for column, series in operands.values()}, index=df.index)
+    grouped = values.groupby(index.grouper, sort=True, observed=False)
+
+    summary = {}
+    for name, aggregate in recognized.items():
+        if isinstance(aggregate, Size):
+            summary[name] = grouped.size()
+        elif aggregate.function is None:
+            # no pandas aggregation (sketches), the partial state of all the rows finalized
+            finalized = aggregate.finalize(aggregate.partial(df, index.codes))
+            summary[name] = pd.Series(finalized.reindex(pd.RangeIndex(index.n_groups)).values,
+                                      index=grouped.size().index)
+        else:
+            column = operands[structural_key(aggregate.operand)][0]
+            summary[name] = getattr(grouped[column], aggregate.function)(**aggregate.kwargs)
+    summary = pd.DataFrame(summary)
+
+    rest = {name: value for name, value in kwargs.items() if name not in recognized}
+    if rest:
+        applied = apply(df, **rest)
+        if len(applied) != len(summary):
+            return None
+        for name in rest:
+            summary[name] = applied[name].values
+
+    # the same layout as of the per group apply: group columns in front (the last
+    # grouping column first) unless overwritten, then the summaries, default index
+    summary = summary.reset_index(drop=True)
+    key_values = index.key_values(df)
+    keys = [k for k in reversed(grouped_by) if k not in kwargs]
+    return pd.concat([key_values[keys], summary[list(kwargs)]], axis=1)
+
+
+@gr_pipe(vectorized=_summarize_groups)
 def summarize(df, **kwargs):
-    return pd.DataFrame({k: [v] for k, v in kwargs.items()})
\ No newline at end of file
+    return pd.DataFrame({k: [v] for k, v in kwargs.items()})
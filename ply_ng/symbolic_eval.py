@@ -1,6 +1,8 @@
 
 from abc import ABC
+from collections import OrderedDict
 from functools import wraps
+import threading
 from typing import List, Union
 import warnings
 
@@ -68,6 +70,17 @@ class Expression(ABC):
         """
         raise NotImplementedError
 
+    def _compile(self, compile_child=None):
+        """
+        Build a function evaluating the expression in a context, see `compile_expression`.
+        `compile_child` compiles the subexpressions (`compile_expression` by default).
+        """
+        raise NotImplementedError
+
+    def _structure(self, key_of):
+        """Hashable structure of the expression with subexpressions keyed by `key_of`"""
+        raise NotImplementedError
+
     def __repr__(self):
         raise NotImplementedError
 
@@ -101,6 +114,13 @@ class Symbol(Expression):
             print('Returning', repr(self), '=>', repr(result))
         return result
 
+    def _compile(self, compile_child=None):
+        name = self._name
+        return lambda context: context[name]
+
+    def _structure(self, key_of):
+        return 'Symbol', key_of(self._name), self.inverted
+
     def __invert__(self):
         return Symbol(self._name, inverted=not self.inverted)        
 
@@ -128,6 +148,14 @@ class GetAttr(Expression):
             print('Returning', repr(self), '=>', repr(result))
         return result
 
+    def _compile(self, compile_child=None):
+        obj = (compile_child or compile_expression)(self._obj)
+        name = self._name
+        return lambda context: getattr(obj(context), name)
+
+    def _structure(self, key_of):
+        return 'GetAttr', key_of(self._obj), key_of(self._name), self._inverted
+
     def __invert__(self): 
         return GetAttr(self._obj, self._name, inverted = not self._inverted)
 
@@ -167,6 +195,28 @@ class Call(Expression):
             print('Returning', repr(self), '=>', repr(result))
         return result
 
+    def _compile(self, compile_child=None):
+        compile_child = compile_child or compile_expression
+        func = compile_child(self._func)
+        args = [_compile_argument(a, compile_child) for a in self._args]
+        kwargs = [(k, compile_child(v)) for k, v in self._kwargs.items()]
+        if kwargs:
+            interpreted = lambda context: func(context)(*[a(context) for a in args],
+                                                        **{k: v(context) for k, v in kwargs})
+        elif not args:
+            interpreted = lambda context: func(context)()
+        elif len(args) == 1:
+            arg = args[0]
+            interpreted = lambda context: func(context)(arg(context))
+        else:
+            interpreted = lambda context: func(context)(*[a(context) for a in args])
+        from .numexpr_eval import compile_numexpr
+        return compile_numexpr(self, interpreted)
+
+    def _structure(self, key_of):
+        kwargs = tuple(sorted((k, key_of(v)) for k, v in self._kwargs.items()))
+        return 'Call', key_of(self._func), key_of(tuple(self._args)), kwargs, self.inverted
+
     def __repr__(self):
         return '{func}(*{args}, **{kwargs})'.format(
             func=repr(self._func),
@@ -191,9 +241,187 @@ def eval_if_symbolic(obj, context, **options):
         >>> eval_if_symbolic(7, {'x': 10})
         7
     """
+    if isinstance(obj, Expression) and not options:
+        return compile_expression(obj)(context)
     return obj._eval(context, **options) if hasattr(obj, '_eval') else obj
 
 
+def compile_expression(obj):
+    """Turn an object into a function of an evaluation context.
+    Symbolic expressions are compiled once into nested closures with the symbol
+    names, attribute names and constant arguments bound, the result is cached on
+    the expression. Evaluating the compiled function gives the same result as
+    `obj._eval(context)` without walking the expression tree.
+    Args:
+        obj: A symbolic expression, an object with `_eval` method or a constant.
+    Returns:
+        callable taking the context dictionary
+    Examples:
+        >>> compile_expression(Symbol('x') + 1)({'x': 10})
+        11
+    """
+    if isinstance(obj, Expression):
+        compiled = obj.__dict__.get('_compiled')
+        if compiled is None:
+            compiled = obj._compile()
+            obj.__dict__['_compiled'] = compiled
+        return compiled
+    if hasattr(obj, '_eval'):
+        return lambda context: obj._eval(context)
+    return lambda context: obj
+
+
+def _compile_argument(val, compile_child):
+    """Compiled call argument, tuples are evaluated item by item (like `Call._rec_symb_eval`)"""
+    if isinstance(val, tuple):
+        items = [_compile_argument(v, compile_child) for v in val]
+        return lambda context: tuple(i(context) for i in items)
+    return compile_child(val)
+
+
+def structural_key(obj):
+    """Hashable key of an object describing the structure of symbolic expressions.
+    Operators of expressions are hooked to build new expressions, so expressions
+    can not be compared with `==` or used as dictionary keys directly. Their
+    structural keys can: two expressions built the same way have equal keys.
+    Constants are compared by value (and type), unhashable ones (lists are
+    compared item by item) by identity.
+    Examples:
+        >>> structural_key(X.x.rolling(30).mean()) == structural_key(X.x.rolling(30).mean())
+        True
+        >>> structural_key(X.x + 1) == structural_key(X.x + 1.5)
+        False
+    """
+    if isinstance(obj, Expression):
+        key = obj.__dict__.get('_key')
+        if key is None:
+            key = obj._structure(structural_key)
+            obj.__dict__['_key'] = key
+        return key
+    if isinstance(obj, (list, tuple)):
+        return type(obj).__name__, tuple(structural_key(o) for o in obj)
+    if isinstance(obj, dict):
+        return 'dict', tuple((structural_key(k), structural_key(v)) for k, v in obj.items())
+    try:
+        hash(obj)
+    except TypeError:
+        return 'id', id(obj)
+    return 'constant', type(obj), obj
+
+
+def structurally_equal(a, b):
+    """True if the two objects (symbolic expressions or constants) are built the same way"""
+    return structural_key(a) == structural_key(b)
+
+
+def _subexpressions(obj):
+    """Direct symbolic subexpressions of an expression"""
+    if isinstance(obj, GetAttr):
+        children = [obj._obj]
+    elif isinstance(obj, Call):
+        children = [obj._func] + list(flatten(obj._args)) + list(obj._kwargs.values())
+    else:
+        children = []
+    return [c for c in children if isinstance(c, Expression)]
+
+
+class _Memo(object):
+    """Key of the memo of shared subexpressions in an evaluation context"""
+
+
+_memo = _Memo()
+
+
+def _pure_methods():
+    """Methods and operators which give the same value every time they are called on the same data"""
+    from .optimizer import _elementwise_methods, _elementwise_operators
+    from .transform import _reductions, _window_methods
+    return (_elementwise_operators | _elementwise_methods | set(_reductions) | set(_window_methods) |
+            {'__getitem__', 'rolling', 'expanding', 'ewm'})
+
+
+def _shareable(expr, pure, known):
+    """True if `expr` calls only pure methods, so its repeated occurrences have the same value"""
+    key = structural_key(expr)
+    if key not in known:
+        own = not isinstance(expr, Call) or (isinstance(expr._func, GetAttr) and expr._func._name in pure)
+        known[key] = own and all(_shareable(c, pure, known) for c in _subexpressions(expr))
+    return known[key]
+
+
+def compile_shared(exprs):
+    """Compile several expressions evaluated in the same context into one function
+    returning the list of their values. Subexpressions occurring more than once
+    (e.g. `X.x.rolling(30).mean()` in `a=X.x.rolling(30).mean(), b=X.x.rolling(30).mean() * 2`)
+    are evaluated only once per call. Only subexpressions calling known pure methods
+    are shared, calls of other functions (which may be random) are evaluated every time.
+    """
+    pure = _pure_methods()
+    shareable = {}
+    counts = {}
+    pending = list(exprs)
+    while pending:
+        expr = pending.pop()
+        key = structural_key(expr)
+        counts[key] = counts.get(key, 0) + 1
+        if counts[key] == 1:  # subexpressions of a repeated one are counted once
+            pending.extend(_subexpressions(expr))
+
+    compiled = {}
+    slots = {}
+
+    def compile_child(obj):
+        if not isinstance(obj, Expression):
+            return compile_expression(obj)
+        key = structural_key(obj)
+        if key not in compiled:
+            function = obj._compile(compile_child)
+            if counts.get(key, 0) > 1 and not isinstance(obj, Symbol) and _shareable(obj, pure, shareable):
+                function = _memoized(function, slots.setdefault(key, len(slots)))
+            compiled[key] = function
+        return compiled[key]
+
+    functions = [compile_child(e) for e in exprs]
+
+    def evaluate(context):
+        context = dict(context)
+        context[_memo] = {}
+        return [f(context) for f in functions]
+    return evaluate
+
+
+# compiled groups of expressions, keyed by the identities of the expressions
+_shared_cache = OrderedDict()
+_shared_cache_lock = threading.Lock()
+_shared_cache_size = 256
+
+
+def evaluate_shared(exprs, context):
+    """Values of the expressions in the context evaluating common subexpressions once"""
+    ids = tuple(id(e) for e in exprs)
+    with _shared_cache_lock:
+        cached = _shared_cache.get(ids)
+        if cached is not None:
+            _shared_cache.move_to_end(ids)
+    # the cache keeps the expressions alive, their ids are not reused while cached
+    if cached is None or any(a is not b for a, b in zip(cached[0], exprs)):
+        cached = (list(exprs), compile_shared(exprs))
+        with _shared_cache_lock:
+            _shared_cache[ids] = cached
+            while len(_shared_cache) > _shared_cache_size:
+                _shared_cache.popitem(last=False)
+    return cached[1](context)
+
+
+def _memoized(function, slot):
+    def evaluate(context):
+        memo = context[_memo]
+        if slot not in memo:
+            memo[slot] = function(context)
+        return memo[slot]
+    return evaluate
+
+
 def to_callable(obj):
     """Turn an object into a callable.
     Args:
@@ -218,7 +446,8 @@ def to_callable(obj):
         12
     """
     if hasattr(obj, '_eval'):
-        return lambda *args, **kwargs: obj._eval(dict(enumerate(args), **kwargs))
+        evaluate = compile_expression(obj)
+        return lambda *args, **kwargs: evaluate(dict(enumerate(args), **kwargs))
     elif callable(obj):
         return obj
     else:
@@ -248,8 +477,67 @@ def sym_call(func, *args, **kwargs):
 
     return Call(func, args=args, kwargs=kwargs)        
 
+class ColumnSelection(object):
+    """
+    Evaluated selector of `select`/`drop`: positions of the columns it names and
+    their signs, 1 for the selected columns, -1 for the excluded ones (`'-x'`, `~X.x`)
+    """
+    __slots__ = ('positions', 'signs')
+
+    def __init__(self, positions, signs):
+        self.positions = positions
+        self.signs = signs
+
+
+def column_positions(columns, labels):
+    """
+    Positions of the `labels` in the `columns` index, found by its (cached) hash
+    table. The first position is taken for duplicated column names. ValueError for
+    unknown labels.
+    """
+    labels = list(labels)
+    if columns.is_unique and len(labels) < 8:
+        # single lookups, cheaper than `get_indexer` for a few labels
+        return np.array([_first_position(columns, label) for label in labels], dtype=np.int64)
+    if columns.is_unique:
+        positions = columns.get_indexer(labels)
+        if (positions < 0).any():
+            raise ValueError('%r is not in columns' % (labels[int(np.argmax(positions < 0))],))
+        return positions
+    return np.array([_first_position(columns, label) for label in labels], dtype=np.int64)
+
+
+def _excluded_labels(columns, labels):
+    """Labels with the `'-x'` exclusions of existing columns replaced by `x`, and the mask of the excluded ones"""
+    excluded = [isinstance(l, str) and l[:1] == '-' and l[1:] in columns for l in labels]
+    return [l[1:] if e else l for l, e in zip(labels, excluded)], np.array(excluded, dtype=bool)
+
+
+def _first_position(columns, label):
+    try:
+        location = columns.get_loc(label)
+    except KeyError:
+        raise ValueError('%r is not in columns' % (label,))
+    if isinstance(location, slice):
+        return location.start
+    if isinstance(location, np.ndarray):
+        return int(np.argmax(location))
+    return location
+
+
 EvalMode = Union[List, None, bool] # type for evaluation mode type
 
+def _pipe_context(df, args):
+    """`X` is the frame in the pipe, `Y` the frame given as the first argument (e.g. the right side of a join)"""
+    context = {0: df}
+    right = args[0] if len(args) > 0 else None
+    # an indexed frame of the joins stands for its frame
+    right = getattr(right, 'frame', right) if not isinstance(right, pd.DataFrame) else right
+    if isinstance(right, pd.DataFrame):
+        context[1] = right
+    return context
+
+
 class PipeEvaluationEngine(object):
 
     def __init__(self, function, eval_symbols=True, eval_as_label=[],
@@ -257,6 +545,7 @@ class PipeEvaluationEngine(object):
         super(PipeEvaluationEngine, self).__init__()
         self.function = function
         self.__doc__ = function.__doc__
+        self.__name__ = getattr(function, '__name__', 'pipe')
 
         self.eval_symbols = eval_symbols
         self.eval_as_label = eval_as_label
@@ -278,57 +567,49 @@ class PipeEvaluationEngine(object):
             return self._evaluate_selector(df, arg, context, **options)            
     
     def _evaluate_selector(self, df, arg, context, **options):
-
-        negate = np.array([1 for i in range(df.shape[1])])
+        inverted = False
         if hasattr(arg, '_eval') or isinstance(arg, Expression):
-            if arg.inverted:
-                negate = negate * -1
+            inverted = bool(arg.inverted)
             arg = eval_if_symbolic(arg, context, **options)
-        #Get array with elements designating indexes of selected columns
-        orig_cols = list(df.columns)
+        columns = df.columns
+        excluded = None
+        #Get positions of selected columns, names are looked up in the hash index of the columns
         if isinstance(arg, pd.Series): # covers cases like X.col_name because result will be getter evaluated with context
-            arg = [orig_cols.index(arg.name)]
+            positions = column_positions(columns, [arg.name])
         elif isinstance(arg, pd.Index):
-            arg = [orig_cols.index(i) for i in list(arg)]
+            positions = column_positions(columns, arg)
         elif isinstance(arg, pd.DataFrame):
-            arg = [orig_cols.index(i) for i in arg.columns]
-        elif isinstance(arg, int):
-            arg = [arg]
-        elif isinstance(arg, str):
-            if arg[0] == '-' and arg[1:] in orig_cols:
-                col_idx = orig_cols.index(arg[1:])
-                negate[col_idx] = -1
-                arg = [col_idx]
-            elif arg == "*":
-                arg = [i for i in range(df.shape[1])]
-            else:     
-                arg = [orig_cols.index(arg)]
-        elif isinstance(arg, (list, tuple)):
-            pars_arg = []
-            for s in arg:
-                if isinstance(s, str):
-                    if s[0] == '-' and s[1:] in orig_cols:
-                        col_idx = orig_cols.index(arg[1:])
-                        negate[col_idx] = -1
-                        s_idx = orig_cols.index(col_idx)
-                    else:     
-                        s_idx = orig_cols.index(arg)
-                    pars_arg.append(s_idx)    
-                else: #should happen only if array of integers passed
-                    pars_arg.append(s)
-            arg = pars_arg
-
-        selected_columns_vector = np.zeros(df.shape[1]) #fill array wit hdimention of # of columns with 0
-        col_idx = np.array(arg) if arg is not None else np.zeros(0) # create np array out of array we got in argument 
-
-        if len(col_idx) > 0:
-            selected_columns_vector[col_idx] = 1
-        selected_columns_vector = selected_columns_vector * negate    
-        return selected_columns_vector #1d np array with dimenstion as # of columns with 0, 1, -1
+            positions = column_positions(columns, arg.columns)
+        elif isinstance(arg, (int, np.integer)):
+            positions = [arg]
+        elif isinstance(arg, str) and arg == "*":
+            positions = np.arange(len(columns))
+        elif isinstance(arg, (str, list, tuple)):
+            labels, excluded = _excluded_labels(columns, [arg] if isinstance(arg, str) else arg)
+            #integers in the list are positions already
+            is_label = np.array([not isinstance(l, (int, np.integer)) for l in labels], dtype=bool)
+            positions = np.array([l if not named else 0 for l, named in zip(labels, is_label)], dtype=np.int64)
+            positions[is_label] = column_positions(columns, [l for l, named in zip(labels, is_label) if named])
+        else:
+            positions = []
+
+        positions = np.asarray(positions, dtype=np.int64)
+        n = len(columns)
+        if ((positions < -n) | (positions >= n)).any():
+            raise IndexError('column position out of range for %d columns: %s' %
+                             (n, positions[(positions < -n) | (positions >= n)].tolist()))
+        positions = np.where(positions < 0, positions + n, positions)
+        signs = np.ones(len(positions), dtype=np.int64)
+        if inverted:
+            signs[:] = -1
+        if excluded is not None:
+            signs[excluded] = -1
+        return ColumnSelection(positions, signs)
             
     def _rec_eval_label(self, df, arg, context):
         if isinstance(arg, (list, tuple)):
-            return [self._rec_eval_label(df, _a, context) for _a in arg]
+            # tuples stay tuples, e.g. a (left, right) pair of join keys
+            return type(arg)(self._rec_eval_label(df, _a, context) for _a in arg)
         else:
             return self._evaluate_label(df, arg, context)     
 
@@ -344,9 +625,7 @@ class PipeEvaluationEngine(object):
         return arg
 
     def _arg_eval(self, df, args, **options):
-        context = {0: df}
-        if len(args) > 0 and isinstance(args[0], pd.DataFrame): 
-            context[1] = args[0]
+        context = _pipe_context(df, args)
         eval_as_symbols = self._get_argument_eval_mode(self.eval_symbols, args)
         eval_as_selector = self._get_argument_eval_mode(self.eval_as_selector, args)
         eval_as_label = self._get_argument_eval_mode(self.eval_as_label, args)
@@ -361,13 +640,20 @@ class PipeEvaluationEngine(object):
 
 
     def _kwarg_eval(self, df: pd.DataFrame, args, kwargs, **options):
-        context = {0: df}
-        if len(args) > 0 and isinstance(args[0], pd.DataFrame): 
-            context[1] = args[0]
+        context = _pipe_context(df, args)
 
         eval_as_symbols = self._get_kwargs_eval_mode(self.eval_symbols, kwargs)
         eval_as_selector = self._get_kwargs_eval_mode(self.eval_as_selector, kwargs)
         eval_as_label = self._get_kwargs_eval_mode(self.eval_as_label, kwargs)
+
+        # expressions of one stage are evaluated together, common subexpressions once
+        shared = [k for k in eval_as_symbols
+                  if k in kwargs and k not in eval_as_label and k not in eval_as_selector
+                  and isinstance(kwargs[k], Expression)]
+        if len(shared) > 1 and not options:
+            values = evaluate_shared([kwargs[k] for k in shared], context)
+            kwargs = dict(kwargs, **dict(zip(shared, values)))
+            eval_as_symbols = [k for k in eval_as_symbols if k not in shared]
         
         return {
             k: (self._rec_eval_label(df, v, context) if k in eval_as_label
@@ -0,0 +1,113 @@
+"""
+Vectorized evaluation of symbolic expressions relative to groups.
+
+A grouped verb evaluates its expressions on every group separately, e.g. in
+`group_by('k') >> mutate(d=X.v - X.v.mean())` the mean is the mean of the group.
+Here such expressions are evaluated for all the groups at once over the whole
+columns: elementwise operations run on the full columns, reductions become
+`groupby.transform` (broadcasting the group value to the rows of the group) and
+cumulative/shift/rank methods and the window functions (see `window`) run the
+grouped kernels of pandas. The results are
+aligned with the rows of the frame, in their original order.
+"""
+import numpy as np
+import pandas as pd
+
+from .symbolic_eval import Call, Expression, GetAttr, Symbol
+from .window import WindowFunction
+
+# reductions broadcast to the rows of the group, with their allowed keyword arguments
+_reductions = {
+    'sum': set(), 'count': set(), 'min': set(), 'max': set(), 'mean': set(),
+    'median': set(), 'nunique': set(), 'var': {'ddof'}, 'std': {'ddof'},
+    'prod': set(),
+}
+
+# methods with grouped kernels computing a value per row from the rows of its group
+_window_methods = {
+    'cumsum': (0, set()), 'cumprod': (0, set()), 'cummax': (0, set()), 'cummin': (0, set()),
+    'shift': (1, {'periods', 'fill_value'}), 'diff': (1, {'periods'}),
+    'pct_change': (1, {'periods'}), 'ffill': (1, {'limit'}), 'bfill': (1, {'limit'}),
+    'rank': (0, {'method', 'ascending', 'na_option', 'pct'}),
+}
+
+
+class NotVectorized(Exception):
+    """The expression can not be evaluated for all the groups at once"""
+
+
+def _is_frame(obj):
+    return isinstance(obj, Symbol) and obj._name == 0
+
+
+class GroupedExpressionEvaluator(object):
+    """Evaluates expressions of `X` per group of `df` given its `GroupIndex`"""
+
+    def __init__(self, df, index):
+        from .optimizer import _elementwise_methods, _elementwise_operators
+        self.df = df
+        self.index = index
+        self.elementwise = _elementwise_operators | _elementwise_methods
+
+    def _grouped(self, values):
+        if not isinstance(values, pd.Series) or not values.index.equals(self.df.index):
+            raise NotVectorized(values)
+        return values.groupby(self.index.grouper, sort=True, observed=False)
+
+    def _size(self):
+        ones = pd.Series(np.ones(len(self.df), dtype=np.int64), index=self.df.index)
+        return self._grouped(ones).transform('size')
+
+    def evaluate(self, expr):
+        """Values of `expr` as a series aligned with the rows, raises `NotVectorized`"""
+        if isinstance(expr, (list, tuple)):
+            return type(expr)(self.evaluate(e) for e in expr)
+        if not isinstance(expr, Expression):
+            if hasattr(expr, '_eval') or isinstance(expr, (pd.Series, pd.DataFrame, np.ndarray)) or callable(expr):
+                raise NotVectorized(expr)
+            return expr
+        if isinstance(expr, GetAttr) and _is_frame(expr._obj) and not hasattr(pd.DataFrame, expr._name):
+            return self.df[expr._name]
+        if not isinstance(expr, Call):
+            raise NotVectorized(expr)
+
+        func = expr._func
+        if func is len and len(expr._args) == 1 and _is_frame(expr._args[0]) and not expr._kwargs:
+            return self._size()
+        if isinstance(func, WindowFunction):
+            args = [self.df if _is_frame(a) else self.evaluate(a) for a in expr._args]
+            kwargs = {k: self.evaluate(v) for k, v in expr._kwargs.items()}
+            if any(isinstance(a, pd.Series) for a in list(args[1:]) + list(kwargs.values())):
+                raise NotVectorized(expr)
+            return func.grouped(self.index, *args, **kwargs)
+        if not isinstance(func, GetAttr) or not isinstance(func._name, str):
+            raise NotVectorized(expr)
+        name, obj = func._name, func._obj
+        if _is_frame(obj):
+            if name == '__getitem__' and len(expr._args) == 1 and isinstance(expr._args[0], str):
+                return self.df[expr._args[0]]
+            raise NotVectorized(expr)
+        if isinstance(obj, GetAttr) and obj._name == 'shape' and _is_frame(obj._obj) and \
+                name == '__getitem__' and len(expr._args) == 1 and isinstance(expr._args[0], int) \
+                and expr._args[0] == 0:
+            return self._size()
+
+        if name in self.elementwise:
+            values = self.evaluate(obj)
+            args = [self.evaluate(a) for a in expr._args]
+            kwargs = {k: self.evaluate(v) for k, v in expr._kwargs.items()}
+            return getattr(values, name)(*args, **kwargs)
+        if name in _reductions and not expr._args and set(expr._kwargs) <= _reductions[name]:
+            return self._grouped(self.evaluate(obj)).transform(name, **expr._kwargs)
+        if name in _window_methods:
+            n_args, allowed = _window_methods[name]
+            if len(expr._args) > n_args or not set(expr._kwargs) <= allowed or \
+                    any(isinstance(a, Expression) for a in list(expr._args) + list(expr._kwargs.values())):
+                raise NotVectorized(expr)
+            return getattr(self._grouped(self.evaluate(obj)), name)(*expr._args, **expr._kwargs)
+        raise NotVectorized(expr)
+
+
+def evaluate_grouped(expr, df, index):
+    """Values of the expression evaluated per group for all the groups at once, see `GroupedExpressionEvaluator`"""
+    return GroupedExpressionEvaluator(df, index).evaluate(expr)
@@ -0,0 +1,154 @@
+"""
+Window functions for `mutate`: every row gets a value computed from the rows
+around it (previous/next rows, ranks, running and rolling aggregates).
+
+    df >> group_by('user') >> mutate(previous=lag(X.time), n=row_number(),
+                                     running=cumsum(X.amount),
+                                     smooth=rolling_mean(X.amount, 7))
+
+Called with symbolic arguments a window function gives the expression of its
+call. Evaluated on a column it runs over the whole column, in a grouped `mutate`
+the window restarts in every group and is computed for all the groups at once by
+the grouped kernels of pandas (see `transform`).
+"""
+import numpy as np
+import pandas as pd
+
+from .symbolic_eval import Expression, X, sym_call
+
+
+class WindowFunction(object):
+    """
+    `function(values, ...)` over the rows of a series (or frame), `grouped(index,
+    values, ...)` the same for every group of the `GroupIndex` at once with the
+    result aligned with the rows.
+    """
+
+    def __init__(self, function, grouped):
+        self.function = function
+        self.grouped = grouped
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __call__(self, *args, **kwargs):
+        # without an operand the window is over the rows of the frame
+        args = args or (X,)
+        if any(isinstance(a, Expression) for a in list(args) + list(kwargs.values())):
+            return sym_call(self, *args, **kwargs)
+        return self.function(*args, **kwargs)
+
+    def __repr__(self):
+        return 'WindowFunction(%s)' % self.__name__
+
+
+def window_function(grouped):
+    """Decorator making a `WindowFunction` out of the ungrouped function"""
+    return lambda function: WindowFunction(function, grouped)
+
+
+def _by_group(values, index):
+    return values.groupby(index.grouper, sort=True, observed=False)
+
+
+def _lag_grouped(index, x, n=1, default=None):
+    return _by_group(x, index).shift(n, fill_value=default)
+
+
+def _lead_grouped(index, x, n=1, default=None):
+    return _by_group(x, index).shift(-n, fill_value=default)
+
+
+@window_function(_lag_grouped)
+def lag(x, n=1, default=None):
+    """Value `n` rows before, `default` for the first rows"""
+    return x.shift(n, fill_value=default)
+
+
+@window_function(_lead_grouped)
+def lead(x, n=1, default=None):
+    """Value `n` rows after, `default` for the last rows"""
+    return x.shift(-n, fill_value=default)
+
+
+def _row_number_grouped(index, x):
+    if isinstance(x, pd.DataFrame):
+        return _by_group(pd.Series(np.ones(len(x), dtype=np.int64), index=x.index), index).cumcount() + 1
+    return _by_group(x, index).rank(method='first')
+
+
+@window_function(_row_number_grouped)
+def row_number(x):
+    """
+    Number of the row, 1 for the first row (of the group) - `row_number()`. With a
+    column `x` the rows are numbered in the order of its values, ties in the order of the rows.
+    """
+    if isinstance(x, pd.DataFrame):
+        return pd.Series(np.arange(1, len(x) + 1), index=x.index)
+    return x.rank(method='first')
+
+
+def _rank_grouped(method):
+    return lambda index, x: _by_group(x, index).rank(method=method)
+
+
+@window_function(_rank_grouped('min'))
+def min_rank(x):
+    """Rank of the value, ties get the lowest rank and leave gaps (1, 2, 2, 4)"""
+    return x.rank(method='min')
+
+
+@window_function(_rank_grouped('dense'))
+def dense_rank(x):
+    """Rank of the value, ties get the same rank without gaps (1, 2, 2, 3)"""
+    return x.rank(method='dense')
+
+
+def _cumulative_grouped(name):
+    return lambda index, x: getattr(_by_group(x, index), name)()
+
+
+@window_function(_cumulative_grouped('cumsum'))
+def cumsum(x):
+    """Running sum"""
+    return x.cumsum()
+
+
+@window_function(_cumulative_grouped('cummin'))
+def cummin(x):
+    """Running minimum"""
+    return x.cummin()
+
+
+@window_function(_cumulative_grouped('cummax'))
+def cummax(x):
+    """Running maximum"""
+    return x.cummax()
+
+
+def _rolling_grouped(name):
+    def rolling_grouped(index, x, window, min_periods=None):
+        # rows by position, the grouped result comes in the order of the groups
+        positioned = x.reset_index(drop=True)
+        rolled = getattr(_by_group(positioned, index).rolling(window, min_periods=min_periods), name)()
+        values = np.empty(len(x), dtype=rolled.dtype)
+        values[rolled.index.get_level_values(-1)] = rolled.values
+        return pd.Series(values, index=x.index, name=x.name)
+    return rolling_grouped
+
+
+def _rolling(name):
+    def rolling(x, window, min_periods=None):
+        return getattr(x.rolling(window, min_periods=min_periods), name)()
+    rolling.__name__ = 'rolling_' + name
+    rolling.__doc__ = '%s of the last `window` rows (with at least `min_periods` values)' % \
+        {'sum': 'Sum', 'mean': 'Mean', 'min': 'Minimum', 'max': 'Maximum', 'std': 'Standard deviation',
+         'median': 'Median'}[name]
+    return WindowFunction(rolling, _rolling_grouped(name))
+
+
+rolling_sum = _rolling('sum')
+rolling_mean = _rolling('mean')
+rolling_min = _rolling('min')
+rolling_max = _rolling('max')
+rolling_std = _rolling('std')
+rolling_median = _rolling('median')
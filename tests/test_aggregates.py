@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from ply_ng import *
+from ply_ng.aggregates import Mean, Size, Std, Var, recognize
+
+
+class AggregatesTest(unittest.TestCase):
+
+    def test_recognize(self):
+        self.assertIsInstance(recognize(X.v.mean()), Mean)
+        self.assertIsInstance(recognize((X.v * 2).std(ddof=0)), Std)
+        self.assertIsInstance(recognize(sym_call(len, X)), Size)
+        self.assertIsInstance(recognize(X.shape[0]), Size)
+        self.assertIsNone(recognize(X.v.rolling(3).mean()))
+        self.assertIsNone(recognize(X.v.mean() + 1))
+        self.assertIsNone(recognize(X.v.quantile(0.5)))
+
+    def test_merged_variance(self):
+        values = pd.DataFrame({'v': [1.0, 5.0, 2.0, 8.0, 3.0]})
+        var = Var(X.v)
+        keys = np.zeros(5, dtype=np.int64)
+        state = var.merge(var.partial(values.iloc[:2], keys[:2]), var.partial(values.iloc[2:], keys[2:]))
+        self.assertAlmostEqual(var.finalize(state)[0], values.v.var())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import pandas as pd
+from pandas.testing import assert_frame_equal
 
 from ply_ng import *
 
@@ -39,7 +40,46 @@ class GroupingTest(unittest.TestCase):
         d_ung = d >> ungroup()
         self.assertTrue(d_ung._grouped_by == None)
 
+    def test_group_index(self):
+        d = self.test_df2 >> group_by('x', 'y')
+        index = d._group_index
+        self.assertEqual(list(index.codes), [0, 1, 0, 2])
+        self.assertEqual(index.n_groups, 3)
+        self.assertEqual(list(index.order), [0, 2, 1, 3])
+        self.assertEqual(list(index.offsets), [0, 2, 3, 4])
+        self.assertEqual(index.key_values(d).values.tolist(), [[1, 1], [2, 2], [2, 4]])
 
+        missing = pd.DataFrame({'x': [1, None]}) >> group_by('x')
+        self.assertIsNone(missing._group_index)
+
+    def test_group_index_reused(self):
+        chain = group_by('x') >> mutate(a=X.y - X.y.mean()) >> mutate(b=X.a.cumsum())
+        d = self.test_df2 >> chain
+        self.assertIs(group_index(d), d._group_index)
+        self.assertIs(group_index(d >> mutate(c=X.z * 2)).codes, d._group_index.codes)
+
+        # new key values or different rows invalidate it
+        changed = d >> mutate(x=X.x * 2)
+        self.assertIsNot(group_index(changed), d._group_index)
+        self.assertEqual(list(group_index(d >> filter_by(X.z > 4)).codes), [0, 1, 0])
+
+    def test_ungroup_drops_group_index(self):
+        d = self.test_df2 >> group_by('x') >> ungroup()
+        self.assertIsNone(d._group_index)
+        self.assertIsNone(group_index(d))
+
+    def test_sorted_group_index(self):
+        d = pd.DataFrame({'x': [1, 1, 2, 2, 2, 3], 'y': ['b', 'c', 'a', 'a', 'b', 'a'], 'z': range(6)})
+        index = (d >> group_by('x', 'y'))._group_index
+        self.assertTrue(index.sorted)
+        self.assertEqual(list(index.codes), [0, 1, 2, 2, 3, 4])
+        self.assertEqual(list(index.order), list(range(6)))
+        self.assertFalse((d >> group_by('y'))._group_index.sorted)
+        assert_frame_equal(d >> group_by('x', 'y', sorted=True) >> summarize(s=X.z.sum()),
+                           d.iloc[::-1] >> group_by('x', 'y') >> summarize(s=X.z.sum()))
+
+        with self.assertRaises(ValueError):
+            d >> group_by('y', sorted=True)
 
 
 if __name__ == '__main__':
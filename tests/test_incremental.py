@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+
+
+class IncrementalSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 5, 300),
+            'v': rng.normal(size=300)
+        })
+        self.aggregates = dict(s=X.v.sum(), m=X.v.mean(), sd=X.v.std(), hi=X.v.max(), n=sym_call(len, X))
+        self.path = os.path.join(tempfile.mkdtemp(), 'summary.state')
+
+    def test_updates(self):
+        summary = IncrementalSummary(['k'], **self.aggregates)
+        for start in range(0, 300, 70):
+            summary.update(self.test_df.iloc[start:start + 70])
+        expected = self.test_df >> group_by('k') >> summarize(**self.aggregates)
+        assert_frame_equal(summary.result(), expected)
+        self.assertEqual(summary.rows, 300)
+
+    def test_persisted_state(self):
+        IncrementalSummary(['k'], path=self.path, **self.aggregates).update(self.test_df.iloc[:100])
+        summary = IncrementalSummary(['k'], path=self.path, **self.aggregates).update(self.test_df.iloc[100:])
+        expected = self.test_df >> group_by('k') >> summarize(**self.aggregates)
+        assert_frame_equal(summary.result(), expected)
+
+        with self.assertRaises(ValueError):
+            IncrementalSummary(['k'], path=self.path, s=X.v.sum())
+
+    def test_not_mergeable(self):
+        with self.assertRaises(ValueError):
+            IncrementalSummary(['k'], q=X.v.quantile(0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from ply_ng import *
+import numpy as np
 import pandas as pd
+from pandas.testing import assert_frame_equal
 
 
 
@@ -97,5 +99,158 @@ class JoinsTest(unittest.TestCase):
         self.assertTrue(joined.equals(exp_df))   
     
 
+class IndexedJoinsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dim = pd.DataFrame({
+            'id': [1, 2, 2, 3, np.nan],
+            'kind': ['a', 'b', 'c', None, 'e'],
+            'y': [10, 20, 30, 40, 50]})
+        self.batch = pd.DataFrame({
+            'k': [2, 5, 1, 2, np.nan, 3],
+            'kind': ['b', 'b', 'a', 'x', 'e', None],
+            'y': [1, 2, 3, 4, 5, 6]})
+
+    def test_indexed_join_matches_merge(self):
+        dim = indexed(self.dim, by=['id', 'kind'])
+        for verb in [inner_join, left_join, right_join]:
+            for by in [[('k', 'id'), 'kind'], [('kind', 'kind'), (X.k, Y.id)]]:
+                expected = self.batch >> verb(self.dim, by=by)
+                joined = self.batch >> verb(dim, by=by)
+                assert_frame_equal(joined, expected, check_index_type=False)
+
+    def test_indexed_join_on_index_keys(self):
+        dim = indexed(self.dim.drop(columns=['kind']), by='id')
+        batch = self.batch.rename(columns={'k': 'id'})
+        expected = batch >> left_join(self.dim.drop(columns=['kind']), by='id')
+        assert_frame_equal(batch >> left_join(dim), expected, check_index_type=False)
+        with self.assertRaises(ValueError):
+            batch >> left_join(dim, by='y')
+
+    def test_indexed_join_of_categorical_keys(self):
+        batch = self.batch.assign(kind=self.batch.kind.astype('category'))
+        permuted = pd.Categorical(self.dim.kind.where(self.dim.kind != 'c', 'x'), categories=['x', 'e', 'b', 'a'])
+        for kind in [self.dim.kind.astype('category'), self.dim.kind, permuted]:
+            dim = self.dim.assign(kind=kind)
+            for verb, how in [(inner_join, 'inner'), (left_join, 'left')]:
+                joined = batch >> verb(indexed(dim, by='kind'), by='kind')
+                assert_frame_equal(joined, batch.merge(dim, on='kind', how=how), check_index_type=False)
+        self.assertEqual(joined.kind.dtype, batch.kind.dtype)
+
+    def test_index_rebuilt_when_keys_change(self):
+        dim = indexed(self.dim, by='id')
+        built = dim.index
+        self.assertIs(dim.index, built)
+        self.dim['id'] = [3, 2, 1, 2, 5]
+        self.assertIsNot(dim.index, built)
+        expected = self.batch >> inner_join(self.dim, by=[('k', 'id')])
+        assert_frame_equal(self.batch >> inner_join(dim, by=[('k', 'id')]), expected, check_index_type=False)
+
+    def test_lazy_and_streamed_indexed_join(self):
+        dim = indexed(self.dim, by='id')
+        expected = (self.batch >> left_join(self.dim, by=[('k', 'id')]) >>
+                    filter_by(X.y_x > 2) >> select('k', 'kind_y'))
+        collected = (lazy(self.batch) >> left_join(dim, by=[('k', 'id')]) >>
+                     filter_by(X.y_x > 2) >> select('k', 'kind_y')).collect()
+        assert_frame_equal(collected.reset_index(drop=True), expected.reset_index(drop=True))
+        streamed = (stream([self.batch.iloc[:3], self.batch.iloc[3:]]) >>
+                    inner_join(dim, by=[('k', 'id')])).collect()
+        self.assertEqual(len(streamed), len(self.batch >> inner_join(self.dim, by=[('k', 'id')])))
+
+
+class SortedJoinsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.left = pd.DataFrame({'t': [1, 2, 2, 4, 7], 'a': [1.0, 2.0, 3.0, 4.0, 5.0]})
+        self.right = pd.DataFrame({'t': [0, 2, 2, 4, 8], 'a': [5, 6, 7, 8, 9]})
+
+    def test_sort_merge_matches_hash_join(self):
+        for verb in [inner_join, left_join, right_join]:
+            for by in ['t', [('t', 't')]]:
+                expected = self.left >> verb(self.right, by=by, strategy='hash')
+                assert_frame_equal(self.left >> verb(self.right, by=by, strategy='merge'),
+                                   expected, check_index_type=False)
+                joined = self.left >> verb(self.right, by=by)
+                assert_frame_equal(joined, expected, check_index_type=False)
+                self.assertEqual(joined.attrs['join_strategy'], 'merge')
+
+    def test_sort_merge_needs_sorted_frames(self):
+        unsorted = self.left.iloc[::-1]
+        with self.assertRaises(ValueError):
+            unsorted >> inner_join(self.right, by='t', strategy='merge')
+        with self.assertRaises(ValueError):
+            self.left >> inner_join(self.right, by='t', strategy='nested_loop')
+        expected = unsorted.merge(self.right, on='t')
+        assert_frame_equal(unsorted >> inner_join(self.right, by='t'), expected)
+
+    def test_sort_merge_needs_same_key_dtypes(self):
+        left = pd.DataFrame({'k': [2 ** 53, 2 ** 53 + 1]})
+        right = pd.DataFrame({'k': [2 ** 53 + 1.0], 'v': [1]})
+        joined = left >> inner_join(right, by='k')
+        assert_frame_equal(joined, left.merge(right, on='k'))
+        self.assertNotEqual(joined.attrs['join_strategy'], 'merge')
+        with self.assertRaises(ValueError):
+            left >> inner_join(right, by='k', strategy='merge')
+
+        naive = pd.DataFrame({'t': pd.date_range('2020-01-01', periods=3)})
+        aware = pd.DataFrame({'t': pd.date_range('2020-01-01', periods=3, tz='UTC'), 'v': [1, 2, 3]})
+        with self.assertRaises(ValueError):
+            naive >> inner_join(aware, by='t')
+
+        unsigned = pd.DataFrame({'k': np.array([1, 2, 3], dtype=np.uint64)})
+        signed = pd.DataFrame({'k': np.array([2, 3, 4], dtype=np.int64), 'v': [1, 2, 3]})
+        assert_frame_equal(unsigned >> right_join(signed, by='k'), unsigned.merge(signed, on='k', how='right'))
+
+    def test_asof_join(self):
+        trades = pd.DataFrame({
+            'time': pd.to_datetime(['10:00:03', '10:00:01', '10:00:02', '10:00:10']),
+            'ticker': ['B', 'A', 'A', 'A'],
+            'price': [1, 2, 3, 4]})
+        quotes = pd.DataFrame({
+            'quote_time': pd.to_datetime(['10:00:00', '10:00:02', '10:00:01', '10:00:02']),
+            'symbol': ['A', 'A', 'B', 'B'],
+            'bid': [0.1, 0.2, 0.3, 0.4]})
+        joined = trades >> asof_join(quotes, on=('time', 'quote_time'), by=[('ticker', 'symbol')])
+        self.assertEqual(list(joined.columns), ['time', 'ticker', 'price', 'quote_time', 'symbol', 'bid'])
+        self.assertEqual(joined.price.tolist(), [1, 2, 3, 4])
+        self.assertEqual(joined.bid.tolist(), [0.4, 0.1, 0.2, 0.2])
+        joined = trades >> asof_join(quotes, on=(X.time, Y.quote_time), by=[(X.ticker, Y.symbol)],
+                                     tolerance=pd.Timedelta('1s'), allow_exact_matches=False)
+        self.assertEqual(joined.bid.fillna(-1).tolist(), [0.4, 0.1, -1, -1])
+        streamed = (stream([trades.iloc[:2], trades.iloc[2:]]) >>
+                    asof_join(quotes, on=('time', 'quote_time'), by=[('ticker', 'symbol')])).collect()
+        self.assertEqual(streamed.bid.tolist(), [0.4, 0.1, 0.2, 0.2])
+
+
+class FilteringJoinsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.left = pd.DataFrame({'k': [1, 2, 2, 3, np.nan], 'j': ['a', 'b', None, 'c', 'd'], 'v': range(5)},
+                                 index=[10, 11, 12, 13, 14])
+        self.right = pd.DataFrame({'key': [2, 2, 2, 3, np.nan], 'j': ['b', 'b', np.nan, 'x', 'd']})
+
+    def test_semi_join(self):
+        kept = self.left >> semi_join(self.right, by=[('k', 'key')])
+        assert_frame_equal(kept, self.left.loc[[11, 12, 13, 14]])
+        kept = self.left >> semi_join(self.right, by=[(X.k, Y.key), 'j'])
+        assert_frame_equal(kept, self.left.loc[[11, 12, 14]])
+        kept = self.left >> semi_join(self.right)
+        assert_frame_equal(kept, self.left.loc[[11, 12, 14]])
+        kept = self.left >> semi_join(indexed(self.right, by=['j', 'key']), by=[('k', 'key'), 'j'])
+        assert_frame_equal(kept, self.left.loc[[11, 12, 14]])
+
+    def test_aggregating_filter_stays_after_semi_join(self):
+        for verb in [semi_join, anti_join]:
+            lf = lazy(self.left) >> verb(self.right, by=[('k', 'key')]) >> filter_by(X.v < X.v.mean())
+            assert_frame_equal(lf.collect(), lf.collect(optimize=False))
+
+    def test_anti_join(self):
+        dropped = self.left >> anti_join(self.right, by=[('k', 'key')])
+        assert_frame_equal(dropped, self.left.loc[[10]])
+        dropped = self.left >> group_by('j') >> anti_join(self.right, by=[('k', 'key'), ('j', 'j')])
+        assert_frame_equal(dropped, self.left.loc[[10, 13]])
+        self.assertEqual(dropped._grouped_by, ['j'])
+
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
@@ -1,5 +1,6 @@
 import unittest
 from unittest import result
+from unittest.mock import Mock, patch
 import pandas as pd
 
 from ply_ng import *
@@ -15,6 +16,21 @@ class MutationsTest(unittest.TestCase):
         })
 
 
+    def test_mutate_common_subexpressions(self):
+        with patch.object(pd.Series, 'cumsum', autospec=True, side_effect=pd.Series.cumsum) as cumsum:
+            result = self.test_df >> mutate(a=X.x.cumsum(), b=X.x.cumsum() + X.z)
+            self.assertEqual(cumsum.call_count, 1)
+            self.test_df.ply_mutate(a=X.x.cumsum(), b=X.x.cumsum() * 2)
+            self.assertEqual(cumsum.call_count, 2)
+        self.assertEqual(list(result.a), [1, 2, 4, 6])
+        self.assertEqual(list(result.b), [8, 8, 9, 10])
+
+        # functions may be random, every call is evaluated
+        draws = Mock(side_effect=lambda s: s * 10)
+        del draws._eval
+        self.test_df >> mutate(a=sym_call(draws, X.x), b=sym_call(draws, X.x))
+        self.assertEqual(draws.call_count, 2)
+
     def test_mutate(self):
         exp_df = pd.DataFrame({
             'x': [1, 1, 2, 2], 
@@ -47,6 +63,56 @@ class MutationsTest(unittest.TestCase):
     
         self.assertTrue(s_df.equals(result))
 
+    def test_mutate_on_group_relative(self):
+        test_df = pd.DataFrame({
+            'x': [2, 1, 2, 1, 2],
+            'y': [1.0, 2.0, 3.0, 4.0, 8.0]
+        }, index=[4, 3, 2, 1, 0])
+
+        result = (test_df >>
+                group_by('x') >>
+                mutate(
+                    d = X.y - X.y.mean(),
+                    c = X.y.cumsum(),
+                    p = X.y.shift(),
+                    r = X.y.rank(ascending=False),
+                    q = X.y.quantile(0.5)
+                )
+        )
+
+        self.assertEqual(list(result.index), [4, 3, 2, 1, 0])
+        self.assertEqual(list(result.d), [-3.0, -1.0, -1.0, 1.0, 4.0])
+        self.assertEqual(list(result.c), [1.0, 2.0, 4.0, 6.0, 12.0])
+        self.assertEqual(list(result.p.fillna(0)), [0.0, 0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(list(result.r), [3.0, 2.0, 2.0, 1.0, 1.0])
+        self.assertEqual(list(result.q), [3.0, 3.0, 3.0, 3.0, 3.0])
+        self.assertEqual(list(result.columns), ['x', 'y', 'd', 'c', 'p', 'r', 'q'])
+
+    def test_group_values_applied_once(self):
+        for index in [[4, 3, 2, 1, 0], [0, 0, 1, 1, 2]]:
+            test_df = pd.DataFrame({'x': [2, 1, 2, 1, 2], 'y': [1.0, 2.0, 3.0, 4.0, 8.0]}, index=index)
+            udf = Mock(side_effect=lambda d: d.y * 2)
+            del udf._eval
+            result = test_df >> group_by('x') >> mutate(c=X.y.cumsum(), u=udf)
+            self.assertEqual(udf.call_count, 2)
+            # rows with duplicate labels are applied per group, they come group after group
+            self.assertEqual(sorted(zip(result.y, result.c, result.u)),
+                             [(1.0, 1.0, 2.0), (2.0, 2.0, 4.0), (3.0, 4.0, 6.0), (4.0, 6.0, 8.0), (8.0, 12.0, 16.0)])
+
+    def test_group_callable_sees_earlier_columns(self):
+        test_df = pd.DataFrame({'x': [2, 1, 2, 1], 'y': [1.0, 2.0, 3.0, 4.0]})
+        result = test_df >> group_by('x') >> mutate(c=X.y.cumsum(), u=lambda d: d.c * 2)
+        self.assertEqual(list(result.u), [2.0, 4.0, 8.0, 12.0])
+
+    def test_group_values_matched_by_labels(self):
+        from ply_ng.mutate import _mutate_groups
+        test_df = pd.DataFrame({'x': [2, 1, 2], 'y': [1.0, 2.0, 3.0]}) >> group_by('x')
+        apply = Mock(side_effect=lambda d, **kwargs: d.iloc[::-1].assign(u=0))
+        result = _mutate_groups(test_df, apply, (), {'c': X.y.cumsum(), 'u': X.y.map(abs)})
+        apply.assert_called_once()
+        self.assertEqual(list(result.index), [2, 1, 0])
+        self.assertEqual(list(result.c), [4.0, 2.0, 1.0])
+
     def test_mutate_on_group_using_group_dim(self):
         s_df = pd.DataFrame({
             'x': [1, 1, 2, 2], 
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from ply_ng import *
+from ply_ng.numexpr_eval import numexpr, translate
+from ply_ng.symbolic_eval import to_callable
+
+
+class TranslateTest(unittest.TestCase):
+
+    def test_source(self):
+        self.assertEqual(translate(X.a * X['b'] + 3 > X.a).source, '(((v0 * v1) + 3) > v0)')
+        self.assertEqual(translate(1 - X.a / 2).source, '(1 - (v0 / 2))')
+        self.assertEqual(translate(~(X.a > 1) | (X.b < 2)).source, '((~(v0 > 1)) | (v1 < 2))')
+
+    def test_not_translated(self):
+        self.assertIsNone(translate(X.a + 1))  # a single operation is not worth it
+        self.assertIsNone(translate(X.a.abs() + X.b * 2))
+        self.assertIsNone(translate(X.a // X.b + 1))
+        self.assertIsNone(translate(X.shape * 2 + 1))
+        self.assertIsNone(translate(X.a * 2 - float('inf')))
+        self.assertIsNone(translate(X.a * 2 + float('nan')))
+
+
+@unittest.skipIf(numexpr is None, 'numexpr is not installed')
+class NumexprBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'a': rng.normal(size=100),
+            'b': rng.integers(-5, 5, 100),
+            'c': rng.integers(0, 2, 100).astype(bool),
+            's': ['x'] * 100,
+        })
+
+    def evaluate(self, expr):
+        with option_context(expression_backend='numexpr', numexpr_min_rows=0):
+            return to_callable(expr)(self.test_df)
+
+    def test_same_as_pandas(self):
+        exprs = [X.a * X.b + 3, X.b * 2 - X.b, 2 / X.b + X.a, (X.a > 0) & X.c | (X.b == 1),
+                 ~X.c & (X.b != 0), -X.a * X.b]
+        for expr in exprs:
+            assert_series_equal(self.evaluate(expr), to_callable(expr)(self.test_df))
+
+    def test_fallback(self):
+        for expr in [X.s + X.s + 'y', X.b & X.b | 1, X.missing * 2 + 1, X.b * 2 - float('inf')]:
+            try:
+                expected = to_callable(expr)(self.test_df)
+            except AttributeError:
+                with self.assertRaises(AttributeError):
+                    self.evaluate(expr)
+                continue
+            assert_series_equal(self.evaluate(expr), expected)
+
+    def test_verbs(self):
+        chain = mutate(z=X.a * X.b + 1) >> filter_by((X.a > 0) & (X.b < 3))
+        with option_context(expression_backend='numexpr', numexpr_min_rows=0):
+            result = self.test_df >> chain
+        assert_frame_equal(result, self.test_df >> chain)
+
+
+if __name__ == '__main__':
+    unittest.main()
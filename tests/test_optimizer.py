@@ -0,0 +1,155 @@
+import unittest
+import pandas as pd
+
+from ply_ng import *
+from ply_ng.optimizer import columns_read, is_row_local, join_schema, optimize
+
+
+class ExpressionAnalysisTest(unittest.TestCase):
+
+    def test_columns_read(self):
+        self.assertEqual(columns_read(X.x + X['y'] * 2), {'x', 'y'})
+        self.assertEqual(columns_read(X.x.rolling(3).mean()), {'x'})
+        self.assertEqual(columns_read(5), set())
+        self.assertIsNone(columns_read(X.shape[0]))
+        self.assertIsNone(columns_read(lambda df: df.x))
+
+    def test_is_row_local(self):
+        self.assertTrue(is_row_local(X.x * 2 + X.y > 3))
+        self.assertTrue(is_row_local(X.x.isin([1, 2]) & X.y.notna()))
+        self.assertFalse(is_row_local(X.x - X.x.mean()))
+        self.assertFalse(is_row_local(X.x.shift()))
+        self.assertTrue(is_row_local('label'))
+        self.assertFalse(is_row_local([1, 2, 3, 4]))
+        self.assertFalse(is_row_local({'a': 1}))
+
+    def test_join_schema_follows_merge(self):
+        left = pd.DataFrame({'k': [1], 'a': [1], 'y': [1]})
+        right = pd.DataFrame({'k': [1], 'y': [1], 'b': [1]})
+        merged = left.merge(right, left_on=['k'], right_on=['k'])
+        names = [n for n, _, _ in join_schema(list(left.columns), list(right.columns), ['k'], ['k'], ('_x', '_y'))]
+        self.assertEqual(names, list(merged.columns))
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.left = pd.DataFrame({
+            'k': [1, 2, 3, 4],
+            'a': [1.0, 2.0, 3.0, 4.0],
+            'b': [5, 6, 7, 8],
+            'y': [0, 0, 1, 1]
+        })
+        self.right = pd.DataFrame({
+            'k': [1, 2, 3, 5],
+            'c': [10, 20, 30, 40],
+            'd': [1, 2, 1, 2],
+            'y': [9, 8, 7, 6]
+        })
+
+    def assert_same_result(self, lf):
+        optimized = lf.collect().reset_index(drop=True)
+        plain = lf.collect(optimize=False).reset_index(drop=True)
+        self.assertTrue(optimized.equals(plain))
+
+    def verbs(self, lf):
+        return [n.verb for n in lf.optimized_plan()]
+
+    def test_filter_moves_below_row_local_mutate(self):
+        lf = lazy(self.left) >> mutate(e=X.a * 2) >> filter_by(X.b > 5)
+        self.assertEqual(self.verbs(lf), ['filter_by', 'mutate'])
+        self.assert_same_result(lf)
+
+    def test_aggregating_filter_stays_after_filter(self):
+        lf = lazy(self.left) >> filter_by(X.a > 1) >> filter_by(X.b >= X.b.mean())
+        self.assertEqual(len(lf.collect()), 2)
+        self.assert_same_result(lf)
+        lf = lazy(self.left) >> head(3) >> filter_by(X.a > 1, X.y == 0) >> filter_by(X.b < X.b.mean())
+        self.assert_same_result(lf)
+        lf = lazy(self.left) >> filter_by(X.b > X.b.mean()) >> filter_by(X.a < 3)
+        self.assertEqual(self.verbs(lf), ['filter_by', 'filter_by'])
+        self.assert_same_result(lf)
+        lf = lazy(self.left) >> group_by('y') >> filter_by(X.b > X.b.mean())
+        self.assertEqual(self.verbs(lf), ['group_by', 'filter_by'])
+        self.assert_same_result(lf)
+
+    def test_filter_stays_after_aggregating_mutate(self):
+        lf = lazy(self.left) >> mutate(e=X.a - X.a.mean()) >> filter_by(X.b > 5)
+        self.assertEqual(self.verbs(lf), ['mutate', 'filter_by'])
+        self.assert_same_result(lf)
+
+    def test_filter_stays_after_mutate_of_a_list(self):
+        lf = lazy(self.left) >> mutate(e=[1, 2, 3, 4]) >> filter_by(X.b > 6)
+        self.assertEqual(self.verbs(lf), ['mutate', 'filter_by'])
+        self.assert_same_result(lf)
+
+    def test_filter_stays_after_dropping_its_column(self):
+        lf = lazy(self.left) >> drop('a') >> filter_by(X.a > 2)
+        self.assertEqual(self.verbs(lf)[-1], 'filter_by')
+        self.assertRaises(AttributeError, lf.collect)
+        lf = lazy(self.left) >> select('k', 'b') >> filter_by(X.b > 6)
+        self.assertEqual(self.verbs(lf)[-2:], ['filter_by', 'select'])
+        self.assert_same_result(lf)
+
+    def test_filter_stays_after_mutate_it_reads(self):
+        lf = lazy(self.left) >> mutate(e=X.a * 2) >> filter_by(X.e > 5)
+        self.assertEqual(self.verbs(lf), ['mutate', 'filter_by'])
+
+    def test_filter_split_around_inner_join(self):
+        lf = (lazy(self.left) >>
+              inner_join(self.right, by='k') >>
+              filter_by(X.a < 4, X.d == 1, X.a + X.c > 12))
+        plan = lf.optimized_plan()
+        self.assertEqual([n.verb for n in plan], ['filter_by', 'inner_join', 'filter_by'])
+        self.assertEqual(len(plan.nodes[1].args[0]), 2) # right side was filtered by X.d == 1
+        self.assert_same_result(lf)
+
+    def test_filter_on_right_columns_stays_after_left_join(self):
+        lf = lazy(self.left) >> left_join(self.right, by='k') >> filter_by(X.d == 1)
+        self.assertEqual(self.verbs(lf), ['left_join', 'filter_by'])
+        self.assert_same_result(lf)
+
+    def test_suffixed_columns_are_not_pushed(self):
+        lf = lazy(self.left) >> inner_join(self.right, by='k') >> filter_by(X.y_x > 0)
+        self.assertEqual(self.verbs(lf), ['inner_join', 'filter_by'])
+
+    def test_projection_pushdown(self):
+        lf = (lazy(self.left) >>
+              mutate(e=X.a * 2, unused=X.b.mean()) >>
+              inner_join(self.right, by='k') >>
+              select('k', 'e', 'y_y'))
+        plan = lf.optimized_plan()
+        self.assertEqual([n.verb for n in plan], ['select', 'mutate', 'inner_join', 'select'])
+        self.assertEqual(plan.nodes[0].args, ('k', 'a', 'y'))
+        self.assertEqual(list(plan.nodes[1].kwargs), ['e'])
+        self.assertEqual(list(plan.nodes[2].args[0].columns), ['k', 'y'])
+        self.assert_same_result(lf)
+
+    def test_projection_pushdown_grouped_summarize(self):
+        lf = lazy(self.left) >> drop('a') >> group_by('y') >> summarize(m=X.b.mean())
+        plan = lf.optimized_plan()
+        self.assertEqual([n.verb for n in plan], ['select', 'group_by', 'summarize'])
+        self.assert_same_result(lf)
+
+    def test_overwritten_column_keeps_its_position(self):
+        lf = lazy(self.left) >> mutate(e=X.a + 1) >> select('a', 'e', 'b') >> mutate(e=X.b + 1)
+        self.assertEqual(list(lf.collect().columns), ['a', 'e', 'b'])
+        self.assert_same_result(lf)
+
+    def test_positional_select_is_resolved_to_names(self):
+        lf = lazy(self.left) >> select(0, 2) >> filter_by(X.b > 5)
+        self.assert_same_result(lf)
+
+    def test_opaque_verbs_stop_optimization(self):
+        lf = lazy(self.left) >> mutate(e=lambda df: df.a * 2) >> filter_by(X.b > 5) >> select('e')
+        self.assertEqual(self.verbs(lf), ['mutate', 'filter_by', 'select'])
+        self.assert_same_result(lf)
+
+    def test_optimize_does_not_change_plan(self):
+        plan = (filter_by(X.b > 5) >> mutate(e=X.a * 2) >> select('e')).plan
+        optimize(plan, self.left.columns)
+        self.assertEqual([n.verb for n in plan], ['filter_by', 'mutate', 'select'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+from ply_ng.parallel import balanced_batches, partition_bounds
+
+
+class ParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 5, 1000),
+            'v': rng.normal(size=1000),
+            'w': rng.integers(0, 100, 1000)
+        })
+
+    def test_partition_bounds(self):
+        self.assertEqual(partition_bounds(10, 3), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(partition_bounds(2, 4), [(0, 1), (1, 2)])
+        self.assertEqual(partition_bounds(0, 4), [])
+
+    def test_row_local_chain(self):
+        chain = filter_by(X.w > 10) >> mutate(z=X.v * 2, r=lambda df: df.w % 7) >> select('k', 'z', 'r')
+        serial = self.test_df >> chain
+        with parallel(3), option_context(parallel_min_rows=10):
+            assert_frame_equal(self.test_df >> chain, serial)
+
+    def test_grouped_chain(self):
+        chain = filter_by(X.w > 10) >> group_by('k') >> mutate(z=X.v * 2) >> summarize(s=X.z.sum())
+        serial = self.test_df >> chain
+        with parallel(3), option_context(parallel_min_rows=10):
+            result = self.test_df >> chain
+        assert_frame_equal(result, serial)
+        self.assertEqual(result._grouped_by, ['k'])
+
+    def test_balanced_batches(self):
+        self.assertEqual(balanced_batches([5, 1, 1, 3, 2], 2), [[0, 1], [2, 3, 4]])
+        self.assertEqual(balanced_batches([1, 1, 1], 2), [[0, 2], [1]])
+        self.assertEqual(balanced_batches([4], 3), [[0]])
+
+    def test_group_apply(self):
+        chains = [
+            group_by('k') >> summarize(q=X.v.quantile(0.9), m=sym_call(lambda d: d.v.mean(), X)),
+            group_by('k', 'w') >> mutate(r=lambda d: d.v.rolling(2).mean()),
+        ]
+        for chain in chains:
+            serial = self.test_df >> chain
+            with parallel(3, group_apply=True), option_context(parallel_min_rows=10):
+                result = self.test_df >> chain
+            assert_frame_equal(result, serial)
+            self.assertEqual(result._grouped_by, serial._grouped_by)
+        # frames smaller than parallel_min_rows are applied serially
+        with parallel(3, group_apply=True), patch('ply_ng.parallel.apply_groups') as apply_groups:
+            self.test_df >> chains[0]
+        apply_groups.assert_not_called()
+
+    def test_parallel_joins(self):
+        right = pd.DataFrame({'k': [0, 1, 1, 3, 7], 'w': [1, 2, 3, 4, 5], 'name': list('abcde')})
+        for verb in [inner_join, left_join]:
+            serial = self.test_df >> verb(right, by=['k', 'w'])
+            self.assertEqual(serial.attrs['join_strategy'], 'hash')
+            with parallel(3), option_context(parallel_min_rows=10, broadcast_join_rows=3):
+                partitioned = self.test_df >> verb(right, by=['k', 'w'])
+                broadcast = self.test_df >> verb(right, by=['k', 'w'], strategy='broadcast')
+                probed = self.test_df >> verb(indexed(right, by='k'), by='k')
+            assert_frame_equal(partitioned, serial, check_index_type=False)
+            assert_frame_equal(broadcast, serial, check_index_type=False)
+            assert_frame_equal(probed, self.test_df >> verb(right, by='k'), check_index_type=False)
+            self.assertEqual((partitioned.attrs['join_strategy'], partitioned.attrs['join_partitions']),
+                             ('partitioned', 3))
+            self.assertEqual(broadcast.attrs['join_strategy'], 'broadcast')
+            self.assertEqual(probed.attrs['join_strategy'], 'broadcast')
+        with parallel(3), self.assertRaises(ValueError):
+            self.test_df >> right_join(right, by='k', strategy='partitioned')
+
+    def test_parallel_join_of_object_keys(self):
+        left = pd.DataFrame({'k': pd.Series([1, 1.0, 'a', 2] * 5, dtype=object), 'v': range(20)})
+        right = pd.DataFrame({'k': pd.Series([1.0, 'a'], dtype=object), 'w': [1, 2]})
+        with parallel(3), option_context(parallel_min_rows=10, broadcast_join_rows=1):
+            joined = left >> inner_join(right, by='k', strategy='partitioned')
+        assert_frame_equal(joined, left.merge(right, on='k'), check_index_type=False)
+        self.assertEqual(joined.attrs['join_strategy'], 'broadcast')
+
+    def test_small_frames_run_serially(self):
+        chain = filter_by(X.w > 10) >> select('k')
+        with parallel(3):
+            assert_frame_equal(self.test_df >> chain, self.test_df >> chain)
+
+
+if __name__ == '__main__':
+    unittest.main()
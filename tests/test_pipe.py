@@ -2,6 +2,8 @@ import unittest
 from ply_ng.pandas_pipe import *
 import pandas as pd
 
+from ply_ng import mutate, option_context
+
 from ply_ng.pandas_stream import inject_ply
 from ply_ng.select import select
 from ply_ng.subset import head
@@ -34,5 +36,37 @@ class PipeTest(unittest.TestCase):
         d >>= select('x', 'y') >> head(5)
         self.assertTrue(df.equals(d))
 
+    def test_shared_buffers_of_untouched_columns(self):
+        df = test_df.astype({'y': float})
+        with option_context(share_buffers=True):
+            d = df >> mutate(x=X.x * 10) >> head(6)
+        self.assertTrue(np.shares_memory(d['y'].values, df['y'].values))
+        self.assertFalse(np.shares_memory(d['x'].values, df['x'].values))
+        self.assertEqual(list(df.x), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(d.x), [10, 20, 30, 40, 50, 60])
+        # the untouched columns are aliases of the input
+        d.loc[0, 'y'] = 99
+        self.assertEqual(df.y[0], 99)
+        with option_context(share_buffers=False):
+            d = df >> mutate(x=X.x * 10)
+        d.loc[0, 'y'] = -1
+        self.assertEqual(df.y[0], 99)
+
+    def test_chain_does_not_mutate_input(self):
+        df = test_df.copy()
+        for shared in [True, False]:
+            with option_context(share_buffers=shared):
+                d = df >> (mutate(x=X.x + 1) >> mutate(y=X.x * 2))
+            self.assertTrue(test_df.equals(df))
+            self.assertEqual(list(d.y), [4, 6, 8, 10, 12, 14])
+
+    def test_chaining_does_not_change_pipes(self):
+        first = select('x', 'y')
+        chain = first >> head(2)
+        longer_chain = chain >> head(1)
+        self.assertEqual(len(first.chained_pipes), 0)
+        self.assertEqual(len((test_df >> chain).index), 2)
+        self.assertEqual(len((test_df >> longer_chain).index), 1)
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
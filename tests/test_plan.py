@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import Mock
+import pandas as pd
+
+from ply_ng import *
+
+
+class LogicalPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'x': [1, 1, 2, 2],
+            'y': [1, 1, 2, 4],
+            'z': [7, 6, 5, 4]
+        })
+
+    def test_plan_of_chained_pipes(self):
+        p = select('x', 'y') >> filter_by(X.x > 1) >> head(3)
+        self.assertEqual([n.verb for n in p.plan], ['select', 'filter_by', 'head'])
+
+    def test_lazy_frame_does_not_evaluate(self):
+        func = Mock(return_value=1)
+        del func._eval
+        lf = lazy(self.test_df) >> mutate(q=func) >> head(2)
+        self.assertFalse(func.called)
+        lf.collect()
+        self.assertTrue(func.called)
+
+    def test_collect(self):
+        chain = group_by('x') >> summarize(y_mean=X.y.mean()) >> filter_by(X.y_mean > 2)
+        lf = lazy(self.test_df) >> chain
+        self.assertTrue(lf.collect().equals(self.test_df >> chain))
+
+    def test_lazy_frame_is_immutable(self):
+        lf = lazy(self.test_df) >> select('x', 'y')
+        lf_head = lf >> head(1)
+        self.assertEqual(len(lf.plan), 1)
+        self.assertEqual(len(lf_head.plan), 2)
+
+    def test_explain(self):
+        lf = (lazy(self.test_df) >>
+              filter_by(X.x > 1) >>
+              mutate(q=X.y + X['z']) >>
+              inner_join(self.test_df, by=[(X.x, Y.x)]))
+        self.assertEqual(str(lf.plan), '\n'.join([
+            'LogicalPlan',
+            '  0: filter_by((X.x > 1))',
+            "  1: mutate(q=(X.y + X['z']))",
+            '  2: inner_join(<DataFrame 4 rows x 3 columns>, by=[(X.x, Y.x)])'
+        ]))
+
+
+class CompiledPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'x': [1, 1, 2, 2],
+            'y': [1, 1, 2, 4],
+            'z': [7, 6, 5, 4]
+        })
+        self.chain = select(X.x, 1) >> filter_by(X.y > 1) >> mutate(q=X.y * 2)
+
+    def test_compiled_result(self):
+        compiled = self.chain.compile()
+        self.assertTrue((self.test_df >> compiled).equals(self.test_df >> self.chain))
+        self.assertTrue(compiled(self.test_df).equals(self.test_df >> self.chain))
+
+    def test_plan_cached_by_schema(self):
+        compiled = self.chain.compile()
+        plan = compiled.plan_for(self.test_df)
+        self.assertIs(compiled.plan_for(self.test_df.head(2)), plan)
+        self.assertIsNot(compiled.plan_for(self.test_df.astype({'y': float})), plan)
+        self.assertEqual(len(compiled._cache), 2)
+
+    def test_labels_resolved(self):
+        plan = self.chain.compile().plan_for(self.test_df)
+        self.assertEqual(plan.nodes[0].args, ('x', 'y'))
+
+    def test_cache_size(self):
+        compiled = self.chain.compile()
+        with option_context(plan_cache_size=1):
+            compiled.plan_for(self.test_df)
+            compiled.plan_for(self.test_df.astype({'y': float}))
+        self.assertEqual(len(compiled._cache), 1)
+
+    def test_options_of_other_threads(self):
+        import threading
+        entered, done = threading.Event(), threading.Event()
+        seen = []
+
+        def other_thread():
+            with option_context(workers=8, share_buffers=True):
+                entered.set()
+                done.wait(5)
+
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        entered.wait(5)
+        seen.append((get_option('workers'), get_option('share_buffers')))
+        self.assertTrue((self.test_df >> self.chain.compile()).equals(self.test_df >> self.chain))
+        done.set()
+        thread.join()
+        self.assertEqual(seen, [(1, False)])
+
+
+class FilterByTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'x': [1, 1, 2, 2],
+            'y': [1, 1, 2, 4]
+        })
+
+    def test_filter_by(self):
+        exp_df = self.test_df.iloc[[2, 3]]
+        self.assertTrue(exp_df.equals(self.test_df >> filter_by(X.x > 1)))
+        self.assertTrue(exp_df.iloc[[1]].equals(self.test_df >> filter_by(X.x > 1, X.y > 3)))
+
+    def test_filter_by_keeps_grouping(self):
+        d = self.test_df >> group_by('x') >> filter_by(X.y > 1)
+        self.assertEqual(d._grouped_by, ['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import pandas as pd
+
+from ply_ng import *
+
+inject_ply(pd)
+
+
+class ExplainAnalyzeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'x': [1, 1, 2, 2],
+            'y': [1.0, 1.0, 2.0, 4.0],
+            'z': [7, 6, 5, 4]
+        })
+        self.chain = filter_by(X.x > 1) >> mutate(q=X.y * 2) >> select('x', 'q')
+
+    def test_profile_frame(self):
+        profile = self.chain.explain_analyze(self.test_df, as_frame=True)
+        self.assertEqual(list(profile.stage),
+                         ['source', 'filter_by((X.x > 1))', 'mutate(q=(X.y * 2))', "select('x', 'q')"])
+        self.assertEqual(list(profile.rows_in), [4, 4, 2, 2])
+        self.assertEqual(list(profile.rows_out), [4, 2, 2, 2])
+        self.assertEqual(list(profile.columns_out), [3, 3, 4, 2])
+        self.assertTrue((profile.wall_time >= 0).all())
+        self.assertTrue((profile.bytes_allocated >= 0).all())
+
+    def test_copies(self):
+        profile = self.chain.explain_analyze(self.test_df, as_frame=True)
+        self.assertTrue(profile.copied[0]) # full copy of the input
+        self.assertFalse(profile.copied[2]) # mutate shares untouched columns
+        with option_context(share_buffers=True):
+            profile = self.chain.explain_analyze(self.test_df, as_frame=True)
+        self.assertFalse(profile.copied[0])
+
+    def test_lazy_frame_explain_analyze(self):
+        profile = (lazy(self.test_df) >> self.chain).explain_analyze(as_frame=True)
+        self.assertEqual(profile.rows_out.iloc[-1], 2)
+
+    def test_profile_ply(self):
+        with profile_ply(trace_memory=False) as profiler:
+            self.test_df.ply_filter(X.x > 1).ply_mutate(q=X.y * 2)
+        profile = profiler.to_frame()
+        self.assertEqual(list(profile.stage),
+                         ['DataFrame.ply_filter((X.x > 1))', 'DataFrame.ply_mutate(q=(X.y * 2))'])
+        self.assertTrue(profile.bytes_allocated.isna().all())
+        # methods are restored after profiling
+        self.assertNotIn('profiled', pd.DataFrame.ply_filter.__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 import pandas as pd
 
 from ply_ng import *
@@ -9,7 +10,7 @@ from ply_ng import *
 class SelectTest(unittest.TestCase):
 
     def setUp(self) -> None:
-        test_df = pd.DataFrame({
+        self.test_df = pd.DataFrame({
             'x': [1, 2, 3, 4, 5, 6], 
             'y': [6, 5, 4, 3, 2, 1], 
             'z': [7, 6, 5, 4, 3, 2]
@@ -39,7 +40,50 @@ class SelectTest(unittest.TestCase):
         self.assertTrue(df_all.equals(self.test_df >> select([X.loc[:, ['x','y','z']]])))
 
 
+    def test_select_positions(self):
+        self.assertEqual(list((self.test_df >> select(-1, 0)).columns), ['z', 'x'])
+        self.assertEqual(list((self.test_df >> drop(-3)).columns), ['y', 'z'])
+        with self.assertRaises(IndexError):
+            self.test_df >> select(4)
+        with self.assertRaises(IndexError):
+            self.test_df >> drop(5)
+        with self.assertRaises(IndexError):
+            self.test_df >> select(['x', -4])
+
     def test_select_inversion(self):
         df = self.test_df.iloc[:, 2:]
         d = self.test_df >> select(~X.x, ~X.y)
         self.assertTrue(df.equals(d))
+
+
+class WideSelectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = ['c%d' % i for i in range(5000)]
+        self.test_df = pd.DataFrame([range(5000)], columns=self.columns)
+
+    def test_select_names(self):
+        picked = self.columns[::-7]
+        self.assertEqual(list((self.test_df >> select(*picked)).columns), picked)
+        self.assertEqual(list((self.test_df >> select(X[picked])).columns), sorted(picked, key=self.columns.index))
+
+    def test_exclusions(self):
+        d = self.test_df >> select('*', '-c3', '-c4999')
+        self.assertEqual(d.shape[1], 4998)
+        self.assertNotIn('c3', d.columns)
+        self.assertEqual(list((self.test_df >> drop(*self.columns[1:])).columns), ['c0'])
+
+    def test_select_shares_columns(self):
+        with option_context(share_buffers=True):
+            d = self.test_df >> select('c10', 'c2', 'c4000')
+            self.assertTrue(np.shares_memory(d['c2'].values, self.test_df['c2'].values))
+            self.assertTrue(np.shares_memory((self.test_df >> drop('c0'))['c1'].values, self.test_df['c1'].values))
+        d = self.test_df >> select('c10', 'c2')
+        self.assertFalse(np.shares_memory(d['c2'].values, self.test_df['c2'].values))
+        d['c2'] = -1
+        self.assertEqual(self.test_df['c2'][0], 2)
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            self.test_df >> select('c1', 'missing')
+
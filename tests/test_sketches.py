@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+from ply_ng.aggregates import ApproxNunique, ApproxQuantile, recognize
+from ply_ng.sketches import tdigest_merge, tdigest_quantile, tdigest_sketch
+
+
+class SketchesTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 4, 40000),
+            'u': rng.integers(0, 3000, 40000),
+            'v': rng.lognormal(size=40000)
+        })
+
+    def test_approx_nunique(self):
+        self.assertEqual(approx_nunique(pd.Series([1, 2, 2, np.nan, 3])), 3)
+        exact = self.test_df.u.nunique()
+        self.assertLess(abs(approx_nunique(self.test_df.u) / exact - 1), 0.05)
+        with self.assertRaises(ValueError):
+            approx_nunique(X.u, precision=30)
+
+    def test_approx_nunique_merges_across_dtypes(self):
+        ids = self.test_df.u.values[:2000]
+        chunks = [pd.DataFrame({'u': ids[:1000]}), pd.DataFrame({'u': ids[1000:].astype(np.float64)})]
+        summary = summarize(d=approx_nunique(X.u))
+        streamed = (stream(chunks) >> summary).collect()
+        whole = pd.concat(chunks) >> summary
+        self.assertEqual(streamed.d[0], whole.d[0])
+        self.assertEqual(approx_nunique(pd.Series([1, 2.0, 2, np.uint64(3), 3.0, 0.5])), 4)
+
+    def test_approx_quantile(self):
+        small = pd.Series([3.0, 1.0, 2.0, 5.0, np.nan])
+        for q in (0, 0.3, 0.5, 0.9, 1):
+            self.assertAlmostEqual(approx_quantile(small, q), small.quantile(q))
+        values = np.sort(self.test_df.v.values)
+        for q in (0.5, 0.95, 0.99):
+            rank = np.searchsorted(values, approx_quantile(self.test_df.v, q)) / len(values)
+            self.assertLess(abs(rank - q), 0.002)
+
+    def test_merged_digest(self):
+        values = self.test_df.v.values
+        parts = [tdigest_sketch(np.zeros(10000, dtype=np.int64), values[i:i + 10000]) for i in range(0, 40000, 10000)]
+        codes, means, weights = tdigest_merge(*(np.concatenate(p) for p in zip(*parts)))
+        self.assertEqual(weights.sum(), 40000)
+        self.assertLessEqual(len(means), 110)
+        median = tdigest_quantile(codes, means, weights, 0.5, 1)[0]
+        self.assertLess(abs(np.searchsorted(np.sort(values), median) / 40000 - 0.5), 0.002)
+
+    def test_recognize(self):
+        self.assertIsInstance(recognize(approx_nunique(X.u)), ApproxNunique)
+        self.assertIsInstance(recognize(approx_quantile(X.v * 2, 0.9)), ApproxQuantile)
+        self.assertIsNone(recognize(approx_quantile(X.v.cumsum())))
+
+    def test_grouped_summarize(self):
+        chain = group_by('k') >> summarize(d=approx_nunique(X.u), p=approx_quantile(X.v, 0.9))
+        result = self.test_df >> chain
+        exact = self.test_df >> group_by('k') >> summarize(d=X.u.nunique(), p=X.v.quantile(0.9))
+        self.assertEqual(list(result.k), list(exact.k))
+        self.assertLess(((result.d / exact.d) - 1).abs().max(), 0.05)
+        self.assertLess(((result.p / exact.p) - 1).abs().max(), 0.02)
+
+        chunks = (self.test_df.iloc[i:i + 3000] for i in range(0, 40000, 3000))
+        streamed = (stream(chunks) >> chain).collect()
+        assert_frame_equal(streamed[['k', 'd']], result[['k', 'd']])
+        self.assertLess(((streamed.p / result.p) - 1).abs().max(), 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+from ply_ng.pandas_pipe import carry_attributes
+from ply_ng.spill import SpillPartitions, summarize_partitioned
+
+
+class SpillPartitionsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 50, 1000),
+            's': rng.choice(['a', 'b', 'c'], 1000),
+            'v': rng.normal(size=1000)
+        })
+        self.directory = tempfile.mkdtemp()
+
+    def test_groups_stay_in_one_partition(self):
+        partitions = SpillPartitions(['k', 's'], memory_budget=4000, n_partitions=4, directory=self.directory)
+        for start in range(0, 1000, 100):
+            partitions.add(self.test_df.iloc[start:start + 100])
+        self.assertTrue(any(partitions.files))
+        parts = [part for _, part in partitions]
+        partitions.close()
+        self.assertEqual(sum(len(part) for part in parts), 1000)
+        seen = set()
+        for part in parts:
+            keys = set(zip(part['k'], part['s']))
+            self.assertFalse(keys & seen)
+            seen |= keys
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_summarize_partitioned(self):
+        grouped = self.test_df >> group_by('s', 'k')
+        run = lambda part: part >> summarize(m=X.v.median())
+        chunks = (carry_attributes(grouped, grouped.iloc[i:i + 250]) for i in range(0, 1000, 250))
+        result = summarize_partitioned(chunks, run, memory_budget=5000)
+        assert_frame_equal(result, run(grouped))
+        self.assertEqual(result._grouped_by, ['s', 'k'])
+
+
+class OutOfCoreSummarizeTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 200, 5000),
+            'v': rng.normal(size=5000),
+            'w': rng.integers(0, 10, 5000)
+        })
+        self.chain = group_by('k') >> summarize(q=X.v.quantile(0.9), n=sym_call(len, X), u=X.w.nunique())
+
+    def test_frame(self):
+        expected = self.test_df >> self.chain
+        with option_context(memory_budget=20000, spill_partitions=4):
+            result = self.test_df >> self.chain
+        assert_frame_equal(result, expected)
+
+    def test_stream(self):
+        expected = self.test_df >> self.chain
+        chunks = (self.test_df.iloc[i:i + 600] for i in range(0, 5000, 600))
+        with option_context(memory_budget=20000, spill_partitions=4):
+            result = (stream(chunks) >> self.chain).collect()
+        assert_frame_equal(result, expected)
+        self.assertEqual(result._grouped_by, ['k'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+
+
+class ChunkStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_df = pd.DataFrame({
+            'k': rng.integers(0, 5, 200),
+            'v': rng.normal(size=200),
+            'w': rng.integers(0, 100, 200)
+        })
+
+    def chunks(self, size=37):
+        return (self.test_df.iloc[i:i + size] for i in range(0, len(self.test_df), size))
+
+    def test_row_local_verbs_stream(self):
+        chain = filter_by(X.w > 10) >> mutate(z=X.v * 2) >> select('k', 'z')
+        parts = list(stream(self.chunks()) >> chain)
+        self.assertEqual(len(parts), 6)
+        assert_frame_equal(pd.concat(parts), self.test_df >> chain)
+
+    def test_grouped_summarize(self):
+        chain = (filter_by(X.w > 10) >>
+                 group_by('k') >>
+                 summarize(s=X.v.sum(), m=X.v.mean(), sd=X.v.std(), n=sym_call(len, X),
+                           lo=X.w.min(), hi=X.w.max(), c=X.w.count(), p=(X.v * X.w).var(ddof=0)))
+        result = (stream(self.chunks()) >> chain).collect()
+        assert_frame_equal(result, self.test_df >> chain)
+        self.assertEqual(result._grouped_by, ['k'])
+
+    def test_sorted_grouped_summarize(self):
+        df = self.test_df.sort_values(['k', 'w'], kind='mergesort').reset_index(drop=True)
+        chunks = (df.iloc[i:i + 37] for i in range(0, len(df), 37))
+        chain = group_by('k', 'w', sorted=True) >> summarize(q=X.v.quantile(0.5), n=sym_call(len, X))
+        parts = list(stream(chunks) >> chain)
+        self.assertGreater(len(parts), 1)
+        assert_frame_equal(pd.concat(parts), df >> chain)
+
+        unsorted = stream(self.chunks()) >> chain
+        self.assertRaises(ValueError, unsorted.collect)
+
+    def test_ungrouped_summarize(self):
+        chain = summarize(m=X.v.mean(), n=X.shape[0])
+        assert_frame_equal((stream(self.chunks()) >> chain).collect(), self.test_df >> chain)
+
+    def test_ungrouped_summarize_of_no_rows(self):
+        chain = filter_by(X.w > 1000) >> summarize(n=X.w.count(), s=X.w.sum(), d=approx_nunique(X.w))
+        assert_frame_equal((stream(self.chunks()) >> chain).collect(), self.test_df >> chain)
+        summary = (stream([]) >> summarize(n=X.w.count(), rows=X.shape[0])).collect()
+        self.assertEqual(summary.values.tolist(), [[0, 0]])
+        chain = summarize(s=X.w.sum(), m=X.v.mean())
+        summary = (stream([], schema=self.test_df.iloc[:0]) >> chain).collect()
+        assert_frame_equal(summary, self.test_df.iloc[:0] >> chain)
+
+    def test_not_mergeable_summarize_falls_back(self):
+        chain = group_by('k') >> summarize(u=X.w.nunique()) >> filter_by(X.u > 1)
+        assert_frame_equal((stream(self.chunks()) >> chain).collect(), self.test_df >> chain)
+
+    def test_head_stops_reading(self):
+        read = []
+
+        def chunks():
+            for chunk in self.chunks(10):
+                read.append(chunk)
+                yield chunk
+
+        result = (stream(chunks()) >> head(25) >> select('k')).collect()
+        self.assertEqual(len(read), 3)
+        assert_frame_equal(result, self.test_df[['k']].head(25))
+
+    def test_tail(self):
+        assert_frame_equal((stream(self.chunks()) >> tail(3)).collect(), self.test_df.tail(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
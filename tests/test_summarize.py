@@ -30,6 +30,22 @@ class SummarizingTest(unittest.TestCase):
             
         self.assertTrue(s_df.equals(result))
 
+    def test_summarize_grouped_vectorized(self):
+        from ply_ng.summarize import summarize as summarize_pipe
+        chain = group_by('y', 'x') >> summarize(n=sym_call(len, X), z_sum=X.z.sum(), z_sd=X.z.std(),
+                                                w=(X.z * 2).mean(), z_q=X.z.quantile(0.5))
+        vectorized = summarize_pipe.function.vectorized
+        summarize_pipe.function.vectorized = None
+        try:
+            applied = self.test_df >> chain
+        finally:
+            summarize_pipe.function.vectorized = vectorized
+        result = self.test_df >> chain
+
+        self.assertTrue(applied.equals(result))
+        self.assertEqual(list(result.columns), ['x', 'y', 'n', 'z_sum', 'z_sd', 'w', 'z_q'])
+        self.assertEqual(list(result.z_sum), [13, 5, 4])
+
     def test_summarize_ungrouped(self):
         s_df = pd.DataFrame({
             'x_min': [1],
@@ -1,7 +1,8 @@
 import unittest
 from unittest.mock import Mock
 
-from ply_ng.symbolic_eval import Call, GetAttr, Symbol, eval_if_symbolic, sym_call, to_callable
+from ply_ng.symbolic_eval import (Call, GetAttr, Symbol, compile_expression, compile_shared, eval_if_symbolic,
+                                  structural_key, structurally_equal, sym_call, to_callable)
 
 class SymbolTest(unittest.TestCase):
 
@@ -164,6 +165,73 @@ class FunctionsTest(unittest.TestCase):
             "**{'kwarg_name': 'kwarg value'})")
 
 
+class CompileExpressionTest(unittest.TestCase):
+
+    def test_compiled_matches_eval(self):
+        x = Symbol('x')
+        exprs = [x, x.real, x + 1, 2 * x - x ** 2, sym_call(max, x, 3),
+                 sym_call(sum, (x, 1, x)), sym_call(round, x / 3, ndigits=2)]
+        for expr in exprs:
+            self.assertEqual(compile_expression(expr)({'x': 7}), eval_if_symbolic(expr, {'x': 7}, log=False))
+
+    def test_compiled_function_cached(self):
+        expr = Symbol('x') * 2
+        self.assertIs(compile_expression(expr), compile_expression(expr))
+
+    def test_nonsymbolic_attribute_read_at_evaluation(self):
+        some_obj = Mock()
+        del some_obj._eval
+        func = compile_expression(GetAttr(some_obj, 'some_attr'))
+        some_obj.some_attr = 'attribute value'
+        self.assertEqual(func({}), 'attribute value')
+
+    def test_constant(self):
+        self.assertEqual(compile_expression('constant')({'x': 1}), 'constant')
+
+
+class StructuralKeyTest(unittest.TestCase):
+
+    def test_equal_structure(self):
+        x = Symbol('x')
+        self.assertTrue(structurally_equal(x.rolling(30).mean(), x.rolling(30).mean()))
+        self.assertTrue(structurally_equal(x.isin([1, 2]) & (x > 0), x.isin([1, 2]) & (x > 0)))
+        self.assertEqual(len({structural_key(x + 1), structural_key(x + 1), structural_key(1 + x)}), 2)
+
+    def test_different_structure(self):
+        x = Symbol('x')
+        self.assertFalse(structurally_equal(x + 1, x + 1.0))
+        self.assertFalse(structurally_equal(x.a, ~x.a))
+        self.assertFalse(structurally_equal(x.round(1), x.round(decimals=1)))
+        self.assertFalse(structurally_equal(Symbol('x'), Symbol('y')))
+
+    def test_unhashable_constants_by_identity(self):
+        x = Symbol('x')
+        values = {1: 2}
+        self.assertTrue(structurally_equal(x.map(values), x.map(values)))
+        self.assertFalse(structurally_equal(x.map(values), x.map({1: 3})))
+
+
+class CompileSharedTest(unittest.TestCase):
+
+    def test_common_subexpression_evaluated_once(self):
+        values = Mock()
+        values.rolling.return_value.mean.return_value = 10
+        x = Symbol('x')
+        evaluate = compile_shared([x.rolling(3).mean() + 1, x.rolling(3).mean() * 2, x])
+        self.assertEqual(evaluate({'x': values}), [11, 20, values])
+        values.rolling.assert_called_once_with(3)
+        self.assertEqual(evaluate({'x': values}), [11, 20, values])
+        self.assertEqual(values.rolling.call_count, 2)
+
+    def test_function_calls_are_not_shared(self):
+        func = Mock(side_effect=[10, 20])
+        del func._eval
+        x = Symbol('x')
+        evaluate = compile_shared([sym_call(func, x) + 1, sym_call(func, x) + 1])
+        self.assertEqual(evaluate({'x': 3}), [11, 21])
+        self.assertEqual(func.call_count, 2)
+
+
 class IntegrationTest(unittest.TestCase):
 
     def test_pythagoras(self):
@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_series_equal
+
+from ply_ng import *
+from ply_ng.group import GroupIndex
+from ply_ng.transform import NotVectorized, evaluate_grouped
+
+
+class EvaluateGroupedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'k': ['b', 'a', 'b', 'a'],
+            'v': [1.0, 2.0, 3.0, 6.0]
+        })
+        self.index = GroupIndex.build(self.test_df, ['k'])
+
+    def evaluate(self, expr):
+        return evaluate_grouped(expr, self.test_df, self.index)
+
+    def test_reductions_broadcast(self):
+        assert_series_equal(self.evaluate(X.v - X.v.mean()), pd.Series([-1.0, -2.0, 1.0, 2.0], name='v'))
+        assert_series_equal(self.evaluate(sym_call(len, X)), pd.Series([2, 2, 2, 2]))
+
+    def test_window_methods(self):
+        assert_series_equal(self.evaluate(X.v.cumsum()), pd.Series([1.0, 2.0, 4.0, 8.0], name='v'))
+        assert_series_equal(self.evaluate(X.v.shift(fill_value=0.0)), pd.Series([0.0, 0.0, 1.0, 2.0], name='v'))
+
+    def test_not_vectorized(self):
+        for expr in [X.v.quantile(0.5), X.v.shift(X.v), X.v.rolling(2).mean(), X.shape]:
+            with self.assertRaises(NotVectorized):
+                self.evaluate(expr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from ply_ng import *
+from ply_ng.symbolic_eval import to_callable
+
+
+class WindowFunctionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_df = pd.DataFrame({
+            'k': ['b', 'a', 'b', 'a', 'b', 'a'],
+            'v': [1.0, 2.0, 3.0, 2.0, 3.0, 5.0]
+        }, index=[10, 3, 7, 1, 4, 0])
+
+    def test_ungrouped(self):
+        d = self.test_df >> mutate(l=lag(X.v), ld=lead(X.v, default=0.0), n=row_number(),
+                                   r=min_rank(X.v), dr=dense_rank(X.v), c=cumsum(X.v), s=rolling_sum(X.v, 2))
+        self.assertEqual(d['l'].tolist()[1:], [1.0, 2.0, 3.0, 2.0, 3.0])
+        self.assertEqual(d['ld'].tolist(), [2.0, 3.0, 2.0, 3.0, 5.0, 0.0])
+        self.assertEqual(d['n'].tolist(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(d['r'].tolist(), [1.0, 2.0, 4.0, 2.0, 4.0, 6.0])
+        self.assertEqual(d['dr'].tolist(), [1.0, 2.0, 3.0, 2.0, 3.0, 4.0])
+        self.assertEqual(d['c'].tolist(), [1.0, 3.0, 6.0, 8.0, 11.0, 16.0])
+        self.assertEqual(d['s'].tolist()[1:], [3.0, 5.0, 5.0, 5.0, 8.0])
+
+    def test_grouped(self):
+        d = self.test_df >> group_by('k') >> mutate(l=lag(X.v), n=row_number(), r=min_rank(X.v), m=cummax(X.v))
+        self.assertEqual(d['l'].fillna(-1).tolist(), [-1, -1, 1.0, 2.0, 3.0, 2.0])
+        self.assertEqual(d['n'].tolist(), [1, 1, 2, 2, 3, 3])
+        self.assertEqual(d['r'].tolist(), [1.0, 1.0, 2.0, 1.0, 2.0, 3.0])
+        self.assertEqual(d['m'].tolist(), [1.0, 2.0, 3.0, 2.0, 3.0, 5.0])
+
+    def test_grouped_same_as_per_group(self):
+        windows = dict(l=lag(X.v, 2), ld=lead(X.v), n=row_number(X.v), r=dense_rank(X.v), c=cumsum(X.v),
+                       lo=cummin(X.v), m=rolling_mean(X.v, 2), s=rolling_std(X.v, 3, min_periods=2))
+        result = self.test_df >> group_by('k') >> mutate(**windows)
+        expected = pd.concat([d.assign(**{name: to_callable(w)(d) for name, w in windows.items()})
+                              for _, d in self.test_df.groupby('k')]).loc[self.test_df.index]
+        assert_frame_equal(result, expected)
+
+    def test_describe(self):
+        self.assertEqual(repr(mutate(p=lag(X.v, 2)).plan.nodes[0]), 'mutate(p=lag(X.v, 2))')
+
+
+if __name__ == '__main__':
+    unittest.main()